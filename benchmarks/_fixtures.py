@@ -0,0 +1,37 @@
+"""
+Offline fixtures shared by the benchmarks and the tests.
+"""
+
+import os
+
+WORDS = ["agent", "environment", "reward", "policy", "action", "state", "model", "learning",
+         "perceive", "decide", "value", "episode", "observation", "goal", "plan", "search"]
+
+
+def build_tiny_model(path, seed=0):
+    """
+    Save a tiny randomly initialized BERT model and its tokenizer.
+
+    Args:
+        path (str): Directory to save to
+        seed (int): Seed of the weight initialization
+
+    Returns:
+        str: The directory, loadable with `load_hf_model`
+    """
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    path = str(path)
+    torch.manual_seed(seed)
+    config = BertConfig(vocab_size=128, hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=128, max_position_embeddings=256)
+    BertModel(config).save_pretrained(path)
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS
+    vocab += [chr(c) for c in range(ord("a"), ord("z") + 1)]
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w") as f:
+        f.write("\n".join(vocab))
+    BertTokenizerFast(vocab_file).save_pretrained(path)
+    return path
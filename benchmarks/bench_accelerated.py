@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+Latency and parity benchmark for TorchScript-accelerated inference.
+
+For each (batch size, sequence length) shape, compares the eager model with
+`AcceleratedEncoder`: median forward latency, speedup, and the largest
+difference of the hidden states. Also reports how long tracing a bucket takes
+the first time and how long loading it from the trace cache takes afterwards.
+
+Runs offline on the tiny model of `bench_suite.py` unless `--model` names
+another one.
+
+Usage:
+```
+python benchmarks/bench_accelerated.py --shapes 1x16 1x64 8x32 32x128
+```
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Never reach the Hub, even if a cached model is missing
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import torch
+
+# Add the parent directory to the path to import the src package
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks._fixtures import build_tiny_model
+from src.accelerated import MAX_TRACED_TOKENS, AcceleratedEncoder
+from src.utils import load_hf_model
+
+
+def median_latency(model, input_ids, attention_mask, repeats):
+    """
+    Time forward passes.
+
+    Args:
+        model: Eager or accelerated model
+        input_ids (torch.Tensor): Token ids
+        attention_mask (torch.Tensor): Attention mask
+        repeats (int): Number of timed passes
+
+    Returns:
+        float: Median latency in milliseconds
+    """
+    timings = []
+    with torch.inference_mode():
+        model(input_ids=input_ids, attention_mask=attention_mask)  # warm up
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(input_ids=input_ids, attention_mask=attention_mask)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def parse_shape(text):
+    batch, _, seq = text.partition("x")
+    return int(batch), int(seq)
+
+
+def main():
+    """
+    Run the benchmark and print (or write) latency, speedup and parity per shape.
+    """
+    parser = argparse.ArgumentParser(description="Compare eager and TorchScript-accelerated inference.")
+    parser.add_argument("--model", type=str, default=None, help="Model to load; defaults to a tiny local BERT")
+    parser.add_argument("--shapes", type=parse_shape, nargs="+", default=[(1, 16), (1, 64), (8, 32), (32, 128)],
+                        help="Input shapes as BATCHxSEQ_LEN")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--max-traced-tokens", type=int, default=MAX_TRACED_TOKENS,
+                        help="Largest bucket (batch x seq_len) to trace; raise it to measure larger buckets")
+    parser.add_argument("--output", type=str, default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            model_name = args.model or build_tiny_model(tmp_dir)
+            _, model = load_hf_model(model_name, device="cpu")
+        cache_dir = Path(tmp_dir) / "compiled"
+        accelerated = AcceleratedEncoder(model, cache_key=model_name, cache_dir=cache_dir,
+                                         max_traced_tokens=args.max_traced_tokens)
+        vocab_size = model.config.vocab_size
+
+        results = {"model": args.model or "tiny-bert", "torch": torch.__version__, "shapes": {}}
+        for batch, seq in args.shapes:
+            generator = torch.Generator().manual_seed(batch * 1000 + seq)
+            input_ids = torch.randint(0, vocab_size, (batch, seq), generator=generator)
+            attention_mask = torch.ones_like(input_ids)
+            attention_mask[batch // 2:, seq // 2:] = 0  # some padded rows, as in a real batch
+            bucket = accelerated.bucket(batch, seq)
+
+            start = time.perf_counter()
+            traced = bucket is not None and accelerated.get_trace(bucket) is not None
+            trace_seconds = time.perf_counter() - start
+            cached_seconds = None
+            if traced:
+                # A fresh wrapper with the same cache, as after a restart
+                start = time.perf_counter()
+                AcceleratedEncoder(model, cache_key=model_name, cache_dir=cache_dir,
+                                   max_traced_tokens=args.max_traced_tokens).get_trace(bucket)
+                cached_seconds = time.perf_counter() - start
+
+            with torch.inference_mode():
+                expected = model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+                actual = accelerated(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+            difference = (actual - expected).abs().max().item()
+            eager_ms = median_latency(model, input_ids, attention_mask, args.repeats)
+            accelerated_ms = median_latency(accelerated, input_ids, attention_mask, args.repeats)
+
+            results["shapes"][f"{batch}x{seq}"] = {
+                "bucket": list(bucket) if traced else None,
+                "eager_ms": eager_ms,
+                "accelerated_ms": accelerated_ms,
+                "speedup": eager_ms / accelerated_ms,
+                "max_abs_difference": difference,
+                "trace_seconds": trace_seconds if traced else None,
+                "cached_load_seconds": cached_seconds,
+            }
+            bucket_text = f"bucket {bucket[0]}x{bucket[1]}" if traced else "eager fallback"
+            cache_text = f", trace {trace_seconds:.2f}s / cached {cached_seconds:.2f}s" if traced else ""
+            print(f"{batch}x{seq} ({bucket_text}): eager {eager_ms:.2f} ms, accelerated {accelerated_ms:.2f} ms "
+                  f"({eager_ms / accelerated_ms:.2f}x), max diff {difference:.1e}{cache_text}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
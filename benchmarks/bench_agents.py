@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Memory benchmark for long-running agents.
+
+Runs millions of perceive/act cycles and samples the traced Python heap along
+the way. The bounded agents from src.agents must stay flat; the notebook's
+list-based agent is measured alongside for comparison.
+
+Usage:
+```
+python benchmarks/bench_agents.py --cycles 2000000
+```
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add the parent directory to the path to import the src package
+sys.path.append(str(Path(__file__).parent.parent))
+from src.agents import ReflexAgent
+
+PERCEPTS = ["too hot", "too cold", "dark", "comfortable"]
+
+
+class UnboundedReflexAgent:
+    """The notebook's SimpleReflexAgent without printing, as a baseline."""
+
+    def __init__(self, name):
+        self.name = name
+        self.percepts = []
+
+    def perceive(self, percept):
+        self.percepts.append(percept)
+
+    def act(self):
+        if not self.percepts:
+            return "Do nothing"
+        return ReflexAgent.RULES.get(self.percepts[-1], "Do nothing")
+
+
+def measure(agent, cycles, samples=10):
+    """
+    Run perceive/act cycles and sample heap usage.
+
+    Args:
+        agent: Agent with perceive() and act()
+        cycles (int): Number of perceive/act cycles
+        samples (int): Number of heap samples to take
+
+    Returns:
+        dict: Heap size in bytes at each sample, growth from the first sample, and cycles per second
+    """
+    tracemalloc.start()
+    heap = []
+    step = max(1, cycles // samples)
+    start = time.perf_counter()
+    for i in range(cycles):
+        agent.perceive(PERCEPTS[i % len(PERCEPTS)])
+        agent.act()
+        if i % step == step - 1:
+            heap.append(tracemalloc.get_traced_memory()[0])
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    return {
+        "heap_bytes": heap,
+        "growth_bytes": heap[-1] - heap[0],
+        "cycles_per_second": cycles / elapsed,
+    }
+
+
+def main():
+    """
+    Run the benchmark and exit non-zero if a bounded agent's memory grows.
+    """
+    parser = argparse.ArgumentParser(description="Check that agent memory stays constant.")
+    parser.add_argument("--cycles", type=int, default=1_000_000)
+    parser.add_argument("--max-growth-bytes", type=int, default=16 * 1024,
+                        help="Allowed heap growth for the bounded agents")
+    args = parser.parse_args()
+
+    agents = {
+        "unbounded (notebook)": (UnboundedReflexAgent("Baseline"), False),
+        "ReflexAgent": (ReflexAgent("ThermoBot", window=16), True),
+        "ReflexAgent (interned)": (ReflexAgent("ThermoBot", window=16, intern_percepts=True), True),
+    }
+
+    failures = []
+    for label, (agent, bounded) in agents.items():
+        result = measure(agent, args.cycles)
+        print(f"{label}: heap growth {result['growth_bytes'] / 1024:.1f} KiB over {args.cycles} cycles, "
+              f"{result['cycles_per_second']:,.0f} cycles/s (traced)")
+        if bounded and result["growth_bytes"] > args.max_growth_bytes:
+            failures.append(f"{label} grew by {result['growth_bytes']} bytes")
+
+    if failures:
+        print("\nAgent memory benchmark failed:")
+        for failure in failures:
+            print(f"- {failure}")
+        sys.exit(1)
+
+    print("\nAgent memory benchmark passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Import-time benchmark for the lightweight entry points of the src package.
+
+Each module is imported in a fresh interpreter so every measurement is a cold
+import. The benchmark fails if an import takes longer than the allowed upper
+bound or pulls in a heavy framework such as torch or transformers.
+
+Usage:
+```
+python benchmarks/bench_import.py --max-seconds 0.5
+```
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Modules that must stay cheap to import
+MODULES = ["src.env_utils", "src.utils"]
+
+# Frameworks that must not be imported as a side effect
+HEAVY_MODULES = ["torch", "transformers", "numpy", "gymnasium"]
+
+_CHILD_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_import(module, repeats=5):
+    """
+    Measure the cold import time of a module.
+
+    Args:
+        module (str): Dotted module name
+        repeats (int): Number of fresh interpreters to measure in
+
+    Returns:
+        dict: Best and worst import time in seconds and the heavy modules it loaded
+    """
+    timings = []
+    heavy = set()
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-c", _CHILD_CODE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # Imported modules may print warnings, the measurement is the last line
+        measurement = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(measurement["seconds"])
+        heavy.update(measurement["heavy"])
+
+    return {
+        "best_seconds": min(timings),
+        "worst_seconds": max(timings),
+        "heavy_modules": sorted(heavy),
+    }
+
+
+def main():
+    """
+    Run the import benchmark and exit non-zero if any bound is exceeded.
+    """
+    parser = argparse.ArgumentParser(description="Measure cold import time of the src package.")
+    parser.add_argument("--max-seconds", type=float, default=0.5,
+                        help="Upper bound for the best cold import time of each module")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="Number of fresh interpreters per module")
+    args = parser.parse_args()
+
+    failures = []
+    for module in MODULES:
+        result = measure_import(module, repeats=args.repeats)
+        print(f"{module}: best {result['best_seconds'] * 1000:.1f} ms, "
+              f"worst {result['worst_seconds'] * 1000:.1f} ms")
+
+        if result["heavy_modules"]:
+            failures.append(f"{module} imports {', '.join(result['heavy_modules'])}")
+        if result["best_seconds"] > args.max_seconds:
+            failures.append(f"{module} took {result['best_seconds']:.3f}s "
+                            f"(limit {args.max_seconds:.3f}s)")
+
+    if failures:
+        print("\nImport benchmark failed:")
+        for failure in failures:
+            print(f"- {failure}")
+        sys.exit(1)
+
+    print("\nImport benchmark passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+"""
+Throughput and latency benchmarks for model loading, embedding, env stepping
+and agents.
+
+Everything runs offline: the model is a tiny randomly initialized BERT that is
+built in a temporary directory, and the environment is CartPole. Results are
+written as JSON so runs before and after an upgrade of torch, transformers or
+gymnasium can be compared.
+
+Usage:
+```
+python benchmarks/bench_suite.py --output before.json
+pip install -U torch transformers gymnasium
+python benchmarks/bench_suite.py --output after.json --compare before.json --threshold 0.15
+```
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Never reach the Hub, even if a cached model is missing
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+# Add the parent directory to the path to import the src package
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks._fixtures import WORDS, build_tiny_model
+from src.agents import ModelBasedAgent, ReflexAgent
+from src.utils import create_agent_environment, embed_texts, load_hf_model
+from src.model_registry import get_model_registry
+
+
+def _result(value, unit, higher_is_better):
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def bench_model_load(model_path, repeats):
+    """
+    Measure loading the model from disk and from the model registry.
+
+    Args:
+        model_path (str): Directory of a saved model
+        repeats (int): Number of loads to take the median of
+
+    Returns:
+        dict: Cold (from disk) and warm (registry hit) load time in milliseconds
+    """
+    registry = get_model_registry()
+    cold, warm = [], []
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        for _ in range(repeats):
+            registry.clear()
+            start = time.perf_counter()
+            load_hf_model(model_path, device="cpu")
+            cold.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            load_hf_model(model_path, device="cpu")
+            warm.append(time.perf_counter() - start)
+
+    return {
+        "model_load_cold_ms": _result(statistics.median(cold) * 1000, "ms", False),
+        "model_load_warm_ms": _result(statistics.median(warm) * 1000, "ms", False),
+    }
+
+
+def bench_embedding(model_path, repeats, num_texts=512, batch_size=32):
+    """
+    Measure batched embedding throughput, with and without the token-id cache.
+
+    The uncached runs embed texts never seen before, so they include
+    tokenization; the cached runs embed the same texts again, so their
+    token ids come from the cache (see `src.token_cache`).
+
+    Args:
+        model_path (str): Directory of a saved model
+        repeats (int): Number of runs to take the median of
+        num_texts (int): Texts embedded per run
+        batch_size (int): Texts per forward pass
+
+    Returns:
+        dict: Non-padding tokens embedded per second, uncached and cached
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    runs = itertools.count()
+
+    def fresh_texts():
+        # The run number makes every text unique across runs, so none hits the token cache
+        run_number = next(runs)
+        return [f"{run_number} {i} " + " ".join(rng.choice(WORDS, size=rng.integers(4, 64)))
+                for i in range(num_texts)]
+
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        tokenizer, _ = load_hf_model(model_path, device="cpu")
+        embed_texts(fresh_texts()[:batch_size], model_name=model_path, device="cpu")  # warm up
+
+    def run(texts):
+        tokens = sum(len(ids) for ids in tokenizer(texts)["input_ids"])
+        start = time.perf_counter()
+        embed_texts(texts, model_name=model_path, batch_size=batch_size, device="cpu")
+        return tokens / (time.perf_counter() - start)
+
+    uncached = [run(fresh_texts()) for _ in range(repeats)]
+    texts = fresh_texts()
+    run(texts)  # fills the token cache
+    cached = [run(texts) for _ in range(repeats)]
+
+    return {
+        "embedding_tokens_per_second": _result(statistics.median(uncached), "tokens/s", True),
+        "embedding_cached_tokens_per_second": _result(statistics.median(cached), "tokens/s", True),
+    }
+
+
+def bench_env(repeats, steps=20_000, env_name="CartPole-v1"):
+    """
+    Measure single-environment stepping throughput, including resets.
+
+    Args:
+        repeats (int): Number of runs to take the median of
+        steps (int): Steps per run
+        env_name (str): Gymnasium environment to step
+
+    Returns:
+        dict: Steps per second
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        env = create_agent_environment(env_name)
+
+    timings = []
+    for repeat in range(repeats):
+        observation, info = env.reset(seed=repeat)
+        start = time.perf_counter()
+        for _ in range(steps):
+            action = 1 if observation[2] > 0 else 0
+            observation, reward, terminated, truncated, info = env.step(action)
+            if terminated or truncated:
+                observation, info = env.reset()
+        timings.append(time.perf_counter() - start)
+    env.close()
+
+    return {"env_steps_per_second": _result(steps / statistics.median(timings), "steps/s", True)}
+
+
+def bench_agents(repeats, cycles=200_000):
+    """
+    Measure perceive/act throughput of the introduction notebook's agents.
+
+    Args:
+        repeats (int): Number of runs to take the median of
+        cycles (int): Cycles per run
+
+    Returns:
+        dict: Cycles per second for the reflex and model-based agents
+    """
+    percepts = ["too hot", "too cold", "dark", "comfortable"]
+    states = [{"temperature": 28}, {"temperature": 15, "light_level": "dark"},
+              {"time_of_day": "night"}, {"temperature": 22, "light_level": "bright"}]
+
+    def run_reflex():
+        agent = ReflexAgent("ThermoBot")
+        for i in range(cycles):
+            agent.perceive(percepts[i & 3])
+            agent.act()
+
+    def run_model_based():
+        agent = ModelBasedAgent("HomeBot")
+        for i in range(cycles):
+            agent.update_state(states[i & 3])
+            agent.act()
+
+    results = {}
+    for name, run in (("reflex_agent_cycles_per_second", run_reflex),
+                      ("model_based_agent_cycles_per_second", run_model_based)):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        results[name] = _result(cycles / statistics.median(timings), "cycles/s", True)
+    return results
+
+
+def environment_info():
+    """
+    Collect the versions that benchmark results depend on.
+
+    Returns:
+        dict: Python, platform and framework versions
+    """
+    info = {"python": platform.python_version(), "platform": platform.platform()}
+    for module in ("torch", "transformers", "gymnasium", "numpy"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    return info
+
+
+def compare(results, baseline, threshold):
+    """
+    Find benchmarks that got worse than a baseline by more than a threshold.
+
+    Args:
+        results (dict): Current results
+        baseline (dict): Results of an earlier run
+        threshold (float): Allowed relative slowdown, e.g. 0.1 for 10%
+
+    Returns:
+        list: Descriptions of the regressions
+    """
+    regressions = []
+    for name, result in results["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None or not previous["value"]:
+            continue
+        change = result["value"] / previous["value"] - 1.0
+        worse = -change if result["higher_is_better"] else change
+        marker = " REGRESSION" if worse > threshold else ""
+        print(f"{name}: {previous['value']:,.2f} -> {result['value']:,.2f} {result['unit']} "
+              f"({change:+.1%}){marker}")
+        if marker:
+            regressions.append(f"{name} is {worse:.1%} worse than the baseline")
+    return regressions
+
+
+def main():
+    """
+    Run the benchmarks, write JSON, and exit non-zero on regressions.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark model loading, embedding, env stepping and agents.")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per benchmark; the median is reported")
+    parser.add_argument("--output", type=str, default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=str, default=None, help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative slowdown beyond which a benchmark counts as regressed")
+    args = parser.parse_args()
+
+    results = {"environment": environment_info(), "results": {}}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            model_path = build_tiny_model(tmp_dir)
+        results["results"].update(bench_model_load(model_path, args.repeats))
+        results["results"].update(bench_embedding(model_path, args.repeats))
+    results["results"].update(bench_env(args.repeats))
+    results["results"].update(bench_agents(args.repeats))
+
+    for name, result in results["results"].items():
+        print(f"{name}: {result['value']:,.2f} {result['unit']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nComparison with {args.compare}:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nBenchmark regressions:")
+            for regression in regressions:
+                print(f"- {regression}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
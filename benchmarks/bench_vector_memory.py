@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Recall and throughput benchmark for the agent vector memory.
+
+Fills a VectorMemory with clustered random vectors (1M by default), then
+measures queries per second of exact search and of IVF search at several
+`nprobe` values, and the recall@k of IVF against the exact results.
+
+Usage:
+```
+python benchmarks/bench_vector_memory.py --vectors 1000000 --dim 64 --k 10
+```
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add the parent directory to the path to import the src package
+sys.path.append(str(Path(__file__).parent.parent))
+from src.vector_memory import VectorMemory
+
+
+def clustered_vectors(n, dim, clusters, rng):
+    """
+    Generate vectors scattered around random cluster centers, like embeddings of related texts.
+
+    Args:
+        n (int): Number of vectors
+        dim (int): Dimension
+        clusters (int): Number of cluster centers
+        rng (np.random.Generator): Random generator
+
+    Returns:
+        np.ndarray: float32 array of shape (n, dim)
+    """
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        end = min(start + 100_000, n)
+        labels = rng.integers(clusters, size=end - start)
+        vectors[start:end] = centers[labels] + rng.standard_normal((end - start, dim), dtype=np.float32)
+    return vectors
+
+
+def recall_at_k(found, expected):
+    """
+    Fraction of the exact top-k ids that were found.
+
+    Args:
+        found (np.ndarray): Approximate result ids of shape (m, k)
+        expected (np.ndarray): Exact result ids of shape (m, k)
+
+    Returns:
+        float: Mean recall over the queries
+    """
+    hits = sum(len(np.intersect1d(f, e)) for f, e in zip(found, expected))
+    return hits / expected.size
+
+
+def queries_per_second(memory, queries, k, nprobe, batch_size):
+    """
+    Time searching all queries in batches.
+
+    Args:
+        memory (VectorMemory): Memory to search
+        queries (np.ndarray): Query vectors
+        k (int): Results per query
+        nprobe (int): IVF clusters to probe, or None for exact search
+        batch_size (int): Queries per search call
+
+    Returns:
+        tuple: (result ids, queries per second)
+    """
+    ids = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        ids.append(memory.search(queries[i:i + batch_size], k=k, nprobe=nprobe)[0])
+    elapsed = time.perf_counter() - start
+    return np.concatenate(ids), len(queries) / elapsed
+
+
+def main():
+    """
+    Run the benchmark and print (or write) recall@k and queries per second.
+    """
+    parser = argparse.ArgumentParser(description="Measure recall@k and QPS of VectorMemory search.")
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--batch-size", type=int, default=32, help="Queries per exact search call")
+    parser.add_argument("--output", type=str, default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    clusters = max(16, args.vectors // 10_000)
+    data = clustered_vectors(args.vectors + args.queries, args.dim, clusters, rng)
+    queries = data[args.vectors:]
+
+    memory = VectorMemory(args.dim, capacity=args.vectors)
+    start = time.perf_counter()
+    memory.add(data[:args.vectors])
+    print(f"Added {args.vectors:,} vectors of dimension {args.dim} in {time.perf_counter() - start:.2f}s")
+
+    results = {"vectors": args.vectors, "dim": args.dim, "k": args.k}
+    exact_ids, qps = queries_per_second(memory, queries, args.k, None, args.batch_size)
+    results["exact_qps"] = qps
+    print(f"exact: {qps:,.1f} queries/s")
+
+    start = time.perf_counter()
+    memory.build_index()
+    results["index_build_seconds"] = time.perf_counter() - start
+    print(f"Built IVF index with {len(memory.centroids)} lists in {results['index_build_seconds']:.2f}s")
+
+    for nprobe in args.nprobe:
+        ivf_ids, qps = queries_per_second(memory, queries, args.k, nprobe, args.batch_size)
+        recall = recall_at_k(ivf_ids, exact_ids)
+        results[f"ivf_nprobe_{nprobe}"] = {"qps": qps, f"recall_at_{args.k}": recall}
+        print(f"ivf nprobe={nprobe}: {qps:,.1f} queries/s, recall@{args.k} {recall:.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,50 +4,271 @@ Convert Python scripts with cell markers to Jupyter notebooks.
 
 This script converts Python files with cell markers (# %%) to Jupyter notebooks.
 It searches for Python files in the notebooks directory and converts them to .ipynb files.
+
+Conversion is incremental. A notebook whose script content has not changed
+since its last conversion is skipped, whatever the file times say. Outputs
+are cached per code cell under notebooks/.nbcache, keyed by the cell's source
+and the source of every code cell above it. Editing only markdown reuses
+every output without starting a kernel. Editing a code cell re-executes the
+notebook: cells above the edit run again too, because they rebuild the
+kernel state the edited cell depends on. Independent notebooks are converted
+in parallel, one process and kernel each.
+
+Usage:
+```
+python convert_to_notebooks.py [--workers N] [--force] [--no-execute]
+```
 """
 
+import argparse
+import glob
+import hashlib
+import json
 import os
 import sys
-import subprocess
-import glob
+from concurrent.futures import ProcessPoolExecutor
+
+CELL_MARKER = "# %%"
+CACHE_DIR_NAME = ".nbcache"
+
+
+def parse_cells(source):
+    """
+    Split a script into notebook cells at its cell markers.
+
+    Text before the first marker (usually the script's docstring) is not part
+    of the notebook. `# %% [markdown]` starts a markdown cell whose lines have
+    their leading "# " removed; any other marker starts a code cell.
+
+    Args:
+        source (str): Content of the Python script
+
+    Returns:
+        list: (cell_type, source) tuples in notebook order
+    """
+    cells = []
+    cell_type, lines = None, []
+
+    def finish():
+        if cell_type is not None:
+            text = "\n".join(lines).strip("\n")
+            if text or cell_type == "code":
+                cells.append((cell_type, text))
+
+    for line in source.splitlines():
+        if line.startswith(CELL_MARKER):
+            finish()
+            cell_type = "markdown" if "[markdown]" in line[len(CELL_MARKER):] else "code"
+            lines = []
+        elif cell_type == "markdown":
+            lines.append(line[2:] if line.startswith("# ") else line.lstrip("#"))
+        elif cell_type == "code":
+            lines.append(line)
+    finish()
+
+    # Drop empty code cells left by consecutive markers
+    return [(kind, text) for kind, text in cells if text]
+
+
+def cell_keys(cells):
+    """
+    Compute the output cache key of every code cell.
+
+    Each key hashes the cell's source together with the key of the previous
+    code cell, so changing a cell changes the key of every cell below it.
+
+    Args:
+        cells (list): Cells returned by `parse_cells`
+
+    Returns:
+        list: Hex key for each code cell, None for markdown cells
+    """
+    keys = []
+    previous = b""
+    for cell_type, text in cells:
+        if cell_type != "code":
+            keys.append(None)
+            continue
+        previous = hashlib.sha256(previous + text.encode("utf-8")).hexdigest().encode("ascii")
+        keys.append(previous.decode("ascii"))
+    return keys
+
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"script_hash": None, "cells": {}}
+
+
+def _save_cache(cache_file, cache):
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, cache_file)
+
+
+def _execute(nb, keys, py_file, timeout):
+    """
+    Run every code cell of `nb` in a fresh kernel.
+
+    Returns the outputs of the cells that succeeded, keyed by cell key, and the
+    error that stopped execution (None if every cell ran). The failing cell is
+    not included, so it runs again next time.
+    """
+    import nbformat
+    from nbclient import NotebookClient
+    from nbclient.exceptions import CellExecutionError
+
+    client = NotebookClient(nb, timeout=timeout, kernel_name="python3",
+                            resources={"metadata": {"path": os.path.dirname(py_file)}})
+    executed = {}
+    with client.setup_kernel():
+        # Scripts locate the repo through __file__, which a kernel does not define
+        setup = nbformat.v4.new_code_cell(f"__file__ = {py_file!r}")
+        client.execute_cell(setup, 0, store_history=False)
+        for index, (cell, key) in enumerate(zip(nb.cells, keys)):
+            if key is None:
+                continue
+            try:
+                client.execute_cell(cell, index)
+            except CellExecutionError:
+                return executed, RuntimeError(f"cell {index} failed")
+            executed[key] = {"outputs": cell.outputs, "execution_count": cell.execution_count}
+    return executed, None
 
-def convert_scripts_to_notebooks():
-    """Convert Python scripts with cell markers to Jupyter notebooks."""
+
+def convert_script(py_file, force=False, execute=True, timeout=600):
+    """
+    Convert one script to a notebook, reusing cached outputs where possible.
+
+    Args:
+        py_file (str): Path to the Python script
+        force (bool): Convert even if the script is unchanged
+        execute (bool): Execute code cells whose outputs are not cached
+        timeout (int): Seconds a single cell may run
+
+    Returns:
+        str: What happened, for the progress report
+    """
+    import nbformat
+
+    name = os.path.basename(py_file)
+    nb_file = os.path.splitext(py_file)[0] + ".ipynb"
+    cache_file = os.path.join(os.path.dirname(py_file), CACHE_DIR_NAME,
+                              os.path.splitext(name)[0] + ".json")
+
+    with open(py_file, "r", encoding="utf-8") as f:
+        source = f.read()
+    script_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    cache = _load_cache(cache_file)
+    if not force and cache.get("script_hash") == script_hash and os.path.exists(nb_file):
+        return f"Skipping {name} (notebook is up to date)"
+
+    cells = parse_cells(source)
+    keys = cell_keys(cells)
+    cached = cache.get("cells", {})
+
+    nb = nbformat.v4.new_notebook()
+    nb.metadata["kernelspec"] = {"name": "python3", "display_name": "Python 3", "language": "python"}
+    for (cell_type, text), key in zip(cells, keys):
+        if cell_type == "markdown":
+            nb.cells.append(nbformat.v4.new_markdown_cell(text))
+            continue
+        cell = nbformat.v4.new_code_cell(text)
+        if key in cached:
+            cell.outputs = [nbformat.from_dict(output) for output in cached[key]["outputs"]]
+            cell.execution_count = cached[key]["execution_count"]
+        nb.cells.append(cell)
+
+    code_keys = [key for key in keys if key is not None]
+    missing = [key for key in code_keys if key not in cached]
+    error = None
+    if execute and missing:
+        executed, error = _execute(nb, keys, py_file, timeout)
+        # Outputs of the cells before a failure are kept, so they are not run again
+        cached = dict(cached, **executed)
+
+    # The script only counts as converted once every code cell has its outputs;
+    # otherwise (an error, or --no-execute with new cells) the next run retries
+    complete = error is None and all(key in cached for key in code_keys)
+    # Only keep outputs the current script can still use
+    cache = {"script_hash": script_hash if complete else None,
+             "cells": {key: cached[key] for key in code_keys if key in cached}}
+    _save_cache(cache_file, cache)
+    nbformat.write(nb, nb_file)
+
+    if error is not None:
+        raise RuntimeError(f"{name}: {error}")
+    if missing and execute:
+        return f"Successfully converted {name} (executed {len(code_keys)} code cells)"
+    if missing:
+        return f"Converted {name} without outputs for {len(missing)} code cells (not executed)"
+    return f"Successfully converted {name} (reused cached outputs)"
+
+
+def convert_scripts_to_notebooks(max_workers=None, force=False, execute=True):
+    """
+    Convert Python scripts with cell markers to Jupyter notebooks.
+
+    Args:
+        max_workers (int): Number of notebooks converted at once. Defaults to one per CPU.
+        force (bool): Convert every script even if it is unchanged
+        execute (bool): Execute code cells whose outputs are not cached
+    """
     # Get the directory of this script
     script_dir = os.path.dirname(os.path.abspath(__file__))
     notebooks_dir = os.path.join(script_dir, "notebooks")
-    
+
     # Find all Python files in the notebooks directory
-    python_files = glob.glob(os.path.join(notebooks_dir, "*.py"))
-    
+    python_files = sorted(glob.glob(os.path.join(notebooks_dir, "*.py")))
+
     if not python_files:
         print("No Python files found in the notebooks directory.")
         return
-    
+
+    try:
+        import nbformat  # noqa: F401
+        if execute:
+            import nbclient  # noqa: F401
+    except ImportError:
+        print("Error: nbformat/nbclient not found. Please make sure Jupyter is installed.")
+        print("You can install it with: pip install jupyter")
+        return
+
     print(f"Found {len(python_files)} Python files to convert.")
-    
-    # Convert each Python file to a notebook
-    for py_file in python_files:
-        nb_file = py_file.replace(".py", ".ipynb")
-        
-        # Skip if the notebook already exists and is newer than the Python file
-        if os.path.exists(nb_file) and os.path.getmtime(nb_file) > os.path.getmtime(py_file):
-            print(f"Skipping {os.path.basename(py_file)} (notebook is up to date)")
-            continue
-        
-        print(f"Converting {os.path.basename(py_file)} to notebook...")
-        try:
-            subprocess.run(
-                ["jupyter", "nbconvert", "--to", "notebook", "--execute", py_file],
-                check=True
-            )
-            print(f"Successfully converted {os.path.basename(py_file)}")
-        except subprocess.CalledProcessError as e:
-            print(f"Error converting {os.path.basename(py_file)}: {e}")
-        except FileNotFoundError:
-            print("Error: jupyter command not found. Please make sure Jupyter is installed.")
-            print("You can install it with: pip install jupyter")
-            return
+
+    max_workers = max_workers or min(len(python_files), os.cpu_count() or 1)
+    failed = False
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(py_file, executor.submit(convert_script, py_file, force, execute))
+                   for py_file in python_files]
+        for py_file, future in futures:
+            try:
+                print(future.result())
+            except Exception as e:
+                print(f"Error converting {os.path.basename(py_file)}: {e}")
+                failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    """
+    Parse command line arguments and convert the notebooks.
+    """
+    parser = argparse.ArgumentParser(description="Convert cell-marked scripts in notebooks/ to Jupyter notebooks.")
+    parser.add_argument("--workers", type=int, default=None, help="Notebooks to convert in parallel")
+    parser.add_argument("--force", action="store_true", help="Convert scripts even if they are unchanged")
+    parser.add_argument("--no-execute", action="store_true", help="Only use cached outputs, never start a kernel")
+    args = parser.parse_args()
+
+    convert_scripts_to_notebooks(max_workers=args.workers, force=args.force, execute=not args.no_execute)
+
 
 if __name__ == "__main__":
-    convert_scripts_to_notebooks() 
\ No newline at end of file
+    main()
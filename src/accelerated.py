@@ -0,0 +1,259 @@
+"""
+TorchScript-accelerated encoder inference with shape bucketing.
+
+Eager PyTorch re-dispatches every operator on every call. `AcceleratedEncoder`
+traces the model once per (batch, seq_len) bucket, freezes the trace so
+weights become constants that can be folded and fused, and pads each batch up
+to the smallest bucket that fits it. Traces are saved under
+MODELS_DIR/compiled, keyed by a fingerprint of the weights, so a restarted
+process loads them instead of tracing again; a loaded trace is checked against
+eager like a new one. Batches larger than every bucket, and buckets whose trace fails or
+disagrees with eager, run eagerly.
+
+The gain is per-call overhead, so it is largest for small batches and short
+texts (the agent loop's case). On `benchmarks/bench_accelerated.py` with a
+tiny BERT, buckets of up to 512 padded tokens ran 1.5-5.5x faster than eager,
+while larger ones were no faster or slower (0.56x at 32x128), since padding
+adds work that the saved overhead no longer pays for. Inputs whose bucket
+holds more than `MAX_TRACED_TOKENS` tokens therefore run eagerly. Tracing a
+bucket takes a few seconds the first time it is needed.
+
+Use it through `load_hf_model(..., accelerate=True)`, which returns it in
+place of the model; it is called like the model and forwards every other
+attribute to it.
+"""
+
+import hashlib
+from pathlib import Path
+import sys
+import threading
+import warnings
+from typing import Dict, Optional, Sequence, Tuple
+
+import torch
+
+# Add the parent directory to the path to import the env_utils module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.env_utils import get_settings
+
+# Powers of two, so padding at most doubles the work of a batch
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32)
+SEQ_BUCKETS = (16, 32, 64, 128, 256, 512)
+
+# Largest difference from eager a trace may show on its check input
+PARITY_TOLERANCE = 1e-4
+
+# Buckets of more padded tokens (batch x seq_len) run eagerly, see the module docstring
+MAX_TRACED_TOKENS = 512
+
+
+class _HiddenStates(torch.nn.Module):
+    """Adapter that gives a Transformers encoder a traceable positional signature."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, return_dict=False)[0]
+
+
+def _hash_weights(model, digest) -> None:
+    """Add the name, shape, dtype and up to 64 evenly spaced values of every tensor of a model to a hash."""
+    with torch.no_grad():
+        for name, tensor in model.state_dict().items():
+            if not isinstance(tensor, torch.Tensor):
+                continue  # e.g. packed params of dynamically quantized layers
+            if tensor.is_quantized:
+                tensor = tensor.dequantize()
+            flat = tensor.detach().reshape(-1)
+            sample = flat[::max(1, flat.numel() // 64)][:64]
+            digest.update(f"{name}|{tuple(tensor.shape)}|{tensor.dtype}".encode("utf-8"))
+            digest.update(sample.to("cpu", torch.float64).numpy().tobytes())
+
+
+class AcceleratedEncoder:
+    """
+    Encoder model that runs frozen TorchScript traces for bucketed input shapes.
+
+    Traces are created on the first batch that needs them (or by `compile_all`)
+    and reused from disk across processes.
+    """
+
+    def __init__(self, model, cache_key: str, batch_buckets: Sequence[int] = BATCH_BUCKETS,
+                 seq_buckets: Sequence[int] = SEQ_BUCKETS, cache_dir: Optional[Path] = None,
+                 max_traced_tokens: int = MAX_TRACED_TOKENS):
+        """
+        Wrap a model loaded by `load_hf_model`.
+
+        Args:
+            model: The eager encoder model
+            cache_key (str): Identifies the model, e.g. name, revision and precision; a sample
+                of the weights is added to it
+            batch_buckets (Sequence[int]): Batch sizes to trace for
+            seq_buckets (Sequence[int]): Sequence lengths to trace for; longer ones than the
+                model's position embeddings are dropped
+            cache_dir (Optional[Path]): Where traces are saved. Defaults to MODELS_DIR/compiled.
+            max_traced_tokens (int): Largest bucket (batch x seq_len) that runs traced;
+                inputs in larger buckets run eagerly
+        """
+        self.model = model.eval()
+        self.batch_buckets = tuple(sorted(batch_buckets))
+        max_positions = getattr(model.config, "max_position_embeddings", None)
+        self.seq_buckets = tuple(sorted(s for s in seq_buckets if max_positions is None or s <= max_positions))
+        self.max_traced_tokens = max_traced_tokens
+
+        # Traces are only valid for the same weights, config and torch version. The
+        # name and revision alone do not pin the weights (a moving branch, a re-saved
+        # local directory), so a sample of every tensor goes into the key as well.
+        digest = hashlib.sha256(
+            f"{cache_key}|{torch.__version__}|{model.config.to_json_string()}".encode("utf-8")
+        )
+        _hash_weights(model, digest)
+        fingerprint = digest.hexdigest()[:16]
+        root = cache_dir if cache_dir is not None else get_settings().models_dir / "compiled"
+        self.cache_dir = Path(root) / fingerprint
+
+        self._traces: Dict[Tuple[int, int], Optional[torch.jit.ScriptModule]] = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not found on the wrapper: device, config, parameters, ...
+        return getattr(self.__dict__["model"], name)
+
+    def bucket(self, batch_size: int, seq_len: int) -> Optional[Tuple[int, int]]:
+        """
+        Find the smallest bucket an input shape fits in.
+
+        Args:
+            batch_size (int): Number of sequences
+            seq_len (int): Padded sequence length
+
+        Returns:
+            Optional[Tuple[int, int]]: (batch, seq_len) bucket, or None if the shape fits
+                none or its bucket is larger than `max_traced_tokens`
+        """
+        batch = next((b for b in self.batch_buckets if b >= batch_size), None)
+        seq = next((s for s in self.seq_buckets if s >= seq_len), None)
+        if batch is None or seq is None or batch * seq > self.max_traced_tokens:
+            return None
+        return batch, seq
+
+    def _trace_path(self, bucket: Tuple[int, int]) -> Path:
+        return self.cache_dir / f"b{bucket[0]}_s{bucket[1]}.pt"
+
+    def get_trace(self, bucket: Tuple[int, int]) -> Optional[torch.jit.ScriptModule]:
+        """
+        Get the trace of a bucket, loading or creating it on first use.
+
+        Args:
+            bucket (Tuple[int, int]): (batch, seq_len) bucket
+
+        Returns:
+            Optional[torch.jit.ScriptModule]: The frozen trace, or None if the bucket runs eagerly
+        """
+        if bucket in self._traces:
+            return self._traces[bucket]
+        with self._lock:
+            if bucket not in self._traces:
+                self._traces[bucket] = self._load_or_trace(bucket)
+        return self._traces[bucket]
+
+    def _example_inputs(self, bucket: Tuple[int, int]) -> Tuple[torch.Tensor, torch.Tensor]:
+        batch, seq = bucket
+        generator = torch.Generator().manual_seed(0)
+        vocab_size = getattr(self.model.config, "vocab_size", 100)
+        input_ids = torch.randint(0, vocab_size, (batch, seq), generator=generator).to(self.model.device)
+        # Padding in the mask, so the masked attention path is the one traced and checked
+        attention_mask = torch.ones(batch, seq, dtype=torch.long)
+        attention_mask[:, seq // 2:] = torch.arange(batch)[:, None] % 2 == 0
+        return input_ids, attention_mask.to(self.model.device)
+
+    def _difference(self, traced: torch.jit.ScriptModule, inputs: Tuple[torch.Tensor, torch.Tensor]) -> float:
+        with torch.no_grad():
+            expected = _HiddenStates(self.model).eval()(*inputs)
+            return (traced(*inputs) - expected).abs().max().item()
+
+    def _load_or_trace(self, bucket: Tuple[int, int]) -> Optional[torch.jit.ScriptModule]:
+        path = self._trace_path(bucket)
+        inputs = self._example_inputs(bucket)
+        if path.exists():
+            # A cached trace holds the weights it was traced with, so it is checked like a new one
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", FutureWarning)
+                    cached = torch.jit.load(str(path), map_location=self.model.device)
+                difference = self._difference(cached, inputs)
+            except Exception as e:
+                print(f"Warning: could not load cached trace {path}, tracing again: {e}")
+            else:
+                if difference <= PARITY_TOLERANCE:
+                    return cached
+                print(f"Warning: cached trace {path} differs from eager by {difference:.2e}, tracing again")
+
+        module = _HiddenStates(self.model).eval()
+        try:
+            with torch.no_grad(), warnings.catch_warnings():
+                # Shape-dependent branches are expected to be constant within a bucket
+                warnings.simplefilter("ignore", torch.jit.TracerWarning)
+                warnings.simplefilter("ignore", FutureWarning)
+                traced = torch.jit.freeze(torch.jit.trace(module, inputs, check_trace=False))
+            difference = self._difference(traced, inputs)
+        except Exception as e:
+            print(f"Warning: tracing bucket {bucket} failed, running it eagerly: {e}")
+            return None
+        if difference > PARITY_TOLERANCE:
+            print(f"Warning: trace for bucket {bucket} differs from eager by {difference:.2e}, "
+                  f"running it eagerly")
+            return None
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            torch.jit.save(traced, str(tmp_path))
+        tmp_path.replace(path)
+        return traced
+
+    def compile_all(self) -> Dict[Tuple[int, int], bool]:
+        """
+        Trace (or load) every bucket up to `max_traced_tokens` now instead of on first use.
+
+        Returns:
+            Dict[Tuple[int, int], bool]: Whether each bucket runs accelerated
+        """
+        return {(b, s): self.get_trace((b, s)) is not None
+                for b in self.batch_buckets for s in self.seq_buckets if b * s <= self.max_traced_tokens}
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None, **kwargs):
+        """
+        Run the encoder, through a trace when the input fits a bucket.
+
+        Args:
+            input_ids (torch.Tensor): Token ids of shape (batch, seq_len)
+            attention_mask (Optional[torch.Tensor]): 1 for tokens, 0 for padding
+            **kwargs: Other model arguments; any of them forces an eager run
+
+        Returns:
+            BaseModelOutput: Output whose `last_hidden_state` matches the eager model's
+        """
+        from transformers.modeling_outputs import BaseModelOutput
+
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        batch_size, seq_len = input_ids.shape
+        bucket = None if kwargs else self.bucket(batch_size, seq_len)
+        trace = self.get_trace(bucket) if bucket is not None else None
+        if trace is None:
+            return self.model(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+
+        batch, seq = bucket
+        padded_ids = input_ids.new_zeros((batch, seq))
+        padded_ids[:batch_size, :seq_len] = input_ids
+        padded_mask = attention_mask.new_zeros((batch, seq))
+        padded_mask[:batch_size, :seq_len] = attention_mask
+        # Padding rows attend to one token so their softmax stays finite
+        padded_mask[batch_size:, 0] = 1
+
+        hidden = trace(padded_ids, padded_mask)
+        return BaseModelOutput(last_hidden_state=hidden[:batch_size, :seq_len])
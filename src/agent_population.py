@@ -0,0 +1,164 @@
+"""
+Struct-of-arrays storage for a population of model-based agents.
+
+Instead of one `ModelBasedAgent` object with its own state dict per agent, an
+`AgentPopulation` keeps one NumPy column per state field: float32 for numeric
+fields and small integer codes for categorical ones. Updating or deciding for
+the whole population is a handful of array operations, and each agent costs
+a few bytes per field.
+"""
+
+from pathlib import Path
+import sys
+from typing import Any, Dict, Mapping, Optional
+
+import numpy as np
+
+# Add the parent directory to the path to import the agents module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.agents import HOME_RULES
+from src.rule_engine import CompiledRules
+
+# Initial state of the notebook's ModelBasedAgent
+DEFAULT_STATE = {"temperature": 22.0, "light_level": "bright", "time_of_day": "day"}
+
+# Code used in categorical percept columns for "not observed"
+MISSING = -1
+
+
+class AgentPopulation:
+    """
+    State of N model-based agents stored as columns.
+
+    Percepts are given as columns too, one array per observed field. A
+    percept may leave a field out entirely, or mark individual agents as not
+    observing it with NaN (numeric fields) or MISSING (categorical codes).
+    """
+
+    def __init__(self, size: int, rules: Optional[CompiledRules] = None,
+                 initial_state: Optional[Mapping[str, Any]] = None,
+                 log_sample_rate: float = 0.0, seed: Optional[int] = None):
+        """
+        Initialize the population.
+
+        Args:
+            size (int): Number of agents
+            rules (Optional[CompiledRules]): Decision table. Defaults to HOME_RULES.
+            initial_state (Optional[Mapping[str, Any]]): Starting value of each field.
+                Defaults to the notebook agent's initial state.
+            log_sample_rate (float): Fraction of updated agents whose new state is printed.
+                0 (the default) disables logging.
+            seed (Optional[int]): Seed for choosing which agents to log
+        """
+        if size < 0:
+            raise ValueError(f"size must not be negative, got {size}")
+        if not 0.0 <= log_sample_rate <= 1.0:
+            raise ValueError(f"log_sample_rate must be between 0 and 1, got {log_sample_rate}")
+
+        self.size = size
+        self.rules = rules if rules is not None else HOME_RULES
+        self.log_sample_rate = log_sample_rate
+        self._rng = np.random.default_rng(seed)
+        initial_state = dict(DEFAULT_STATE, **(initial_state or {}))
+
+        self.columns: Dict[str, np.ndarray] = {}
+        self._values: Dict[str, np.ndarray] = {}
+        for field in self.rules.numeric_fields:
+            self.columns[field] = np.full(size, initial_state[field], dtype=np.float32)
+        for field in self.rules.categorical_fields:
+            codes = self.rules.codes(field)
+            # The extra code is the rule table's "other" value
+            dtype = np.int8 if len(codes) < np.iinfo(np.int8).max else np.int32
+            self.columns[field] = np.full(size, self.rules.encode(field, [initial_state[field]])[0], dtype=dtype)
+            self._values[field] = np.asarray(list(codes) + [None], dtype=object)
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the state columns in bytes."""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def encode(self, field: str, values) -> np.ndarray:
+        """
+        Encode categorical values for use in a percept.
+
+        Args:
+            field (str): Name of a categorical field
+            values: Values to encode; None becomes MISSING
+
+        Returns:
+            np.ndarray: Codes for `update_state`
+        """
+        codes = self.rules.encode(field, [value for value in values])
+        missing = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+        codes[missing] = MISSING
+        return codes
+
+    def update_state(self, percepts: Mapping[str, np.ndarray],
+                     indices: Optional[np.ndarray] = None) -> None:
+        """
+        Update the state of many agents from a batch of percepts.
+
+        Args:
+            percepts (Mapping[str, np.ndarray]): One column per observed field, either a
+                mapping of arrays or a structured array. Numeric columns use NaN and
+                categorical code columns use MISSING for agents that did not observe the field.
+            indices (Optional[np.ndarray]): Agents the percept rows belong to. Defaults to all agents.
+        """
+        names = percepts.dtype.names if isinstance(percepts, np.ndarray) else percepts.keys()
+        for field in names:
+            if field not in self.columns:
+                raise KeyError(f"Unknown state field '{field}'")
+            values = np.asarray(percepts[field])
+            observed = ~np.isnan(values) if field in self.rules.numeric_fields else values != MISSING
+
+            column = self.columns[field]
+            if indices is None:
+                np.copyto(column, values, where=observed, casting="unsafe")
+            else:
+                targets = np.asarray(indices)[observed]
+                column[targets] = values[observed]
+
+        if self.log_sample_rate > 0:
+            self._log_sample(indices)
+
+    def _log_sample(self, indices: Optional[np.ndarray]) -> None:
+        candidates = np.arange(self.size) if indices is None else np.asarray(indices)
+        sampled = candidates[self._rng.random(len(candidates)) < self.log_sample_rate]
+        for agent in sampled:
+            print(f"Agent {agent} updated state: {self.state_of(int(agent))}")
+
+    def state_of(self, agent: int) -> Dict[str, Any]:
+        """
+        Get one agent's state in the notebook's dict form.
+
+        Args:
+            agent (int): Index of the agent
+
+        Returns:
+            Dict[str, Any]: Field name to value
+        """
+        state = {}
+        for field, column in self.columns.items():
+            if field in self._values:
+                state[field] = self._values[field][column[agent]]
+            else:
+                state[field] = float(column[agent])
+        return state
+
+    def act(self) -> np.ndarray:
+        """
+        Decide for every agent at once.
+
+        Returns:
+            np.ndarray: Decision ids, see `actions` and `rules.labels`
+        """
+        return self.rules.evaluate_batch(self.columns)
+
+    def actions(self) -> np.ndarray:
+        """
+        Decide for every agent and return the action strings.
+
+        Returns:
+            np.ndarray: Object array with one action string per agent
+        """
+        return self.rules.decode(self.act())
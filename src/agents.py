@@ -0,0 +1,256 @@
+"""
+Production versions of the agents from the introduction notebook.
+
+The notebook's `SimpleReflexAgent` appends every percept to a list forever,
+although it only ever acts on the latest one. The agents here keep a
+fixed-size window of recent percepts in a ring buffer and use `__slots__`, so
+their memory use stays constant no matter how long they run. Their rules are
+also available as compiled rule tables for deciding for many agents at once.
+"""
+
+from array import array
+from pathlib import Path
+import sys
+from typing import Any, Dict, Hashable, List, Optional
+
+# Add the parent directory to the path to import the rule_engine module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.rule_engine import CompiledRules, RuleTable, above, below
+
+
+class SymbolTable:
+    """
+    Interns hashable percepts as small integers.
+
+    Agents that share a table store each distinct percept once and keep only
+    its integer id in their history. Intended for categorical percepts such
+    as "too hot"; every distinct value is kept for the table's lifetime.
+    """
+
+    __slots__ = ("_ids", "_values")
+
+    def __init__(self):
+        self._ids: Dict[Hashable, int] = {}
+        self._values: List[Hashable] = []
+
+    def intern(self, value: Hashable) -> int:
+        """
+        Get the id of a value, assigning a new one if it has not been seen.
+
+        Args:
+            value (Hashable): The percept to intern
+
+        Returns:
+            int: The value's id
+        """
+        symbol = self._ids.get(value)
+        if symbol is None:
+            symbol = len(self._values)
+            self._ids[value] = symbol
+            self._values.append(value)
+        return symbol
+
+    def lookup(self, symbol: int) -> Hashable:
+        """
+        Get the value for an id.
+
+        Args:
+            symbol (int): An id returned by `intern`
+
+        Returns:
+            Hashable: The interned value
+        """
+        return self._values[symbol]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+# Table shared by every agent that interns percepts without passing its own
+DEFAULT_SYMBOLS = SymbolTable()
+
+
+class BoundedAgent:
+    """
+    Base class for agents with a fixed-size percept history.
+
+    The last `window` percepts are kept in a ring buffer; older ones are
+    overwritten. With `intern_percepts=True` the buffer is a compact integer
+    array of symbol ids instead of a list of object references.
+    Subclasses implement `act()` and declare `__slots__` of their own.
+    """
+
+    __slots__ = ("name", "verbose", "_window", "_history", "_head", "_count", "_symbols")
+
+    def __init__(self, name: str, window: int = 16, intern_percepts: bool = False,
+                 symbols: Optional[SymbolTable] = None, verbose: bool = False):
+        """
+        Initialize the agent.
+
+        Args:
+            name (str): Name of the agent
+            window (int): Number of recent percepts to remember
+            intern_percepts (bool): Store percepts as ids in a symbol table
+            symbols (Optional[SymbolTable]): Table to intern into. Defaults to DEFAULT_SYMBOLS.
+            verbose (bool): Print every percept, like the notebook agents
+        """
+        if window < 1:
+            raise ValueError(f"window must be positive, got {window}")
+
+        self.name = name
+        self.verbose = verbose
+        self._window = window
+        self._head = 0
+        self._count = 0
+        if intern_percepts:
+            self._symbols = symbols if symbols is not None else DEFAULT_SYMBOLS
+            self._history = array("l", bytes(window * array("l").itemsize))
+        else:
+            self._symbols = None
+            self._history = [None] * window
+
+    def perceive(self, percept: Any) -> None:
+        """
+        Receive a percept from the environment.
+
+        Args:
+            percept (Any): The percept; must be hashable when percepts are interned
+        """
+        if self._symbols is not None:
+            self._history[self._head] = self._symbols.intern(percept)
+        else:
+            self._history[self._head] = percept
+        self._head = (self._head + 1) % self._window
+        if self._count < self._window:
+            self._count += 1
+        if self.verbose:
+            print(f"{self.name} perceives: {percept}")
+
+    @property
+    def latest_percept(self) -> Any:
+        """The most recent percept, or None if nothing was perceived yet."""
+        if self._count == 0:
+            return None
+        value = self._history[self._head - 1]
+        return self._symbols.lookup(value) if self._symbols is not None else value
+
+    @property
+    def percepts(self) -> List[Any]:
+        """The remembered percepts, oldest first."""
+        start = (self._head - self._count) % self._window
+        indices = [(start + i) % self._window for i in range(self._count)]
+        if self._symbols is not None:
+            return [self._symbols.lookup(self._history[i]) for i in indices]
+        return [self._history[i] for i in indices]
+
+    def act(self) -> str:
+        """
+        Decide on an action.
+
+        Returns:
+            str: The chosen action
+        """
+        raise NotImplementedError
+
+
+class ReflexAgent(BoundedAgent):
+    """A simple reflex agent with a bounded percept history."""
+
+    __slots__ = ()
+
+    # Percept -> action rules of the notebook's SimpleReflexAgent
+    RULES = {
+        "too hot": "Turn on the fan",
+        "too cold": "Turn on the heater",
+        "dark": "Turn on the light",
+    }
+
+    def act(self) -> str:
+        """
+        Decide on an action based on the current percept.
+
+        Returns:
+            str: The chosen action
+        """
+        if self._count == 0:
+            return "Do nothing"
+        return self.RULES.get(self.latest_percept, "Do nothing")
+
+
+def _reflex_rules() -> CompiledRules:
+    rules = RuleTable()
+    group = rules.group()
+    for percept, action in ReflexAgent.RULES.items():
+        group.when(action, percept=percept)
+    return rules.compile()
+
+
+def _home_rules() -> CompiledRules:
+    rules = RuleTable()
+    rules.group() \
+        .when("Turn on the AC", temperature=above(25)) \
+        .when("Turn on the heater", temperature=below(18))
+    rules.group() \
+        .when("Turn on the lights", light_level="dark", time_of_day="day") \
+        .when("Turn on dim lights", light_level="dark", time_of_day="night", temperature=above(0))
+    return rules.compile(categories={"light_level": ["bright", "dark"], "time_of_day": ["day", "night"]})
+
+
+# Compiled decision tables of the notebook agents, for batch evaluation
+REFLEX_RULES = _reflex_rules()
+HOME_RULES = _home_rules()
+
+
+class ModelBasedAgent:
+    """A model-based agent whose rules are a compiled decision table."""
+
+    __slots__ = ("name", "verbose", "rules", "temperature", "light_level", "time_of_day")
+
+    STATE_FIELDS = ("temperature", "light_level", "time_of_day")
+
+    def __init__(self, name: str, rules: Optional[CompiledRules] = None, verbose: bool = False):
+        """
+        Initialize the agent.
+
+        Args:
+            name (str): Name of the agent
+            rules (Optional[CompiledRules]): Decision table. Defaults to HOME_RULES.
+            verbose (bool): Print every state update, like the notebook agent
+        """
+        self.name = name
+        self.verbose = verbose
+        self.rules = rules if rules is not None else HOME_RULES
+        self.temperature = 22  # in Celsius
+        self.light_level = "bright"
+        self.time_of_day = "day"
+
+    @property
+    def internal_state(self) -> Dict[str, Any]:
+        """The agent's model of the world."""
+        return {
+            "temperature": self.temperature,
+            "light_level": self.light_level,
+            "time_of_day": self.time_of_day,
+        }
+
+    def update_state(self, percept: Dict[str, Any]) -> None:
+        """
+        Update the internal state based on a percept.
+
+        Args:
+            percept (Dict[str, Any]): Observed values of some of the state fields
+        """
+        for field in self.STATE_FIELDS:
+            if field in percept:
+                setattr(self, field, percept[field])
+        if self.verbose:
+            print(f"{self.name} updated state: {self.internal_state}")
+
+    def act(self) -> str:
+        """
+        Decide on an action based on the internal state.
+
+        Returns:
+            str: The chosen action(s), joined with ", "
+        """
+        return self.rules.evaluate(self.internal_state)
@@ -0,0 +1,361 @@
+"""
+Persistent on-disk cache for text embeddings.
+
+Vectors live in a memory-mapped float32 file next to a JSON index that maps a
+hash of each text to its row and a checksum of its vector. Every combination of
+the settings that change the vectors (model, revision, pooling, precision and
+max_length) gets its own cache directory, so a lookup is keyed by all of them
+and the text hash. Only texts that miss the cache are sent to the model.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+import sys
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+# Add the parent directory to the path to import the env_utils module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.env_utils import get_settings
+
+INDEX_FILE = "index.json"
+VECTORS_FILE = "vectors.f32"
+
+
+def text_hash(text: str) -> str:
+    """
+    Hash a text for use as a cache key.
+
+    Args:
+        text (str): The text to hash
+
+    Returns:
+        str: Hex digest of the text's UTF-8 bytes
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def default_cache_dir() -> Path:
+    """
+    Get the default cache location under DATA_DIR.
+
+    Returns:
+        Path: DATA_DIR/embedding_cache
+    """
+    return get_settings().data_dir / "embedding_cache"
+
+
+def _namespace(model_name: str, revision: Optional[str], pooling: str, precision: str,
+               max_length: int) -> str:
+    safe_model = model_name.strip("/").replace("/", "--")
+    return f"{safe_model}@{revision or 'default'}@{pooling}@{precision}@{max_length}"
+
+
+def _checksum(vector: np.ndarray) -> int:
+    return zlib.crc32(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+
+
+class EmbeddingCache:
+    """
+    Fixed-capacity embedding cache backed by a memory-mapped file.
+
+    The cache holds at most `max_entries` vectors. When it is full the least
+    recently used row is overwritten. The index is written atomically on
+    `flush()`, but rows are overwritten in place, so after a crash the index
+    on disk may point at rows that have since been reused for other texts.
+    Each index entry therefore carries a checksum of its vector, and an entry
+    read back from disk is checked on its first hit and dropped (counted as a
+    miss) if the row no longer matches. A crash thus loses entries but never
+    serves a wrong vector. The cache is safe to share between threads of one
+    process, but not between processes.
+    """
+
+    def __init__(self, cache_dir: Path, max_entries: int = 100_000):
+        """
+        Open (or create) a cache directory.
+
+        Args:
+            cache_dir (Path): Directory holding the vectors and index files
+            max_entries (int): Maximum number of cached vectors
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._checksums: Dict[str, int] = {}
+        # Entries read from disk whose rows have not been checked against their checksum yet
+        self._unverified: Set[str] = set()
+        self._dirty = False
+        self._free_rows: List[int] = []
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self) -> None:
+        index_path = self.cache_dir / INDEX_FILE
+        vectors_path = self.cache_dir / VECTORS_FILE
+        if not index_path.exists() or not vectors_path.exists():
+            return
+
+        with open(index_path, "r") as f:
+            index = json.load(f)
+
+        stored_capacity = index["max_entries"]
+        self.dim = index["dim"]
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(stored_capacity, self.dim))
+        # The file was created for a fixed capacity, so keep using it
+        self.max_entries = stored_capacity
+        for entry in index["rows"]:
+            if len(entry) != 3:
+                continue  # written before checksums were stored; cannot be trusted
+            key, row, checksum = entry
+            self._rows[key] = row
+            self._checksums[key] = checksum
+            self._unverified.add(key)
+        used = set(self._rows.values())
+        self._free_rows = [row for row in range(stored_capacity - 1, -1, -1) if row not in used]
+
+    def _create_vectors(self, dim: int) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self._vectors = np.memmap(self.cache_dir / VECTORS_FILE, dtype=np.float32, mode="w+",
+                                  shape=(self.max_entries, dim))
+        self._free_rows = list(range(self.max_entries - 1, -1, -1))
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Look up a vector by key.
+
+        Args:
+            key (str): Text hash, as returned by `text_hash`
+
+        Returns:
+            Optional[np.ndarray]: A copy of the cached vector, or None
+        """
+        with self._lock:
+            row = self._lookup_locked(key)
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # A copy: the row is reused for another text once it is evicted
+            return np.array(self._vectors[row])
+
+    def _lookup_locked(self, key: str) -> Optional[int]:
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        if key in self._unverified:
+            self._unverified.discard(key)
+            if _checksum(self._vectors[row]) != self._checksums[key]:
+                # The row was reused after the index on disk was written
+                del self._rows[key]
+                del self._checksums[key]
+                self._free_rows.append(row)
+                self._dirty = True
+                return None
+        self._rows.move_to_end(key)
+        return row
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        """
+        Store a vector, evicting the least recently used entry if full.
+
+        Args:
+            key (str): Text hash, as returned by `text_hash`
+            vector (np.ndarray): 1-D embedding
+        """
+        with self._lock:
+            self._put_locked(key, vector)
+
+    def _put_locked(self, key: str, vector: np.ndarray) -> None:
+        if self._vectors is None:
+            self._create_vectors(vector.shape[-1])
+        if vector.shape[-1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vector.shape[-1]}")
+
+        row = self._rows.get(key)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                evicted, row = self._rows.popitem(last=False)
+                del self._checksums[evicted]
+                self._unverified.discard(evicted)
+                self.evictions += 1
+            self._rows[key] = row
+        else:
+            self._rows.move_to_end(key)
+            self._unverified.discard(key)
+        self._vectors[row] = vector
+        self._checksums[key] = _checksum(self._vectors[row])
+        self._dirty = True
+
+    def embed(self, texts: Sequence[str],
+              embed_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Embed texts, computing only the ones missing from the cache.
+
+        Args:
+            texts (Sequence[str]): Texts to embed
+            embed_fn (Callable[[List[str]], np.ndarray]): Embeds a list of texts
+                and returns an array of shape (len(texts), dim)
+
+        Returns:
+            np.ndarray: float32 array of shape (len(texts), dim) in input order
+        """
+        keys = [text_hash(text) for text in texts]
+
+        # Copy the hits while holding the lock, so a concurrent insert cannot
+        # overwrite their rows before they are read
+        with self._lock:
+            rows = [self._lookup_locked(key) for key in keys]
+            hit_positions = [i for i, row in enumerate(rows) if row is not None]
+            hit_vectors = self._vectors[[rows[i] for i in hit_positions]] if hit_positions else None
+            self.hits += len(hit_positions)
+            self.misses += len(texts) - len(hit_positions)
+
+        # Deduplicate the misses so repeated texts are only embedded once
+        missing: Dict[str, int] = {}
+        for i, (key, row) in enumerate(zip(keys, rows)):
+            if row is None and key not in missing:
+                missing[key] = i
+
+        computed = None
+        if missing:
+            computed = np.asarray(embed_fn([texts[i] for i in missing.values()]), dtype=np.float32)
+            with self._lock:
+                for key, vector in zip(missing.keys(), computed):
+                    self._put_locked(key, vector)
+
+        dim = computed.shape[1] if computed is not None else (self.dim or 0)
+        result = np.empty((len(texts), dim), dtype=np.float32)
+        if hit_vectors is not None:
+            result[hit_positions] = hit_vectors
+        if computed is not None:
+            miss_rows = {key: j for j, key in enumerate(missing)}
+            miss_positions = [i for i, row in enumerate(rows) if row is None]
+            result[miss_positions] = computed[[miss_rows[keys[i]] for i in miss_positions]]
+
+        return result
+
+    def flush(self) -> None:
+        """Write the vectors and the index to disk, if anything changed since the last flush."""
+        with self._lock:
+            if self._vectors is None or not self._dirty:
+                return
+            self._vectors.flush()
+            index = {
+                "dim": self.dim,
+                "max_entries": self.max_entries,
+                "rows": [(key, row, self._checksums[key]) for key, row in self._rows.items()],
+            }
+            tmp_path = self.cache_dir / (INDEX_FILE + ".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.cache_dir / INDEX_FILE)
+            self._dirty = False
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report cache counters.
+
+        Returns:
+            Dict[str, int]: hits, misses, evictions, entries and max_entries
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._rows),
+                "max_entries": self.max_entries,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str, revision: Optional[str] = None, pooling: str = "mean",
+                        cache_dir: Optional[str] = None, max_entries: int = 100_000,
+                        precision: str = "fp32", max_length: int = 512) -> EmbeddingCache:
+    """
+    Get the shared cache for a model, opening it on first use.
+
+    Args:
+        model_name (str): Name of the embedding model
+        revision (Optional[str]): Model revision
+        pooling (str): Pooling used to produce the vectors
+        cache_dir (Optional[str]): Root directory. Defaults to DATA_DIR/embedding_cache.
+        max_entries (int): Capacity used when the cache is first created
+        precision (str): Model precision used to produce the vectors
+        max_length (int): Token limit the texts were truncated to
+
+    Returns:
+        EmbeddingCache: The cache for this model, revision, pooling, precision and max_length
+    """
+    root = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    path = root / _namespace(model_name, revision, pooling, precision, max_length)
+    key = str(path.resolve())
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = EmbeddingCache(path, max_entries=max_entries)
+            _caches[key] = cache
+    return cache
+
+
+def cached_embed_texts(texts: Sequence[str], model_name: Optional[str] = None,
+                       revision: Optional[str] = None, pooling: str = "mean",
+                       cache_dir: Optional[str] = None, precision: str = "fp32", max_length: int = 512,
+                       **embed_kwargs) -> np.ndarray:
+    """
+    Embed texts through the on-disk cache, running the model only on misses.
+
+    Args:
+        texts (Sequence[str]): Texts to embed
+        model_name (Optional[str]): Model to use. Defaults to the EMBEDDING_MODEL environment variable.
+        revision (Optional[str]): Model revision
+        pooling (str): "mean" or "cls"
+        cache_dir (Optional[str]): Root directory. Defaults to DATA_DIR/embedding_cache.
+        precision (str): Model precision, see `load_hf_model`
+        max_length (int): Truncate texts to this many tokens
+        **embed_kwargs: Passed on to `src.utils.embed_texts` (batch_size, device); they
+            must not change the vectors, since they are not part of the cache key
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), hidden_size)
+    """
+    from src.utils import embed_texts
+
+    if model_name is None:
+        model_name = get_settings().embedding_model
+    cache = get_embedding_cache(model_name, revision=revision, pooling=pooling, cache_dir=cache_dir,
+                                precision=precision, max_length=max_length)
+
+    def _embed_misses(missing_texts):
+        return embed_texts(missing_texts, model_name=model_name, revision=revision, pooling=pooling,
+                           precision=precision, max_length=max_length, **embed_kwargs)
+
+    result = cache.embed(list(texts), _embed_misses)
+    # A no-op when every text was a hit
+    cache.flush()
+    return result
@@ -4,42 +4,190 @@ Utility functions for loading environment variables.
 
 import os
 import sys
+import threading
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional, Tuple
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", '"': '"', "\\": "\\", "$": "$"}
+
+# Parsed .env files keyed by path, stored with the (mtime, size, inode) they were parsed at
+# and the os.environ values their ${VAR} references were expanded with
+_env_file_cache: Dict[str, Tuple[Optional[Tuple[int, int, int]], Dict[str, str],
+                                 Dict[str, Optional[str]]]] = {}
+_env_file_cache_lock = threading.Lock()
+
+
+def _expand(text: str, pos: int, variables: Dict[str, str],
+            environ_used: Dict[str, Optional[str]]) -> Tuple[str, int]:
+    """Expand the ${VAR} reference starting at text[pos] == '$', recording os.environ lookups."""
+    end = text.find("}", pos + 2)
+    if end == -1:
+        return "$", pos + 1
+    name = text[pos + 2:end]
+    value = variables.get(name)
+    if value is None:
+        value = os.environ.get(name)
+        environ_used[name] = value
+    return value or "", end + 1
+
+
+def parse_env(text: str) -> Dict[str, str]:
+    """
+    Parse the contents of a .env file in a single pass.
+    
+    Supported syntax:
+    - `KEY=value` and `export KEY=value`, with `#` comments
+    - Unquoted values, trimmed, with an inline comment after whitespace removed
+    - Double-quoted values with \\n, \\t, \\r, \\", \\\\ and \\$ escapes, which may span lines
+    - Single-quoted values, taken literally
+    - `${VAR}` expansion in unquoted and double-quoted values, looking up
+      variables defined earlier in the file first and then os.environ
+    
+    Lines without an `=` are ignored.
+    
+    Args:
+        text (str): Contents of the .env file
+        
+    Returns:
+        Dict[str, str]: Dictionary of environment variables
+    """
+    return _parse_env(text, {})
+
+
+def _parse_env(text: str, environ_used: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """`parse_env` that also records the os.environ value of every variable it expanded from there."""
+    env_vars: Dict[str, str] = {}
+    pos = 0
+    length = len(text)
+    
+    while pos < length:
+        # Skip leading whitespace and blank lines
+        while pos < length and text[pos] in " \t\r\n":
+            pos += 1
+        if pos >= length:
+            break
+        
+        line_end = text.find("\n", pos)
+        if line_end == -1:
+            line_end = length
+        
+        if text[pos] == "#":
+            pos = line_end + 1
+            continue
+        
+        if text.startswith("export", pos) and pos + 6 < length and text[pos + 6] in " \t":
+            pos += 7
+        
+        equals = text.find("=", pos, line_end)
+        if equals == -1:
+            pos = line_end + 1
+            continue
+        key = text[pos:equals].strip()
+        pos = equals + 1
+        
+        # Skip whitespace between '=' and the value
+        while pos < line_end and text[pos] in " \t":
+            pos += 1
+        
+        quote = text[pos] if pos < length else ""
+        chars = []
+        if quote == "'":
+            end = text.find("'", pos + 1)
+            if end == -1:
+                end = length
+            chars.append(text[pos + 1:end])
+            pos = end + 1
+        elif quote == '"':
+            pos += 1
+            while pos < length and text[pos] != '"':
+                char = text[pos]
+                if char == "\\" and pos + 1 < length:
+                    escaped = text[pos + 1]
+                    chars.append(_ESCAPES.get(escaped, "\\" + escaped))
+                    pos += 2
+                elif char == "$" and text.startswith("${", pos):
+                    value, pos = _expand(text, pos, env_vars, environ_used)
+                    chars.append(value)
+                else:
+                    chars.append(char)
+                    pos += 1
+            pos += 1
+        else:
+            after_space = True
+            while pos < line_end:
+                char = text[pos]
+                if char == "#" and after_space:
+                    break
+                if char == "$" and text.startswith("${", pos):
+                    value, pos = _expand(text, pos, env_vars, environ_used)
+                    chars.append(value)
+                    after_space = False
+                else:
+                    chars.append(char)
+                    after_space = char in " \t"
+                    pos += 1
+            chars = ["".join(chars).strip()]
+        
+        # Ignore anything after the value (trailing whitespace or a comment)
+        line_end = text.find("\n", pos)
+        pos = length if line_end == -1 else line_end + 1
+        
+        if key:
+            env_vars[key] = "".join(chars)
+    
+    return env_vars
 
 def load_env_file(env_path: str) -> Dict[str, str]:
     """
     Load environment variables from a .env file.
     
+    Parsed files are cached by path and re-read only when their modification
+    time, size or inode changes, or when a variable that a `${VAR}` reference
+    was expanded from os.environ changed, so repeat calls cost a single stat().
+    
     Args:
         env_path (str): Path to the .env file
         
     Returns:
         Dict[str, str]: Dictionary of environment variables
     """
-    env_vars = {}
-    
+    env_path = str(env_path)
     try:
-        with open(env_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                # Skip empty lines and comments
-                if not line or line.startswith('#'):
-                    continue
-                
-                # Parse key-value pairs
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    env_vars[key.strip()] = value.strip()
+        stat = os.stat(env_path)
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
     except FileNotFoundError:
+        stamp = None
+    
+    with _env_file_cache_lock:
+        cached = _env_file_cache.get(env_path)
+    if (cached is not None and cached[0] == stamp
+            and all(os.environ.get(name) == value for name, value in cached[2].items())):
+        return dict(cached[1])
+    
+    env_vars = {}
+    environ_used: Dict[str, Optional[str]] = {}
+    if stamp is None:
         print(f"Warning: Environment file {env_path} not found.")
+    else:
+        try:
+            with open(env_path, 'r') as f:
+                env_vars = _parse_env(f.read(), environ_used)
+        except FileNotFoundError:
+            print(f"Warning: Environment file {env_path} not found.")
+            stamp = None
     
-    return env_vars
+    with _env_file_cache_lock:
+        _env_file_cache[env_path] = (stamp, env_vars, environ_used)
+    
+    return dict(env_vars)
 
 def load_env(env_file: Optional[str] = None) -> Dict[str, str]:
     """
     Load environment variables from a .env file and set them in os.environ.
     
+    Only variables whose value differs from os.environ are written, so calling
+    this again for an unchanged file is cheap.
+    
     Args:
         env_file (Optional[str]): Path to the .env file. If None, will look for .env in the project root.
         
@@ -57,7 +205,8 @@ def load_env(env_file: Optional[str] = None) -> Dict[str, str]:
     
     # Set environment variables
     for key, value in env_vars.items():
-        os.environ[key] = value
+        if os.environ.get(key) != value:
+            os.environ[key] = value
     
     return env_vars
 
@@ -93,6 +242,179 @@ def require_env(key: str) -> str:
                          f"Please set it in your .env file or environment.")
     return value
 
+def _parse_bool(value: str) -> bool:
+    lowered = value.strip().lower()
+    if lowered in ("1", "true", "yes", "on"):
+        return True
+    if lowered in ("0", "false", "no", "off", ""):
+        return False
+    raise ValueError(f"expected a boolean (true/false, yes/no, on/off, 1/0), got '{value}'")
+
+def _parse_list(value: str) -> Tuple[str, ...]:
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+def _parse_path(value: str) -> Path:
+    return Path(value).expanduser()
+
+def _parse_optional_str(value: str) -> Optional[str]:
+    return value or None
+
+def _positive(value) -> Optional[str]:
+    return None if value is None or value > 0 else "must be positive"
+
+def _non_negative(value) -> Optional[str]:
+    return None if value is None or value >= 0 else "must not be negative"
+
+class SettingField(NamedTuple):
+    """Declaration of one typed setting read from an environment variable."""
+    name: str
+    env_key: str
+    parse: Callable[[str], Any]
+    default: Any
+    validate: Optional[Callable[[Any], Optional[str]]] = None
+    secret: bool = False
+
+# Every setting, its environment variable, type and default, declared in one place
+SETTINGS_FIELDS: Tuple[SettingField, ...] = (
+    SettingField("huggingface_token", "HUGGINGFACE_TOKEN", _parse_optional_str, None, secret=True),
+    SettingField("openai_api_key", "OPENAI_API_KEY", _parse_optional_str, None, secret=True),
+    SettingField("model_name", "MODEL_NAME", str, "default-model"),
+    SettingField("embedding_model", "EMBEDDING_MODEL", str, "prajjwal1/bert-tiny"),
+    SettingField("preload_models", "PRELOAD_MODELS", _parse_list, ()),
+    SettingField("gym_env", "GYM_ENV", str, "CartPole-v1"),
+    SettingField("debug_mode", "DEBUG_MODE", _parse_bool, False),
+    SettingField("api_timeout", "API_TIMEOUT", float, 10.0, _positive),
+    SettingField("api_retries", "API_RETRIES", int, 1, _non_negative),
+    SettingField("data_dir", "DATA_DIR", _parse_path, Path("./data")),
+    SettingField("models_dir", "MODELS_DIR", _parse_path, Path("./models")),
+    SettingField("models_offline", "MODELS_OFFLINE", _parse_bool, False),
+    SettingField("model_registry_max_bytes", "MODEL_REGISTRY_MAX_BYTES", int, None, _positive),
+    SettingField("token_cache_max_entries", "TOKEN_CACHE_MAX_ENTRIES", int, 10_000, _non_negative),
+    SettingField("instrumentation", "INSTRUMENTATION", _parse_bool, False),
+    SettingField("metrics_port", "METRICS_PORT", int, None, _positive),
+)
+
+class Settings:
+    """
+    Immutable, typed snapshot of the configuration.
+    
+    Values are parsed and validated once when the snapshot is built, so reading
+    a setting is plain attribute access. Use `get_settings()` to get the
+    current snapshot and `reload()` to replace it.
+    """
+    
+    __slots__ = tuple(field.name for field in SETTINGS_FIELDS)
+    
+    def __init__(self, **values: Any):
+        for field in SETTINGS_FIELDS:
+            object.__setattr__(self, field.name, values.get(field.name, field.default))
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Settings are read-only, use reload() to pick up new values")
+    
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "Settings":
+        """
+        Build settings from environment variables.
+        
+        Args:
+            environ (Optional[Mapping[str, str]]): Variables to read. Defaults to os.environ.
+            
+        Returns:
+            Settings: The parsed settings
+            
+        Raises:
+            ValueError: If any variable cannot be parsed or fails validation
+        """
+        if environ is None:
+            environ = os.environ
+        
+        values = {}
+        errors = []
+        for field in SETTINGS_FIELDS:
+            raw = environ.get(field.env_key)
+            if raw is None:
+                values[field.name] = field.default
+                continue
+            try:
+                value = field.parse(raw)
+            except ValueError as e:
+                errors.append(f"{field.env_key}: {e}")
+                continue
+            problem = field.validate(value) if field.validate is not None else None
+            if problem:
+                errors.append(f"{field.env_key}: {problem}, got '{raw}'")
+                continue
+            values[field.name] = value
+        
+        if errors:
+            raise ValueError("Invalid settings:\n" + "\n".join(f"- {error}" for error in errors))
+        
+        return cls(**values)
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Get the settings as a dictionary.
+        
+        Returns:
+            Dict[str, Any]: Setting names mapped to their values
+        """
+        return {field.name: getattr(self, field.name) for field in SETTINGS_FIELDS}
+    
+    def __repr__(self) -> str:
+        parts = []
+        for field in SETTINGS_FIELDS:
+            value = getattr(self, field.name)
+            if field.secret and value is not None:
+                value = "***"
+            parts.append(f"{field.name}={value!r}")
+        return f"Settings({', '.join(parts)})"
+
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+
+def get_settings() -> Settings:
+    """
+    Get the current settings snapshot, building it on first use.
+    
+    Keep a reference to the returned object to read several settings
+    consistently; it never changes, even if `reload()` runs concurrently.
+    
+    Returns:
+        Settings: The current settings
+    """
+    settings = _settings
+    if settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _swap_settings(Settings.from_env())
+            settings = _settings
+    return settings
+
+def reload(env_file: Optional[str] = None) -> Settings:
+    """
+    Reload the .env file and atomically replace the settings snapshot.
+    
+    The new snapshot is fully built and validated before it is published, so
+    other threads see either the old or the new settings, never a mix. If
+    validation fails, the old snapshot stays in place.
+    
+    Args:
+        env_file (Optional[str]): Path to the .env file. If None, will look for .env in the project root.
+        
+    Returns:
+        Settings: The new settings
+    """
+    with _settings_lock:
+        load_env(env_file)
+        settings = Settings.from_env()
+        _swap_settings(settings)
+    return settings
+
+def _swap_settings(settings: Settings) -> None:
+    global _settings
+    _settings = settings
+
 # Load environment variables when this module is imported
 if __name__ != "__main__":
     load_env() 
\ No newline at end of file
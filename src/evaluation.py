@@ -0,0 +1,164 @@
+"""
+Parallel policy evaluation over a process pool.
+
+Every episode gets its own seed derived from a base seed, and each episode
+resets its environment and seeds its action space with that seed. Stochastic
+policies (`stochastic=True`) also get a random generator seeded from it. The
+outcome of an episode therefore depends only on its index, never on which
+worker ran it, so results are bit-identical for any number of workers, as
+long as the policy is deterministic or draws its randomness only from that
+generator or the action space (not from the global `random` or `np.random`
+state).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import sys
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Add the parent directory to the path to import the instrumentation module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.instrumentation import increment, timer
+
+
+def simple_policy(observation):
+    """
+    Push the cart in the direction the pole is leaning.
+
+    This is the policy from the introduction notebook, defined at module level
+    so that worker processes can import it.
+
+    Args:
+        observation (np.ndarray): A single CartPole observation
+
+    Returns:
+        int: 1 (push right) if the pole leans right, otherwise 0 (push left)
+    """
+    pole_angle = observation[2]
+    return 1 if pole_angle > 0 else 0
+
+
+def episode_seeds(num_episodes: int, base_seed: int = 42) -> np.ndarray:
+    """
+    Derive independent per-episode seeds from a base seed.
+
+    Args:
+        num_episodes (int): Number of seeds to generate
+        base_seed (int): Seed the whole evaluation is reproducible from
+
+    Returns:
+        np.ndarray: uint32 array of shape (num_episodes,)
+    """
+    return np.random.SeedSequence(base_seed).generate_state(num_episodes)
+
+
+def run_episode(env, policy: Callable[..., Any], seed: int,
+                max_steps: Optional[int] = None, stochastic: bool = False) -> Tuple[float, int]:
+    """
+    Run one seeded episode.
+
+    Args:
+        env (gym.Env): Environment to run in; it is reset and its action space seeded with `seed`
+        policy (Callable[..., Any]): Maps an observation to an action
+        seed (int): Seed for `env.reset`, the action space and the policy's generator
+        max_steps (Optional[int]): Stop after this many steps even if the episode is not over
+        stochastic (bool): Call `policy(observation, rng)` with a `np.random.Generator`
+            seeded from `seed`, instead of `policy(observation)`
+
+    Returns:
+        Tuple[float, int]: Total reward and number of steps
+    """
+    observation, info = env.reset(seed=int(seed))
+    env.action_space.seed(int(seed))
+    # A stream independent of the one env.reset derives from the same seed
+    rng = np.random.default_rng([int(seed), 1]) if stochastic else None
+    total_reward = 0.0
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        action = policy(observation, rng) if stochastic else policy(observation)
+        with timer("env_step_seconds"):
+            observation, reward, terminated, truncated, info = env.step(action)
+        total_reward += float(reward)
+        steps += 1
+        if terminated or truncated:
+            break
+    increment("env_steps_total", steps)
+    return total_reward, steps
+
+
+def _run_chunk(env_name: str, policy: Callable[..., Any], seeds: Sequence[int],
+               max_steps: Optional[int], stochastic: bool) -> List[Tuple[float, int]]:
+    import gymnasium as gym
+
+    env = gym.make(env_name)
+    try:
+        return [run_episode(env, policy, seed, max_steps, stochastic) for seed in seeds]
+    finally:
+        env.close()
+
+
+def evaluate_policy(policy: Callable[..., Any], env_name: str = "CartPole-v1",
+                    num_episodes: int = 100, base_seed: int = 42,
+                    max_workers: Optional[int] = None, max_steps: Optional[int] = None,
+                    chunks_per_worker: int = 4, stochastic: bool = False) -> Dict[str, Any]:
+    """
+    Evaluate a policy over many episodes in parallel.
+
+    The policy must be picklable, i.e. defined at module level rather than
+    inside a function or notebook cell.
+
+    Args:
+        policy (Callable[..., Any]): Maps a single observation to an action
+        env_name (str): Name of the Gymnasium environment
+        num_episodes (int): Number of episodes to run
+        base_seed (int): Seed the per-episode seeds are derived from
+        max_workers (Optional[int]): Worker processes. Defaults to the number of CPU cores.
+            With 1 worker the episodes run in this process.
+        max_steps (Optional[int]): Per-episode step limit on top of the environment's own
+        chunks_per_worker (int): Episodes are split into this many batches per worker
+        stochastic (bool): Call `policy(observation, rng)` with a per-episode
+            `np.random.Generator`, so a random policy is reproducible too
+
+    Returns:
+        Dict[str, Any]: Per-episode "returns", "lengths" and "seeds" arrays plus
+            mean/std/min/max return and mean length
+    """
+    if num_episodes < 1:
+        raise ValueError(f"num_episodes must be positive, got {num_episodes}")
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    seeds = episode_seeds(num_episodes, base_seed)
+    num_chunks = min(num_episodes, max_workers * chunks_per_worker)
+    chunks = [chunk.tolist() for chunk in np.array_split(seeds, num_chunks)]
+
+    if max_workers == 1:
+        chunk_results = [_run_chunk(env_name, policy, chunk, max_steps, stochastic) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunk_results = list(executor.map(
+                _run_chunk,
+                [env_name] * num_chunks,
+                [policy] * num_chunks,
+                chunks,
+                [max_steps] * num_chunks,
+                [stochastic] * num_chunks,
+            ))
+
+    results = [result for chunk in chunk_results for result in chunk]
+    returns = np.array([total_reward for total_reward, _ in results], dtype=np.float64)
+    lengths = np.array([steps for _, steps in results], dtype=np.int64)
+
+    return {
+        "returns": returns,
+        "lengths": lengths,
+        "seeds": seeds,
+        "mean_return": float(returns.mean()),
+        "std_return": float(returns.std()),
+        "min_return": float(returns.min()),
+        "max_return": float(returns.max()),
+        "mean_length": float(lengths.mean()),
+    }
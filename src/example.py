@@ -8,8 +8,9 @@ from pathlib import Path
 
 # Add the parent directory to the path to import the utils module
 sys.path.append(str(Path(__file__).parent.parent))
-from src.utils import check_environment, load_hf_model, create_agent_environment
-from src.env_utils import get_env, require_env
+from src.utils import check_environment, load_hf_model, embed_texts, create_agent_environment
+from src.env_utils import get_env, get_settings, require_env
+from src.trajectory import TrajectoryRecorder, TrajectoryReader
 
 def main():
     """
@@ -29,14 +30,21 @@ def main():
         print(f"Using environment from config: {env_name}")
         env = create_agent_environment(env_name)
         
-        # Run a few random steps
-        observation, info = env.reset(seed=42)
-        for i in range(5):
-            action = env.action_space.sample()  # Random action
-            observation, reward, terminated, truncated, info = env.step(action)
-            print(f"Step {i+1}: Action={action}, Reward={reward}")
+        # Run a few random steps and record them for offline analysis
+        trajectory_dir = get_settings().data_dir / "trajectories" / "example"
+        with TrajectoryRecorder.for_env(trajectory_dir, env, overwrite=True) as recorder:
+            observation, info = env.reset(seed=42)
+            for i in range(5):
+                action = env.action_space.sample()  # Random action
+                next_observation, reward, terminated, truncated, info = env.step(action)
+                recorder.record(observation, action, reward, terminated, truncated)
+                print(f"Step {i+1}: Action={action}, Reward={reward}")
+                observation = next_observation
+                if terminated or truncated:
+                    observation, info = env.reset()
         
         env.close()
+        print(f"Recorded {len(TrajectoryReader(trajectory_dir))} steps to {trajectory_dir}")
     except ImportError:
         print("Gymnasium not installed. Skipping environment creation.")
     
@@ -63,6 +71,14 @@ def main():
         outputs = model(**inputs)
         
         print(f"Model output shape: {outputs.last_hidden_state.shape}")
+        
+        # Embed several texts at once with batched, padded forward passes
+        embeddings = embed_texts([
+            "Hello, I'm learning about AI agents!",
+            "Agents perceive their environment and act upon it.",
+            "Reinforcement learning trains agents from rewards.",
+        ], model_name=model_name)
+        print(f"Batch embeddings shape: {embeddings.shape}")
     except Exception as e:
         print(f"Error loading model: {e}")
 
@@ -0,0 +1,241 @@
+"""
+Asynchronous micro-batching for embedding requests.
+
+Many coroutines asking for one embedding each would otherwise run one forward
+pass each. `InferenceBatcher` queues their requests, groups them into a single
+padded forward pass once `max_batch_size` requests are waiting or the oldest
+one has waited `max_wait_ms`, runs the pass in a worker thread so the event
+loop stays responsive, and hands every caller its own row of the result.
+"""
+
+import asyncio
+import functools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Add the parent directory to the path to import the utils module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.utils import embed_batch
+
+
+def _fail(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_exception(RuntimeError("InferenceBatcher was stopped"))
+
+
+class InferenceBatcher:
+    """
+    Batch concurrent embedding requests into shared forward passes.
+
+    The request queue is bounded: once `max_queue_size` requests are waiting,
+    `embed()` blocks its caller until there is room again (backpressure).
+
+    Example:
+        tokenizer, model = load_hf_model("prajjwal1/bert-tiny")
+        async with InferenceBatcher(tokenizer, model, max_batch_size=32, max_wait_ms=5) as batcher:
+            vectors = await asyncio.gather(*(batcher.embed(text) for text in texts))
+    """
+
+    def __init__(self, tokenizer, model, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 max_queue_size: int = 1024, pooling: str = "mean", max_length: int = 512,
+                 latency_window: int = 10_000):
+        """
+        Initialize the batcher.
+
+        Args:
+            tokenizer: Tokenizer returned by `load_hf_model`
+            model: Model returned by `load_hf_model`
+            max_batch_size (int): Flush as soon as this many requests are queued
+            max_wait_ms (float): Flush once the oldest queued request has waited this long
+            max_queue_size (int): Number of waiting requests before callers are blocked
+            pooling (str): "mean" or "cls", see `embed_batch`
+            max_length (int): Truncate texts to this many tokens
+            latency_window (int): Number of recent requests the latency percentiles cover
+        """
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be positive, got {max_batch_size}")
+        if max_wait_ms < 0:
+            raise ValueError(f"max_wait_ms must not be negative, got {max_wait_ms}")
+
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.pooling = pooling
+        self.max_length = max_length
+
+        self.requests = 0
+        self.batches = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopped = False
+
+    async def start(self) -> None:
+        """Start the batching worker on the running event loop, also after `stop()`."""
+        if self._worker is not None:
+            return
+        self._stopped = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        # One thread: forward passes run one at a time and torch parallelizes each of them
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference-batcher")
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the worker and fail every request that has not been answered.
+
+        Later `embed()` calls raise RuntimeError until `start()` is called again.
+        """
+        if self._worker is None:
+            return
+        self._stopped = True
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        # Callers blocked on a full queue are woken by this and fail in `embed()`
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            _fail(future)
+        # The worker may have been cancelled mid forward pass; wait for it off the event loop
+        executor, self._executor = self._executor, None
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(executor.shutdown, wait=True))
+
+    async def __aenter__(self) -> "InferenceBatcher":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed one text as part of the next batch.
+
+        Args:
+            text (str): Text to embed
+
+        Returns:
+            np.ndarray: float32 vector of shape (hidden_size,)
+        """
+        if self._stopped:
+            raise RuntimeError("InferenceBatcher was stopped")
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queue
+        await queue.put((text, future, time.perf_counter()))
+        if self._stopped or queue is not self._queue:
+            # Stopped while this call waited for room; nobody will read the queue
+            raise RuntimeError("InferenceBatcher was stopped")
+        return await future
+
+    async def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed several texts concurrently through the batcher.
+
+        Args:
+            texts (Sequence[str]): Texts to embed
+
+        Returns:
+            np.ndarray: float32 array of shape (len(texts), hidden_size)
+        """
+        vectors = await asyncio.gather(*(self.embed(text) for text in texts))
+        return np.stack(vectors) if vectors else np.empty((0, self.model.config.hidden_size), np.float32)
+
+    async def _next_batch(self) -> List[Any]:
+        batch = [await self._queue.get()]
+        try:
+            return await self._fill_batch(batch)
+        except asyncio.CancelledError:
+            # Already dequeued, so `stop()` would not find these in the queue
+            for _, future, _ in batch:
+                _fail(future)
+            raise
+
+    async def _fill_batch(self, batch: List[Any]) -> List[Any]:
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            getter = asyncio.ensure_future(self._queue.get())
+            try:
+                done, _ = await asyncio.wait({getter}, timeout=remaining)
+            except asyncio.CancelledError:
+                getter.cancel()
+                raise
+            if getter in done:
+                batch.append(getter.result())
+            elif not getter.cancel():
+                # The request arrived just as the wait timed out
+                batch.append(getter.result())
+                break
+            else:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            texts = [text for text, _, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(
+                    self._executor, embed_batch, self.tokenizer, self.model, texts,
+                    self.pooling, self.max_length,
+                )
+            except asyncio.CancelledError:
+                for _, future, _ in batch:
+                    _fail(future)
+                raise
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            now = time.perf_counter()
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future, enqueued), vector in zip(batch, vectors):
+                self._latencies.append(now - enqueued)
+                if not future.done():
+                    future.set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report throughput and latency counters.
+
+        Returns:
+            Dict[str, Any]: Requests and batches served, mean batch size, current
+                queue depth, and p50/p99 request latency in milliseconds
+        """
+        latencies = np.fromiter(self._latencies, dtype=np.float64) * 1000.0
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        }
@@ -0,0 +1,369 @@
+"""
+Lightweight timers, counters and histograms for the hot paths.
+
+Instrumentation is off unless `INSTRUMENTATION` is set (read on first use)
+or `enable()` is called. While it is off, `timer()` hands out one shared no-op context manager
+and every other call returns after a single flag check, so instrumented code
+runs at practically full speed.
+
+Instrumented paths: model loading and forward passes in `src.utils`, and env
+steps in `RolloutRunner` and `evaluation.run_episode`. `model_load_seconds` is
+split by `stage` (store_lookup, tokenizer, weights, device, quantize); the
+tokenizer and weights stages carry `source="hub"` when their time includes
+downloading from the Hub, `source="store"` for the local model store and
+`source="directory"` for a model directory given by path. Metrics live in the
+process that records them, so episodes that `evaluate_policy` runs in worker
+processes are not counted in the parent.
+
+Example:
+    from src import instrumentation
+
+    instrumentation.enable()
+    with instrumentation.timer("model_load_seconds", stage="weights"):
+        ...
+    instrumentation.increment("env_steps_total", 8)
+    print(instrumentation.prometheus_text())
+"""
+
+import bisect
+import functools
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+# Add the parent directory to the path to import the env_utils module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.env_utils import get_settings
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prefix of every exported metric name
+NAMESPACE = "agents"
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    """Bucketed distribution of observed values, like a Prometheus histogram."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """
+    Thread-safe store of counters and histograms, keyed by name and labels.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters: Dict[_Key, float] = {}
+        self._histograms: Dict[_Key, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        self._observe(_key(name, labels), value)
+
+    def _observe(self, key: _Key, value: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Copy the current values.
+
+        Returns:
+            Dict[str, Any]: "counters" maps metric keys such as
+                'model_load_seconds{stage="weights"}' to values; "histograms" maps
+                them to count, sum, mean and cumulative bucket counts
+        """
+        with self._lock:
+            counters = {_format_key(key): value for key, value in self._counters.items()}
+            histograms = {}
+            for key, histogram in self._histograms.items():
+                cumulative, total = {}, 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    total += count
+                    cumulative[_format_bound(bound)] = total
+                histograms[_format_key(key)] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                    "buckets": cumulative,
+                }
+        return {"counters": counters, "histograms": histograms}
+
+    def prometheus_text(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: One sample per line, with TYPE comments
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted({key[0] for key in self._counters}):
+                lines.append(f"# TYPE {NAMESPACE}_{name} counter")
+                for key in sorted(k for k in self._counters if k[0] == name):
+                    lines.append(f"{NAMESPACE}_{_format_key(key)} {self._counters[key]:g}")
+            for name in sorted({key[0] for key in self._histograms}):
+                lines.append(f"# TYPE {NAMESPACE}_{name} histogram")
+                for key in sorted(k for k in self._histograms if k[0] == name):
+                    histogram = self._histograms[key]
+                    total = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        total += count
+                        bucket_key = (f"{name}_bucket", key[1] + (("le", _format_bound(bound)),))
+                        lines.append(f"{NAMESPACE}_{_format_key(bucket_key)} {total}")
+                    lines.append(f"{NAMESPACE}_{_format_key((f'{name}_sum', key[1]))} {histogram.sum:g}")
+                    lines.append(f"{NAMESPACE}_{_format_key((f'{name}_count', key[1]))} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _key(name: str, labels: Dict[str, Any]) -> _Key:
+    if not labels:
+        return name, ()
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _format_key(key: _Key) -> str:
+    name, labels = key
+    if not labels:
+        return name
+    pairs = ",".join(f'{label}="{_escape(value)}"' for label, value in labels)
+    return f"{name}{{{pairs}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
+
+
+class _Timer:
+    __slots__ = ("key", "start")
+
+    def __init__(self, key: _Key):
+        self.key = key
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _metrics._observe(self.key, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+_metrics = Metrics()
+# None until first use, so importing this module neither builds the settings
+# snapshot (which validates every variable) nor reads them before .env is loaded
+_enabled: Optional[bool] = None
+
+
+def _resolve_enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = get_settings().instrumentation
+    return _enabled
+
+
+def enable() -> None:
+    """Start recording metrics."""
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    """Stop recording metrics; recorded values are kept."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    """Whether metrics are being recorded."""
+    return _enabled if _enabled is not None else _resolve_enabled()
+
+
+def get_metrics() -> Metrics:
+    """
+    Get the process-wide metrics store.
+
+    Returns:
+        Metrics: The shared store
+    """
+    return _metrics
+
+
+def timer(name: str, **labels: Any):
+    """
+    Time a block of code into the histogram `name`.
+
+    Args:
+        name (str): Histogram name, conventionally ending in "_seconds"
+        **labels: Label values of the sample
+
+    Returns:
+        A context manager; a shared no-op one while instrumentation is off
+    """
+    if not (_enabled if _enabled is not None else _resolve_enabled()):
+        return _NULL_TIMER
+    return _Timer(_key(name, labels))
+
+
+def timed(name: str, **labels: Any) -> Callable:
+    """
+    Decorator that times every call of a function into the histogram `name`.
+
+    Args:
+        name (str): Histogram name, conventionally ending in "_seconds"
+        **labels: Label values of the samples
+
+    Returns:
+        Callable: The decorator
+    """
+    key = _key(name, labels)
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not (_enabled if _enabled is not None else _resolve_enabled()):
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _metrics._observe(key, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def increment(name: str, value: float = 1, **labels: Any) -> None:
+    """
+    Add to the counter `name`.
+
+    Args:
+        name (str): Counter name, conventionally ending in "_total"
+        value (float): Amount to add
+        **labels: Label values of the counter
+    """
+    if _enabled if _enabled is not None else _resolve_enabled():
+        _metrics.increment(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """
+    Record a value in the histogram `name`.
+
+    Args:
+        name (str): Histogram name
+        value (float): Observed value
+        **labels: Label values of the sample
+    """
+    if _enabled if _enabled is not None else _resolve_enabled():
+        _metrics.observe(name, value, **labels)
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    Copy the current values of all metrics, see `Metrics.snapshot`.
+
+    Returns:
+        Dict[str, Any]: Counters and histograms
+    """
+    return _metrics.snapshot()
+
+
+def prometheus_text() -> str:
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition text
+    """
+    return _metrics.prometheus_text()
+
+
+def reset() -> None:
+    """Discard all recorded values."""
+    _metrics.reset()
+
+
+def start_http_server(port: Optional[int] = None, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    """
+    Serve the metrics for a local Prometheus scrape from a daemon thread.
+
+    Also enables instrumentation.
+
+    Args:
+        port (Optional[int]): Port to listen on. Defaults to METRICS_PORT, or 9464.
+        host (str): Address to bind; only localhost by default
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it
+    """
+    # Imported here: http.server is slow to import and most processes never serve metrics
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    if port is None:
+        port = get_settings().metrics_port or 9464
+    enable()
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
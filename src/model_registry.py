@@ -0,0 +1,247 @@
+"""
+Process-wide registry of loaded Hugging Face models.
+
+Loading the same weights twice costs seconds and doubles the memory used by
+them, so `load_hf_model` keeps every (tokenizer, model) pair it creates in a
+registry keyed by (model_name, device, dtype, revision). Repeat loads return
+the very same objects, and the least recently used entries are evicted once a
+configurable memory budget is exceeded.
+"""
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import sys
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Add the parent directory to the path to import the env_utils module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.env_utils import get_settings
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """
+    Estimate the memory held by a model's parameters and buffers.
+
+    Tensors that share storage (e.g. tied input/output embeddings) are only
+    counted once. Packed weights of quantized layers, which are not exposed as
+    parameters, are counted through the model's state dict.
+
+    Args:
+        model (Any): A PyTorch module, or any object without tensors
+
+    Returns:
+        int: Approximate size in bytes, 0 if the object holds no tensors
+    """
+    if not hasattr(model, "parameters"):
+        return 0
+
+    seen = set()
+    total = 0
+
+    def _add(value):
+        nonlocal total
+        if isinstance(value, (tuple, list)):
+            for item in value:
+                _add(item)
+            return
+        if not hasattr(value, "element_size"):
+            return
+        key = (value.data_ptr(), value.numel(), value.dtype)
+        if key in seen:
+            return
+        seen.add(key)
+        total += value.numel() * value.element_size()
+
+    for tensor in model.parameters():
+        _add(tensor)
+    if hasattr(model, "buffers"):
+        for tensor in model.buffers():
+            _add(tensor)
+    if hasattr(model, "state_dict"):
+        for value in model.state_dict().values():
+            _add(value)
+    return total
+
+
+class ModelRegistry:
+    """
+    Thread-safe LRU cache of loaded (tokenizer, model) pairs.
+
+    Entries are evicted least-recently-used first whenever the summed size of
+    the cached models exceeds `max_bytes`. The entry being inserted is never
+    evicted, so a single model larger than the budget is still served.
+    Evicting only drops the registry's reference; callers that still hold the
+    pair keep it alive.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            max_bytes (Optional[int]): Memory budget in bytes. None means unbounded.
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a cached value and mark it as most recently used.
+
+        Args:
+            key (Hashable): Registry key
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size_bytes: int = 0) -> None:
+        """
+        Insert a value and evict older entries until the budget is respected.
+
+        Args:
+            key (Hashable): Registry key
+            value (Any): Value to cache
+            size_bytes (int): Memory attributed to the value
+        """
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (value, size_bytes)
+            self._total_bytes += size_bytes
+            self._evict_locked(keep=key)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    size_fn: Callable[[Any], int] = None) -> Any:
+        """
+        Return the cached value for `key`, calling `loader` on a miss.
+
+        Concurrent callers asking for the same key wait for a single load
+        instead of each loading their own copy.
+
+        Args:
+            key (Hashable): Registry key
+            loader (Callable[[], Any]): Produces the value on a miss
+            size_fn (Callable[[Any], int], optional): Computes the size of a loaded value
+
+        Returns:
+            Any: The cached or freshly loaded value
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                # Another thread may have finished loading while we waited
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        self._entries.move_to_end(key)
+                        return entry[0]
+
+                value = loader()
+                size_bytes = size_fn(value) if size_fn is not None else 0
+                self.put(key, value, size_bytes)
+        finally:
+            # Also when the loader raised, so failing keys do not accumulate locks
+            with self._lock:
+                self._key_locks.pop(key, None)
+        return value
+
+    def set_max_bytes(self, max_bytes: Optional[int]) -> None:
+        """
+        Change the memory budget, evicting immediately if it shrank.
+
+        Args:
+            max_bytes (Optional[int]): New budget in bytes. None means unbounded.
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict_locked()
+
+    def clear(self) -> None:
+        """Drop every cached entry. Counters are left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report registry counters.
+
+        Returns:
+            Dict[str, Any]: hits, misses, evictions, entries, total_bytes and max_bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _evict_locked(self, keep: Optional[Hashable] = None) -> None:
+        if self.max_bytes is None:
+            return
+        while self._total_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(oldest)
+                continue
+            _, size_bytes = self._entries.pop(oldest)
+            self._total_bytes -= size_bytes
+            self.evictions += 1
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Get the process-wide model registry, creating it on first use.
+
+    The memory budget is read from `MODEL_REGISTRY_MAX_BYTES` when the registry
+    is created.
+
+    Returns:
+        ModelRegistry: The shared registry
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(max_bytes=get_settings().model_registry_max_bytes)
+    return _registry
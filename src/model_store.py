@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+"""
+Local artifact store for Hugging Face models.
+
+Models are snapshotted once into MODELS_DIR at a pinned revision and loaded
+from there with `local_files_only=True`, so cold starts never touch the
+network. A manifest records every stored file with its size and SHA-256, which
+lets a fleet node verify and warm all of its models in one step:
+
+```
+python src/model_store.py snapshot prajjwal1/bert-tiny
+python src/model_store.py warm --verify
+```
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the parent directory to the path to import the env_utils module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.env_utils import get_env, get_settings
+
+MANIFEST_FILE = "manifest.json"
+SNAPSHOTS_DIR = "snapshots"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _describe_files(directory: Path) -> Dict[str, Dict[str, Any]]:
+    files = {}
+    for path in sorted(directory.rglob("*")):
+        relative = path.relative_to(directory)
+        # Skip download bookkeeping written by huggingface_hub
+        if not path.is_file() or relative.parts[0] == ".cache":
+            continue
+        files[relative.as_posix()] = {"size": path.stat().st_size, "sha256": _sha256(path)}
+    return files
+
+
+class ModelStore:
+    """
+    Pinned model snapshots under a root directory, described by a manifest.
+
+    Each model is pinned at one revision; storing another revision replaces it
+    and deletes the old snapshot.
+
+    Layout:
+        <root>/manifest.json
+        <root>/snapshots/<model name with '/' replaced by '--'>/<revision>/...
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        """
+        Initialize the store.
+
+        Args:
+            root (Optional[Path]): Store directory. Defaults to MODELS_DIR.
+        """
+        self.root = Path(root) if root is not None else get_settings().models_dir
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._manifest_stamp = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / MANIFEST_FILE
+
+    def manifest(self) -> Dict[str, Any]:
+        """
+        Read the manifest, re-reading it only if the file changed.
+
+        Returns:
+            Dict[str, Any]: Manifest with a "models" mapping of model name to entry
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.manifest_path)
+                stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            except FileNotFoundError:
+                stamp = None
+
+            if self._manifest is None or stamp != self._manifest_stamp:
+                if stamp is None:
+                    self._manifest = {"version": 1, "models": {}}
+                else:
+                    with open(self.manifest_path, "r") as f:
+                        self._manifest = json.load(f)
+                self._manifest_stamp = stamp
+            return self._manifest
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _snapshot_dir(self, model_name: str, revision: str) -> Path:
+        return self.root / SNAPSHOTS_DIR / model_name.strip("/").replace("/", "--") / revision
+
+    def _record(self, model_name: str, revision: str, directory: Path) -> Path:
+        entry = {
+            "revision": revision,
+            "path": directory.relative_to(self.root).as_posix(),
+            "files": _describe_files(directory),
+        }
+        manifest = dict(self.manifest())
+        previous = manifest["models"].get(model_name)
+        manifest["models"] = dict(manifest["models"], **{model_name: entry})
+        self._write_manifest(manifest)
+        print(f"Stored {model_name}@{revision} in {directory}")
+
+        # The manifest pins one revision per model, so the replaced snapshot is unreachable
+        if previous is not None and previous["path"] != entry["path"]:
+            shutil.rmtree(self.root / previous["path"], ignore_errors=True)
+            print(f"Removed the previous snapshot {model_name}@{previous['revision']}")
+        return directory
+
+    def snapshot(self, model_name: str, revision: Optional[str] = None) -> Path:
+        """
+        Download a model from the Hub and pin it at its resolved commit.
+
+        Args:
+            model_name (str): Name of the model on Hugging Face Hub
+            revision (Optional[str]): Branch, tag or commit. Defaults to the main branch.
+
+        Returns:
+            Path: Directory holding the snapshot
+        """
+        from huggingface_hub import HfApi, snapshot_download
+
+        token = get_env("HUGGINGFACE_TOKEN") or None
+        commit = HfApi(token=token).model_info(model_name, revision=revision).sha
+        directory = self._snapshot_dir(model_name, commit)
+        snapshot_download(model_name, revision=commit, local_dir=directory, token=token)
+        return self._record(model_name, commit, directory)
+
+    def add_local(self, model_name: str, source_dir: Path, revision: str = "local") -> Path:
+        """
+        Store a model from a local directory, e.g. the output of `save_pretrained`.
+
+        Args:
+            model_name (str): Name to store the model under
+            source_dir (Path): Directory with the model and tokenizer files
+            revision (str): Revision label to pin. Defaults to "local".
+
+        Returns:
+            Path: Directory holding the snapshot
+        """
+        directory = self._snapshot_dir(model_name, revision)
+        if directory.exists():
+            shutil.rmtree(directory)
+        shutil.copytree(source_dir, directory)
+        return self._record(model_name, revision, directory)
+
+    def resolve(self, model_name: str, revision: Optional[str] = None) -> Optional[Path]:
+        """
+        Find the stored snapshot of a model.
+
+        Args:
+            model_name (str): Name of the model
+            revision (Optional[str]): Required revision. None accepts the pinned one.
+
+        Returns:
+            Optional[Path]: Snapshot directory, or None if not stored at that revision
+        """
+        entry = self.manifest()["models"].get(model_name)
+        if entry is None or (revision is not None and revision != entry["revision"]):
+            return None
+        return self.root / entry["path"]
+
+    def verify(self, model_names: Optional[List[str]] = None,
+               check_hashes: bool = True) -> Dict[str, List[str]]:
+        """
+        Check stored files against the manifest.
+
+        Args:
+            model_names (Optional[List[str]]): Models to check. Defaults to every stored model.
+            check_hashes (bool): Also compare SHA-256 digests, not just sizes
+
+        Returns:
+            Dict[str, List[str]]: Problems found per model; an empty list means the model is intact
+        """
+        models = self.manifest()["models"]
+        if model_names is None:
+            model_names = sorted(models)
+
+        report = {}
+        for model_name in model_names:
+            entry = models.get(model_name)
+            if entry is None:
+                report[model_name] = ["not in manifest"]
+                continue
+
+            problems = []
+            directory = self.root / entry["path"]
+            for relative, expected in entry["files"].items():
+                path = directory / relative
+                if not path.is_file():
+                    problems.append(f"missing {relative}")
+                elif path.stat().st_size != expected["size"]:
+                    problems.append(f"size mismatch for {relative}")
+                elif check_hashes and _sha256(path) != expected["sha256"]:
+                    problems.append(f"checksum mismatch for {relative}")
+            report[model_name] = problems
+        return report
+
+    def warm(self, model_names: Optional[List[str]] = None, device: Optional[str] = None,
+             verify: bool = True) -> Dict[str, Any]:
+        """
+        Verify and load stored models into the process-wide model registry.
+
+        Args:
+            model_names (Optional[List[str]]): Models to warm. Defaults to every stored model.
+            device (Optional[str]): Device to load on. Defaults to CUDA if available.
+            verify (bool): Verify checksums first and raise if any model is damaged
+
+        Returns:
+            Dict[str, Any]: The loaded (tokenizer, model) pair per model
+
+        Raises:
+            ValueError: If verification finds problems
+        """
+        from src.utils import load_hf_model
+
+        if model_names is None:
+            model_names = sorted(self.manifest()["models"])
+
+        if verify:
+            report = self.verify(model_names)
+            damaged = {name: problems for name, problems in report.items() if problems}
+            if damaged:
+                details = "; ".join(f"{name}: {', '.join(problems)}" for name, problems in damaged.items())
+                raise ValueError(f"Model store verification failed: {details}")
+
+        return {name: load_hf_model(name, device=device) for name in model_names}
+
+
+_store: Optional[ModelStore] = None
+_store_lock = threading.Lock()
+
+
+def get_model_store() -> ModelStore:
+    """
+    Get the process-wide model store rooted at MODELS_DIR.
+
+    Returns:
+        ModelStore: The shared store
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ModelStore()
+    return _store
+
+
+def main():
+    """
+    Command line interface for snapshotting, verifying and warming models.
+    """
+    parser = argparse.ArgumentParser(description="Manage the local model store in MODELS_DIR.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="Download and pin a model")
+    snapshot_parser.add_argument("model_name")
+    snapshot_parser.add_argument("--revision")
+
+    add_parser = subparsers.add_parser("add-local", help="Store a model from a local directory")
+    add_parser.add_argument("model_name")
+    add_parser.add_argument("source_dir")
+    add_parser.add_argument("--revision", default="local")
+
+    verify_parser = subparsers.add_parser("verify", help="Check stored files against the manifest")
+    verify_parser.add_argument("model_names", nargs="*")
+
+    warm_parser = subparsers.add_parser("warm", help="Load stored models")
+    warm_parser.add_argument("model_names", nargs="*")
+    warm_parser.add_argument("--verify", action="store_true", help="Verify checksums first")
+    warm_parser.add_argument("--device")
+
+    args = parser.parse_args()
+    store = get_model_store()
+
+    if args.command == "snapshot":
+        store.snapshot(args.model_name, revision=args.revision)
+    elif args.command == "add-local":
+        store.add_local(args.model_name, Path(args.source_dir), revision=args.revision)
+    elif args.command == "verify":
+        report = store.verify(args.model_names or None)
+        for name, problems in report.items():
+            print(f"{name}: {'OK' if not problems else ', '.join(problems)}")
+        if any(report.values()):
+            sys.exit(1)
+    elif args.command == "warm":
+        loaded = store.warm(args.model_names or None, device=args.device, verify=args.verify)
+        print(f"Warmed {len(loaded)} model(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Observation normalization, clipping and frame stacking in one in-place stage.
+
+Chaining Gymnasium wrappers (NormalizeObservation, TransformObservation,
+FrameStackObservation) allocates new arrays in every wrapper on every step.
+`ObservationPreprocessor` does the same work on buffers allocated once:
+
+- running mean and variance are updated with Welford's algorithm, merging the
+  whole batch of sub-environment observations per step (Chan et al.'s
+  parallel form) instead of looping over environments;
+- observations are normalized and clipped into a scratch buffer;
+- frames are stacked in a ring buffer of twice the stack length that holds
+  every frame twice, so the last `frame_stack` frames are always one
+  contiguous slice and the stacked observation is a view, not a copy.
+
+It works for a single environment (observations of shape `obs_shape`) and
+for vector environments (shape `(num_envs, *obs_shape)`), and `RolloutRunner`
+takes one as its `preprocessor`.
+
+Example:
+    envs = gym.make_vec("CartPole-v1", num_envs=8)
+    preprocessor = ObservationPreprocessor.for_env(envs, frame_stack=4)
+    runner = RolloutRunner(envs, policy, preprocessor=preprocessor)
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class RunningMeanStd:
+    """
+    Running per-element mean and variance over batches of observations.
+
+    All arithmetic writes into preallocated float64 buffers.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], batch_size: int):
+        """
+        Initialize empty statistics.
+
+        Args:
+            shape (Tuple[int, ...]): Shape of one observation
+            batch_size (int): Number of observations per update
+        """
+        self.shape = tuple(shape)
+        self.batch_size = batch_size
+        self.mean = np.zeros(self.shape, dtype=np.float64)
+        self.m2 = np.zeros(self.shape, dtype=np.float64)
+        self.count = 0
+
+        self._batch_mean = np.empty(self.shape, dtype=np.float64)
+        self._batch_m2 = np.empty(self.shape, dtype=np.float64)
+        self._delta = np.empty(self.shape, dtype=np.float64)
+        self._diff = np.empty((batch_size,) + self.shape, dtype=np.float64)
+
+    @property
+    def var(self) -> np.ndarray:
+        """Population variance of everything seen so far (zeros before the first update)."""
+        return self.m2 / max(self.count, 1)
+
+    def update(self, batch: np.ndarray) -> None:
+        """
+        Merge a batch of observations into the statistics.
+
+        Args:
+            batch (np.ndarray): Observations of shape (batch_size, *shape)
+        """
+        n = self.batch_size
+        # Ufuncs rather than np.sum, whose Python wrapper dominates for small batches
+        np.add.reduce(batch, axis=0, dtype=np.float64, out=self._batch_mean)
+        self._batch_mean /= n
+        np.subtract(batch, self._batch_mean, out=self._diff)
+        np.square(self._diff, out=self._diff)
+        np.add.reduce(self._diff, axis=0, out=self._batch_m2)
+
+        # Chan et al.: combine (count, mean, m2) with the batch's (n, mean, m2)
+        total = self.count + n
+        np.subtract(self._batch_mean, self.mean, out=self._delta)
+        np.multiply(self._delta, n / total, out=self._batch_mean)
+        self.mean += self._batch_mean
+        np.square(self._delta, out=self._delta)
+        self._delta *= self.count * n / total
+        self.m2 += self._batch_m2
+        self.m2 += self._delta
+        self.count = total
+
+    def std(self, epsilon: float, out: np.ndarray) -> np.ndarray:
+        """
+        Write sqrt(var + epsilon) into `out`.
+
+        Args:
+            epsilon (float): Added to the variance so constant features do not divide by zero
+            out (np.ndarray): Array of the observation shape to write to
+
+        Returns:
+            np.ndarray: `out`
+        """
+        np.divide(self.m2, max(self.count, 1), out=out)
+        out += epsilon
+        return np.sqrt(out, out=out)
+
+
+class ObservationPreprocessor:
+    """
+    Fused running normalization, clipping and frame stacking.
+
+    Call `reset(obs)` with the observations returned by `env.reset()` and
+    `step(obs, new_episode)` with those returned by every `env.step()`. Both
+    return a view into the ring buffer of shape `output_shape`, valid until the
+    next call; copy it if it has to outlive that. Steps without episode starts
+    allocate no arrays.
+    """
+
+    def __init__(self, obs_shape: Tuple[int, ...], num_envs: Optional[int] = None, normalize: bool = True,
+                 clip: Optional[float] = 10.0, frame_stack: int = 1, epsilon: float = 1e-8,
+                 dtype: Any = np.float32):
+        """
+        Initialize the preprocessor and allocate its buffers.
+
+        Args:
+            obs_shape (Tuple[int, ...]): Shape of one observation
+            num_envs (Optional[int]): Number of sub-environments, or None for a single environment
+            normalize (bool): Normalize with the running mean and standard deviation
+            clip (Optional[float]): Clip normalized observations to [-clip, clip]; None disables
+            frame_stack (int): Number of most recent frames to stack (1 disables stacking)
+            epsilon (float): Added to the variance before taking its square root
+            dtype: dtype of the output
+        """
+        if frame_stack < 1:
+            raise ValueError(f"frame_stack must be positive, got {frame_stack}")
+        if num_envs is not None and num_envs < 1:
+            raise ValueError(f"num_envs must be positive, got {num_envs}")
+        if clip is not None and clip <= 0:
+            raise ValueError(f"clip must be positive, got {clip}")
+
+        self.obs_shape = tuple(obs_shape)
+        self.num_envs = num_envs
+        self.normalize = normalize
+        self.clip = clip
+        self.frame_stack = frame_stack
+        self.epsilon = epsilon
+        self.training = True
+
+        batch = num_envs or 1
+        self.stats = RunningMeanStd(self.obs_shape, batch)
+        self._mean = np.zeros(self.obs_shape, dtype=dtype)
+        self._std = np.ones(self.obs_shape, dtype=dtype)
+        self._std64 = np.empty(self.obs_shape, dtype=np.float64)
+
+        # Every frame is written at slots p and p + frame_stack, so the newest
+        # frame_stack frames in order are always frames[:, p + 1:p + 1 + frame_stack]
+        self._frames = np.zeros((batch, 2 * frame_stack) + self.obs_shape, dtype=dtype)
+        self._frame = np.empty((batch,) + self.obs_shape, dtype=dtype)
+        self._new_frame = self._frame[:, None]
+        self._position = 0
+        self._fill_mask = np.zeros((batch, 1) + (1,) * len(self.obs_shape), dtype=bool)
+        self._fill_mask_flat = self._fill_mask.reshape(batch)
+
+        # Prebuilt views of every stack position; for a single environment without the env axis
+        self._views = []
+        for position in range(frame_stack):
+            view = self._frames[:, position + 1:position + 1 + frame_stack]
+            if frame_stack == 1:
+                view = view[:, 0]
+            self._views.append(view if num_envs is not None else view[0])
+
+    @classmethod
+    def for_env(cls, env, **kwargs) -> "ObservationPreprocessor":
+        """
+        Create a preprocessor for the observation space of a single or vector environment.
+
+        Args:
+            env (gym.Env | gym.vector.VectorEnv): Environment whose observations to preprocess
+            **kwargs: Other arguments of `ObservationPreprocessor`
+
+        Returns:
+            ObservationPreprocessor: The preprocessor
+        """
+        space = getattr(env, "single_observation_space", None)
+        if space is not None:
+            return cls(space.shape, num_envs=env.num_envs, **kwargs)
+        return cls(env.observation_space.shape, **kwargs)
+
+    @property
+    def output_shape(self) -> Tuple[int, ...]:
+        """Shape of one environment's preprocessed observation."""
+        if self.frame_stack == 1:
+            return self.obs_shape
+        return (self.frame_stack,) + self.obs_shape
+
+    @property
+    def output(self) -> np.ndarray:
+        """The current preprocessed observations (a view of the ring buffer)."""
+        return self._views[self._position]
+
+    def _write_frame(self, obs: np.ndarray) -> None:
+        frame = self._frame
+        # Casts to the output dtype; a single environment's observation broadcasts over the env axis
+        frame[...] = obs
+        if self.normalize:
+            if self.training:
+                self.stats.update(frame)
+                self._mean[...] = self.stats.mean
+                self._std[...] = self.stats.std(self.epsilon, out=self._std64)
+            frame -= self._mean
+            frame /= self._std
+        if self.clip is not None:
+            # Two ufuncs are several times faster than np.clip on small arrays
+            np.minimum(frame, self.clip, out=frame)
+            np.maximum(frame, -self.clip, out=frame)
+
+    def reset(self, obs: np.ndarray) -> np.ndarray:
+        """
+        Start new episodes in every environment: fill each stack with its first frame.
+
+        Args:
+            obs (np.ndarray): Observations returned by `env.reset()`
+
+        Returns:
+            np.ndarray: Preprocessed observations of shape `output_shape`, with a
+                leading env axis for vector environments
+        """
+        self._write_frame(obs)
+        self._frames[:] = self._new_frame
+        self._position = 0
+        return self.output
+
+    def step(self, obs: np.ndarray, new_episode: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Push the observations of one step.
+
+        Args:
+            obs (np.ndarray): Observations returned by `env.step()`
+            new_episode (Optional[np.ndarray]): Boolean mask of environments whose
+                observation starts a new episode (autoreset); their stacks are
+                filled with it. For a single environment, a bool.
+
+        Returns:
+            np.ndarray: Preprocessed observations of shape `output_shape`, with a
+                leading env axis for vector environments
+        """
+        self._write_frame(obs)
+        position = self._position + 1
+        if position == self.frame_stack:
+            position = 0
+        self._position = position
+
+        # Newest frame goes to the last slot of the stack that now starts at position + 1
+        newest = position + self.frame_stack
+        self._frames[:, newest] = self._frame
+        self._frames[:, newest - self.frame_stack] = self._frame
+        if new_episode is not None and (new_episode.any() if isinstance(new_episode, np.ndarray)
+                                        else new_episode):
+            self._fill_mask_flat[...] = new_episode
+            np.copyto(self._frames, self._new_frame, where=self._fill_mask)
+        return self.output
+
+    def state_dict(self) -> Dict[str, Any]:
+        """
+        Get the normalization statistics, e.g. to evaluate with a trained policy.
+
+        Returns:
+            Dict[str, Any]: "mean", "m2" and "count"
+        """
+        return {"mean": self.stats.mean.copy(), "m2": self.stats.m2.copy(), "count": self.stats.count}
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """
+        Restore normalization statistics saved with `state_dict`.
+
+        Args:
+            state (Dict[str, Any]): "mean", "m2" and "count"
+        """
+        np.copyto(self.stats.mean, state["mean"])
+        np.copyto(self.stats.m2, state["m2"])
+        self.stats.count = int(state["count"])
+        self._mean[...] = self.stats.mean
+        self._std[...] = self.stats.std(self.epsilon, out=self._std64)
@@ -0,0 +1,252 @@
+"""
+Batched rollouts over vector environments.
+
+`RolloutRunner` steps every sub-environment of a Gymnasium vector environment
+at once, asks the policy for a whole batch of actions per step and writes the
+results into arrays that are allocated once and reused for every rollout.
+Apart from what the environment and the policy allocate, a step allocates
+no arrays, including observation preprocessing with an
+`ObservationPreprocessor`.
+"""
+
+from pathlib import Path
+import sys
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+# Add the parent directory to the path to import the instrumentation module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.instrumentation import increment, timer
+from src.obs_preprocessing import ObservationPreprocessor
+
+
+def cartpole_lean_policy(observations: np.ndarray) -> np.ndarray:
+    """
+    Push the cart in the direction the pole is leaning, for a batch of observations.
+
+    This is the vectorized form of `simple_policy` from the introduction notebook.
+
+    Args:
+        observations (np.ndarray): CartPole observations of shape (num_envs, 4)
+
+    Returns:
+        np.ndarray: Actions of shape (num_envs,)
+    """
+    return (observations[:, 2] > 0).astype(np.int64)
+
+
+def _uses_next_step_autoreset(envs) -> bool:
+    # Gymnasium >= 1.0 defaults to resetting a finished sub-environment on the
+    # *next* step, which then ignores the action and returns the reset observation
+    mode = getattr(envs, "metadata", {}).get("autoreset_mode")
+    if mode is None:
+        return False
+    return getattr(mode, "value", mode) == "NextStep"
+
+
+class RolloutRunner:
+    """
+    Collect fixed-length rollouts from a vector environment.
+
+    After `run()`, the buffers `observations`, `actions`, `rewards`,
+    `terminated`, `truncated` and `valid` hold the last `num_steps` steps of
+    every sub-environment, indexed as [step, env]. `valid` is False only for
+    steps that merely reset a finished sub-environment (Gymnasium's next-step
+    autoreset mode). Episodes continue across `run()` calls.
+
+    With a `preprocessor`, `observations` and the policy's input are the
+    normalized, clipped and stacked observations.
+    """
+
+    def __init__(self, envs, policy: Callable[[np.ndarray], np.ndarray], num_steps: int = 128,
+                 preprocessor: Optional[ObservationPreprocessor] = None):
+        """
+        Initialize the runner and allocate its buffers.
+
+        Args:
+            envs (gym.vector.VectorEnv): Vector environment to step
+            policy (Callable[[np.ndarray], np.ndarray]): Maps a batch of observations to a batch of actions
+            num_steps (int): Number of vector steps per rollout
+            preprocessor (Optional[ObservationPreprocessor]): Observation preprocessing for
+                `envs.num_envs` environments
+        """
+        if num_steps < 1:
+            raise ValueError(f"num_steps must be positive, got {num_steps}")
+        if preprocessor is not None and preprocessor.num_envs != envs.num_envs:
+            raise ValueError(f"preprocessor is for {preprocessor.num_envs} environments, "
+                             f"envs has {envs.num_envs}")
+
+        self.envs = envs
+        self.policy = policy
+        self.num_steps = num_steps
+        self.num_envs = envs.num_envs
+
+        obs_space = envs.single_observation_space
+        action_space = envs.single_action_space
+        shape = (num_steps, self.num_envs)
+        self.preprocessor = preprocessor
+        if preprocessor is not None:
+            self.observations = np.empty(shape + preprocessor.output_shape, dtype=preprocessor.output.dtype)
+        else:
+            self.observations = np.empty(shape + obs_space.shape, dtype=obs_space.dtype)
+        self.actions = np.empty(shape + action_space.shape, dtype=action_space.dtype)
+        self.rewards = np.zeros(shape, dtype=np.float32)
+        self.terminated = np.zeros(shape, dtype=bool)
+        self.truncated = np.zeros(shape, dtype=bool)
+        self.valid = np.ones(shape, dtype=bool)
+
+        self._next_step_autoreset = _uses_next_step_autoreset(envs)
+        self._episode_returns = np.zeros(self.num_envs, dtype=np.float64)
+        self._episode_lengths = np.zeros(self.num_envs, dtype=np.int64)
+        self._pending_reset = np.zeros(self.num_envs, dtype=bool)
+        self._done = np.zeros(self.num_envs, dtype=bool)
+        self._step_rewards = np.zeros(self.num_envs, dtype=np.float64)
+        self._obs = None
+
+    @classmethod
+    def make(cls, env_name: str, num_envs: int, policy: Callable[[np.ndarray], np.ndarray],
+             mode: str = "sync", **kwargs) -> "RolloutRunner":
+        """
+        Create a vector environment and a runner for it.
+
+        The environment reuses one observation buffer across steps, which is safe
+        here because every observation is copied into the runner's buffers
+        before the next step.
+
+        Args:
+            env_name (str): Name of the Gymnasium environment
+            num_envs (int): Number of sub-environments
+            policy (Callable[[np.ndarray], np.ndarray]): Maps a batch of observations to a batch of actions
+            mode (str): "sync" or "async", see `create_vector_environment`
+            **kwargs: Other arguments of `RolloutRunner`
+
+        Returns:
+            RolloutRunner: The runner; close it with `runner.envs.close()`
+        """
+        from src.utils import create_vector_environment
+
+        envs = create_vector_environment(env_name, num_envs, mode=mode, copy=False)
+        return cls(envs, policy, **kwargs)
+
+    def reset(self, seed: Optional[int] = None) -> None:
+        """
+        Reset every sub-environment and discard unfinished episodes.
+
+        Args:
+            seed (Optional[int]): Seed for the first sub-environment; the others get seed + i
+        """
+        self._obs, _ = self.envs.reset(seed=seed)
+        if self.preprocessor is not None:
+            self._obs = self.preprocessor.reset(self._obs)
+        self._episode_returns[:] = 0
+        self._episode_lengths[:] = 0
+        self._pending_reset[:] = False
+
+    def run(self) -> Dict[str, np.ndarray]:
+        """
+        Step all sub-environments `num_steps` times.
+
+        Returns:
+            Dict[str, np.ndarray]: "episode_returns", "episode_lengths" and "episode_envs"
+                (index of the sub-environment) of the episodes that finished during
+                this rollout, in the order they finished
+        """
+        if self._obs is None:
+            self.reset()
+
+        finished_returns = []
+        finished_lengths = []
+        finished_envs = []
+        for t in range(self.num_steps):
+            self.observations[t] = self._obs
+            self.actions[t] = self.policy(self._obs)
+
+            with timer("env_step_seconds"):
+                obs, rewards, terminated, truncated, _ = self.envs.step(self.actions[t])
+            self.rewards[t] = rewards
+            self.terminated[t] = terminated
+            self.truncated[t] = truncated
+
+            valid = self.valid[t]
+            np.logical_not(self._pending_reset, out=valid)
+            np.multiply(rewards, valid, out=self._step_rewards)
+            self._episode_returns += self._step_rewards
+            self._episode_lengths += valid
+
+            done = self._done
+            np.logical_or(terminated, truncated, out=done)
+            np.logical_and(done, valid, out=done)
+            if done.any():
+                finished_returns.append(self._episode_returns[done])
+                finished_lengths.append(self._episode_lengths[done])
+                finished_envs.append(np.flatnonzero(done))
+                self._episode_returns[done] = 0
+                self._episode_lengths[done] = 0
+
+            if self.preprocessor is not None:
+                # The observation starts a new episode right after `done` in same-step
+                # autoreset mode, and on the step that only resets in next-step mode
+                new_episode = self._pending_reset if self._next_step_autoreset else done
+                obs = self.preprocessor.step(obs, new_episode)
+            if self._next_step_autoreset:
+                self._pending_reset[:] = done
+
+            self._obs = obs
+
+        increment("env_steps_total", self.num_steps * self.num_envs)
+        return {
+            "episode_returns": np.concatenate(finished_returns) if finished_returns else np.empty(0),
+            "episode_lengths": (np.concatenate(finished_lengths) if finished_lengths
+                                else np.empty(0, dtype=np.int64)),
+            "episode_envs": (np.concatenate(finished_envs) if finished_envs
+                             else np.empty(0, dtype=np.int64)),
+        }
+
+    def collect_episodes(self, num_episodes: int, seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Run rollouts until `num_episodes` episodes have finished, spread evenly over the sub-environments.
+
+        Every sub-environment contributes its first `num_episodes // num_envs`
+        episodes (the first `num_episodes % num_envs` sub-environments one
+        more). Taking whichever episodes finish first instead would favor short
+        episodes, because sub-environments with short episodes finish more of them.
+
+        Args:
+            num_episodes (int): Number of episodes to collect
+            seed (Optional[int]): Seed passed to `reset()` before collecting
+
+        Returns:
+            Dict[str, np.ndarray]: "episode_returns", "episode_lengths" and "episode_envs"
+                of the collected episodes, in the order they finished
+        """
+        if num_episodes < 1:
+            raise ValueError(f"num_episodes must be positive, got {num_episodes}")
+        quota = np.full(self.num_envs, num_episodes // self.num_envs, dtype=np.int64)
+        quota[:num_episodes % self.num_envs] += 1
+
+        self.reset(seed=seed)
+        returns = []
+        lengths = []
+        envs = []
+        finished = np.zeros(self.num_envs, dtype=np.int64)
+        while (finished < quota).any():
+            stats = self.run()
+            returns.append(stats["episode_returns"])
+            lengths.append(stats["episode_lengths"])
+            envs.append(stats["episode_envs"])
+            finished += np.bincount(stats["episode_envs"], minlength=self.num_envs)
+
+        envs = np.concatenate(envs)
+        # Rank of every episode among those of its own sub-environment
+        order = np.argsort(envs, kind="stable")
+        starts = np.searchsorted(envs[order], np.arange(self.num_envs))
+        rank = np.empty(len(envs), dtype=np.int64)
+        rank[order] = np.arange(len(envs)) - starts[envs[order]]
+        keep = rank < quota[envs]
+
+        return {
+            "episode_returns": np.concatenate(returns)[keep],
+            "episode_lengths": np.concatenate(lengths)[keep],
+            "episode_envs": envs[keep],
+        }
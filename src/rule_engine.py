@@ -0,0 +1,358 @@
+"""
+Declarative rule tables compiled into lookup tables.
+
+The notebook agents decide with if/elif chains that are evaluated from scratch
+for every agent on every call. Here the same rules are declared once and
+compiled: exact-match conditions become hash lookups of category codes,
+threshold conditions become sorted-interval lookups, and every group of rules
+becomes a dense table indexed by those codes. Evaluating a whole population
+is then a few NumPy array operations.
+
+Example (the notebook's ModelBasedAgent):
+    rules = RuleTable()
+    temperature = rules.group()
+    temperature.when("Turn on the AC", temperature=above(25))
+    temperature.when("Turn on the heater", temperature=below(18))
+    lights = rules.group()
+    lights.when("Turn on the lights", light_level="dark", time_of_day="day")
+    lights.when("Turn on dim lights", light_level="dark", time_of_day="night", temperature=above(0))
+    compiled = rules.compile()
+    compiled.evaluate({"temperature": 28, "light_level": "bright", "time_of_day": "day"})
+"""
+
+import bisect
+import itertools
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class Threshold(NamedTuple):
+    """A comparison of a numeric field against a constant."""
+    op: str
+    value: float
+
+    def matches(self, x: float) -> bool:
+        if self.op == "gt":
+            return x > self.value
+        if self.op == "ge":
+            return x >= self.value
+        if self.op == "lt":
+            return x < self.value
+        if self.op == "le":
+            return x <= self.value
+        return x == self.value
+
+
+def above(value: float) -> Threshold:
+    """Condition `field > value`."""
+    return Threshold("gt", value)
+
+
+def at_least(value: float) -> Threshold:
+    """Condition `field >= value`."""
+    return Threshold("ge", value)
+
+
+def below(value: float) -> Threshold:
+    """Condition `field < value`."""
+    return Threshold("lt", value)
+
+
+def at_most(value: float) -> Threshold:
+    """Condition `field <= value`."""
+    return Threshold("le", value)
+
+
+class Rule(NamedTuple):
+    """An action and the conditions, all of which must hold, that trigger it."""
+    action: str
+    conditions: Dict[str, Any]
+
+
+class RuleGroup:
+    """
+    Ordered rules of which at most one fires, like an if/elif chain.
+    """
+
+    def __init__(self):
+        self.rules: List[Rule] = []
+
+    def when(self, action: str, **conditions: Any) -> "RuleGroup":
+        """
+        Add a rule. Earlier rules take precedence.
+
+        Args:
+            action (str): Action taken when the rule fires
+            **conditions: Field name mapped to an exact value or a `Threshold`
+
+        Returns:
+            RuleGroup: This group, for chaining
+        """
+        self.rules.append(Rule(action, dict(conditions)))
+        return self
+
+
+class RuleTable:
+    """
+    Groups of rules whose fired actions are combined into one decision.
+
+    Every group contributes at most one action; the actions of all groups
+    are joined with ", ", and `default` is returned when no rule fires.
+    """
+
+    def __init__(self, default: str = "Do nothing", separator: str = ", "):
+        self.default = default
+        self.separator = separator
+        self.groups: List[RuleGroup] = []
+
+    def group(self) -> RuleGroup:
+        """
+        Start a new group of mutually exclusive rules.
+
+        Returns:
+            RuleGroup: The new group
+        """
+        group = RuleGroup()
+        self.groups.append(group)
+        return group
+
+    def compile(self, categories: Optional[Mapping[str, Sequence[Any]]] = None) -> "CompiledRules":
+        """
+        Compile the rules into lookup tables.
+
+        Args:
+            categories (Optional[Mapping[str, Sequence[Any]]]): Known values of categorical
+                fields, in code order. Values that only appear in rules are appended.
+
+        Returns:
+            CompiledRules: The compiled decision table
+        """
+        return CompiledRules(self, categories or {})
+
+
+class _NumericField:
+    """Sorted thresholds of a numeric field, splitting it into 2k+1 regions."""
+
+    def __init__(self, thresholds: Sequence[float]):
+        self.thresholds = sorted(set(thresholds))
+        self.array = np.asarray(self.thresholds, dtype=np.float64)
+        self.size = 2 * len(self.thresholds) + 1
+
+    def region(self, x: float) -> int:
+        # Region 2i lies strictly between thresholds i-1 and i, region 2i+1 is threshold i itself
+        return bisect.bisect_left(self.thresholds, x) + bisect.bisect_right(self.thresholds, x)
+
+    def regions(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x)
+        if len(self.thresholds) > 8:
+            return (np.searchsorted(self.array, x, side="left")
+                    + np.searchsorted(self.array, x, side="right"))
+        # With few thresholds, counting comparisons beats a binary search per element
+        regions = np.zeros(x.shape, dtype=np.intp)
+        for threshold in self.array:
+            regions += x > threshold
+            regions += x >= threshold
+        return regions
+
+    def representative(self, region: int) -> float:
+        t = self.thresholds
+        i, on_threshold = divmod(region, 2)
+        if on_threshold:
+            return t[i]
+        if not t:
+            return 0.0
+        if i == 0:
+            return t[0] - 1.0
+        if i == len(t):
+            return t[-1] + 1.0
+        return (t[i - 1] + t[i]) / 2.0
+
+
+class _CategoricalField:
+    """Values of a categorical field mapped to codes; the last code means 'other'."""
+
+    def __init__(self, values: Sequence[Any]):
+        self.values = list(dict.fromkeys(values))
+        self.codes = {value: code for code, value in enumerate(self.values)}
+        self.other = len(self.values)
+        self.size = len(self.values) + 1
+
+    def code(self, value: Any) -> int:
+        return self.codes.get(value, self.other)
+
+    def representative(self, code: int) -> Any:
+        return self.values[code] if code < self.other else _OTHER
+
+
+_OTHER = object()
+
+
+class CompiledRules:
+    """
+    Dense decision tables compiled from a `RuleTable`.
+
+    `evaluate` decides for one state mapping. `evaluate_batch` decides for a
+    whole population given column arrays: numeric fields as float arrays and
+    categorical fields as int codes from `encode` (or `codes`). It returns
+    decision ids; `labels[id]` is the combined action string.
+    """
+
+    def __init__(self, table: RuleTable, categories: Mapping[str, Sequence[Any]]):
+        thresholds: Dict[str, List[float]] = {}
+        exact_values: Dict[str, List[Any]] = {field: list(values) for field, values in categories.items()}
+        for group in table.groups:
+            for rule in group.rules:
+                for field, condition in rule.conditions.items():
+                    if isinstance(condition, Threshold):
+                        thresholds.setdefault(field, []).append(condition.value)
+                    else:
+                        exact_values.setdefault(field, []).append(condition)
+
+        self.fields: Dict[str, Any] = {}
+        for field, values in thresholds.items():
+            # Exact values on a numeric field become equality thresholds
+            extra = [value for value in exact_values.pop(field, []) if not isinstance(value, Threshold)]
+            self.fields[field] = _NumericField(values + extra)
+        for field, values in exact_values.items():
+            self.fields[field] = _CategoricalField(values)
+
+        self.default = table.default
+        self._group_fields: List[Tuple[str, ...]] = []
+        self._group_tables: List[np.ndarray] = []
+        self._group_actions: List[List[Optional[str]]] = []
+        for group in table.groups:
+            self._compile_group(group)
+
+        # Every combination of group outcomes gets one decision id and label
+        self._group_sizes = tuple(len(actions) for actions in self._group_actions)
+        self.labels: List[str] = []
+        for outcome in itertools.product(*self._group_actions):
+            fired = [action for action in outcome if action is not None]
+            self.labels.append(table.separator.join(fired) if fired else table.default)
+        self._labels_array = np.asarray(self.labels, dtype=object)
+
+    def _compile_group(self, group: RuleGroup) -> None:
+        fields = tuple(sorted({field for rule in group.rules for field in rule.conditions}))
+        actions: List[Optional[str]] = [None] + list(dict.fromkeys(rule.action for rule in group.rules))
+        action_ids = {action: i for i, action in enumerate(actions)}
+        specs = [self.fields[field] for field in fields]
+
+        lookup = np.zeros(tuple(spec.size for spec in specs), dtype=np.int32)
+        for cell in np.ndindex(*lookup.shape):
+            state = {field: spec.representative(index) for field, spec, index in zip(fields, specs, cell)}
+            for rule in group.rules:
+                if all(_condition_holds(condition, state[field])
+                       for field, condition in rule.conditions.items()):
+                    lookup[cell] = action_ids[rule.action]
+                    break
+
+        self._group_fields.append(fields)
+        self._group_tables.append(lookup)
+        self._group_actions.append(actions)
+
+    @property
+    def numeric_fields(self) -> Tuple[str, ...]:
+        """Names of the fields compared against thresholds."""
+        return tuple(name for name, spec in self.fields.items() if isinstance(spec, _NumericField))
+
+    @property
+    def categorical_fields(self) -> Tuple[str, ...]:
+        """Names of the fields matched against exact values."""
+        return tuple(name for name, spec in self.fields.items() if isinstance(spec, _CategoricalField))
+
+    def encode(self, field: str, values: Sequence[Any]) -> np.ndarray:
+        """
+        Encode categorical values as the codes `evaluate_batch` expects.
+
+        Args:
+            field (str): Name of a categorical field
+            values (Sequence[Any]): Values to encode; unknown values get the 'other' code
+
+        Returns:
+            np.ndarray: int32 codes
+        """
+        spec = self.fields[field]
+        return np.fromiter((spec.code(value) for value in values), dtype=np.int32, count=len(values))
+
+    def codes(self, field: str) -> Dict[Any, int]:
+        """
+        Get the code of every known value of a categorical field.
+
+        Args:
+            field (str): Name of a categorical field
+
+        Returns:
+            Dict[Any, int]: Value to code; any other value uses code len(result)
+        """
+        return dict(self.fields[field].codes)
+
+    def evaluate(self, state: Mapping[str, Any]) -> str:
+        """
+        Decide for one state.
+
+        Args:
+            state (Mapping[str, Any]): Field values; numeric fields used by the rules are required
+
+        Returns:
+            str: The combined action
+        """
+        decision = 0
+        for fields, lookup, size in zip(self._group_fields, self._group_tables, self._group_sizes):
+            index = []
+            for field in fields:
+                spec = self.fields[field]
+                if isinstance(spec, _NumericField):
+                    index.append(spec.region(state[field]))
+                else:
+                    index.append(spec.code(state.get(field)))
+            decision = decision * size + int(lookup[tuple(index)])
+        return self.labels[decision]
+
+    def evaluate_batch(self, columns: Mapping[str, np.ndarray]) -> np.ndarray:
+        """
+        Decide for a whole population at once.
+
+        Args:
+            columns (Mapping[str, np.ndarray]): One array per field, all of the same length:
+                floats for numeric fields, int codes for categorical fields
+
+        Returns:
+            np.ndarray: Decision ids; look them up in `labels` or pass them to `decode`
+        """
+        length = len(next(iter(columns.values()))) if columns else 0
+        decision = np.zeros(length, dtype=np.int64)
+        regions: Dict[str, np.ndarray] = {}
+        for fields, lookup, size in zip(self._group_fields, self._group_tables, self._group_sizes):
+            index = []
+            for field in fields:
+                if field not in regions:
+                    spec = self.fields[field]
+                    if isinstance(spec, _NumericField):
+                        regions[field] = spec.regions(columns[field])
+                    else:
+                        regions[field] = np.asarray(columns[field])
+                index.append(regions[field])
+            decision *= size
+            decision += lookup[tuple(index)] if fields else lookup[()]
+        return decision
+
+    def decode(self, decisions: np.ndarray) -> np.ndarray:
+        """
+        Turn decision ids into action strings.
+
+        Args:
+            decisions (np.ndarray): Ids returned by `evaluate_batch`
+
+        Returns:
+            np.ndarray: Object array of action strings
+        """
+        return self._labels_array[decisions]
+
+
+def _condition_holds(condition: Any, value: Any) -> bool:
+    if value is _OTHER:
+        return False
+    if isinstance(condition, Threshold):
+        return condition.matches(value)
+    return value == condition
@@ -0,0 +1,269 @@
+"""
+Memory-mapped safetensors weights shared between worker processes.
+
+`load_hf_model` normally reads the weights into private memory, so every
+worker process holds its own copy. With `shared_weights=True` the parameters
+are instead views of read-only (copy-on-write) memory maps of the model's
+safetensors files. Their pages live in the OS page cache and every process
+that maps the same files shares them, whether the workers were forked from a
+parent that loaded the model (`preload_and_fork`) or loaded it themselves.
+
+Example:
+    def serve(index, tokenizer, model):
+        ...  # answer requests with the shared model
+
+    workers = preload_and_fork("prajjwal1/bert-tiny", serve, num_workers=16)
+    print_memory_report(workers)
+"""
+
+import contextlib
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import struct
+import threading
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import torch
+
+# safetensors dtype names
+_DTYPES = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+
+# Fields of /proc/<pid>/smaps_rollup in the report, in kB there
+_SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty",
+                 "Anonymous")
+
+
+def mmap_safetensors(path: Union[str, Path]) -> Dict[str, torch.Tensor]:
+    """
+    Map the tensors of a safetensors file without reading them.
+
+    The file is mapped copy-on-write: the tensors read straight from the page
+    cache, and writing to one gives the writing process a private copy of the
+    touched pages instead of modifying the file.
+
+    Args:
+        path (Union[str, Path]): Path to a .safetensors file
+
+    Returns:
+        Dict[str, torch.Tensor]: Tensor name to a tensor backed by the mapping
+    """
+    path = Path(path)
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    header.pop("__metadata__", None)
+
+    storage = torch.UntypedStorage.from_file(str(path), shared=False, nbytes=path.stat().st_size)
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if info["dtype"] not in _DTYPES:
+            raise ValueError(f"Unsupported safetensors dtype {info['dtype']} for tensor {name} in {path}")
+        begin, end = info["data_offsets"]
+        raw = torch.empty(0, dtype=torch.uint8)
+        raw.set_(storage, data_start + begin, (end - begin,))
+        try:
+            tensor = raw.view(_DTYPES[info["dtype"]])
+        except RuntimeError:
+            # Misaligned for its dtype; only this tensor is copied
+            print(f"Warning: {name} in {path.name} is not aligned and is copied instead of mapped")
+            tensor = raw.clone().view(_DTYPES[info["dtype"]])
+        tensors[name] = tensor.view(info["shape"])
+    return tensors
+
+
+def load_shared_weights(model_dir: Union[str, Path], model_class: Any = None):
+    """
+    Build a model whose parameters are memory-mapped from its safetensors files.
+
+    Args:
+        model_dir (Union[str, Path]): Directory with config.json and *.safetensors
+        model_class (Any): Transformers class to instantiate. Defaults to AutoModel.
+
+    Returns:
+        torch.nn.Module: The model in eval mode, on the CPU
+    """
+    from transformers import AutoConfig, AutoModel
+
+    model_dir = Path(model_dir)
+    files = sorted(model_dir.glob("*.safetensors"))
+    if not files:
+        raise FileNotFoundError(f"No safetensors weights in {model_dir}; shared weights need safetensors")
+
+    config = AutoConfig.from_pretrained(model_dir)
+    # Parameters are replaced by mapped tensors, so none is allocated or randomly initialized
+    with _parameters_on_meta():
+        model = (model_class or AutoModel).from_config(config)
+
+    state_dict = {}
+    for file in files:
+        state_dict.update(mmap_safetensors(file))
+
+    # Checkpoints of task models prefix the base model's weights, e.g. "bert."
+    prefix = f"{model.base_model_prefix}."
+    own_keys = set(model.state_dict())
+    if not own_keys & state_dict.keys():
+        state_dict = {key[len(prefix):]: value for key, value in state_dict.items() if key.startswith(prefix)}
+
+    # assign=True keeps the mapped tensors instead of copying them into the new parameters
+    model.load_state_dict(state_dict, strict=False, assign=True)
+    model.tie_weights()
+
+    # Tied weights are stored once and are only missing under their second name
+    missing = [name for name, param in model.named_parameters() if param.is_meta]
+    if missing:
+        print(f"Warning: weights not found in {model_dir}, initialized fresh: {', '.join(missing)}")
+        _materialize(model)
+    return model.eval()
+
+
+# Threads currently inside `_parameters_on_meta`, and how many of them have the patch installed
+_meta_state = threading.local()
+_meta_lock = threading.Lock()
+_meta_users = 0
+_register_parameter = torch.nn.Module.register_parameter
+
+
+def _register_parameter_maybe_on_meta(module, name, param):
+    if getattr(_meta_state, "active", False) and param is not None and not param.is_meta:
+        param = torch.nn.Parameter(param.to("meta"), requires_grad=param.requires_grad)
+    _register_parameter(module, name, param)
+
+
+@contextlib.contextmanager
+def _parameters_on_meta():
+    """
+    Create module parameters on the meta device while buffers stay real.
+
+    Like accelerate's `init_empty_weights(include_buffers=False)`: buffers such
+    as BERT's position_ids are computed in `__init__` and are usually not in
+    the checkpoint, so they must keep their values (which rules out
+    `torch.device("meta")`). `register_parameter` is patched while any thread
+    is inside the context, but only moves parameters of the threads inside it,
+    so models built concurrently on other threads are unaffected.
+    """
+    global _meta_users
+
+    if getattr(_meta_state, "active", False):
+        yield  # nested on this thread
+        return
+    with _meta_lock:
+        if _meta_users == 0:
+            torch.nn.Module.register_parameter = _register_parameter_maybe_on_meta
+        _meta_users += 1
+    _meta_state.active = True
+    try:
+        yield
+    finally:
+        _meta_state.active = False
+        with _meta_lock:
+            _meta_users -= 1
+            if _meta_users == 0:
+                torch.nn.Module.register_parameter = _register_parameter
+
+
+def _materialize(model) -> None:
+    """Give parameters still on the meta device real, freshly initialized CPU storage."""
+    for module in model.modules():
+        params = module._parameters
+        meta = [name for name, param in params.items() if param is not None and param.is_meta]
+        for name in meta:
+            params[name] = torch.nn.Parameter(torch.empty_like(params[name], device="cpu"),
+                                              requires_grad=params[name].requires_grad)
+        if not meta:
+            continue
+        if len(meta) == sum(param is not None for param in params.values()):
+            # Nothing of this module was loaded, so its usual initialization is safe
+            model._init_weights(module)
+        else:
+            # Re-initializing the module would overwrite its mapped weights
+            for name in meta:
+                torch.nn.init.zeros_(params[name])
+
+
+def memory_report(pid: Union[int, str] = "self") -> Optional[Dict[str, int]]:
+    """
+    Read resident and shared memory of a process from /proc/<pid>/smaps_rollup.
+
+    Args:
+        pid (Union[int, str]): Process id, or "self"
+
+    Returns:
+        Optional[Dict[str, int]]: Rss, Pss, Shared_* , Private_* and Anonymous in
+            bytes, or None where smaps_rollup is unavailable (non-Linux)
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    report = {}
+    for line in lines:
+        field, _, value = line.partition(":")
+        if field in _SMAPS_FIELDS:
+            report[field] = int(value.split()[0]) * 1024
+    return report
+
+
+def print_memory_report(processes: List[multiprocessing.Process]) -> None:
+    """
+    Print resident, proportional and shared memory of each worker.
+
+    Args:
+        processes (List[multiprocessing.Process]): Running worker processes
+    """
+    for process in processes:
+        report = memory_report(process.pid)
+        if report is None:
+            print(f"Warning: no memory report for worker {process.pid} (needs Linux /proc)")
+            continue
+        shared = report["Shared_Clean"] + report["Shared_Dirty"]
+        private = report["Private_Clean"] + report["Private_Dirty"]
+        print(f"{process.name} (pid {process.pid}): RSS {report['Rss'] / 2**20:.1f} MiB, "
+              f"PSS {report['Pss'] / 2**20:.1f} MiB, shared {shared / 2**20:.1f} MiB, "
+              f"private {private / 2**20:.1f} MiB")
+
+
+def preload_and_fork(model_name: str, worker: Callable[[int, Any, Any], None], num_workers: int,
+                     revision: Optional[str] = None) -> List[multiprocessing.Process]:
+    """
+    Load a model with shared weights once, then fork workers that use it.
+
+    The workers inherit the parent's memory maps, so the weights are in memory
+    once for all of them. Each worker calls `worker(index, tokenizer, model)`.
+
+    Args:
+        model_name (str): Name of the model, see `load_hf_model`
+        worker (Callable[[int, Any, Any], None]): Function each worker runs
+        num_workers (int): Number of worker processes
+        revision (Optional[str]): Branch, tag or commit to load
+
+    Returns:
+        List[multiprocessing.Process]: The started workers; join them when done
+    """
+    from src.utils import load_hf_model
+
+    if num_workers < 1:
+        raise ValueError(f"num_workers must be positive, got {num_workers}")
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise ValueError("preload_and_fork needs the fork start method, which this platform lacks")
+
+    tokenizer, model = load_hf_model(model_name, device="cpu", revision=revision, shared_weights=True)
+    # Fast tokenizers start a thread pool that must not be inherited across fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    context = multiprocessing.get_context("fork")
+    processes = []
+    for index in range(num_workers):
+        process = context.Process(target=worker, args=(index, tokenizer, model),
+                                  name=f"model-worker-{index}", daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
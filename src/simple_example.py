@@ -8,7 +8,7 @@ from pathlib import Path
 
 # Add the parent directory to the path to import the modules
 sys.path.append(str(Path(__file__).parent.parent))
-from src.env_utils import get_env, require_env, load_env
+from src.env_utils import get_env, get_settings, require_env, load_env
 
 def check_simple_environment():
     """
@@ -46,39 +46,28 @@ def main():
     
     print("\n=== Environment Variables ===")
     
-    # Get environment variables with default values
-    model_name = get_env("MODEL_NAME", "default-model")
-    embedding_model = get_env("EMBEDDING_MODEL", "default-embedding-model")
-    gym_env = get_env("GYM_ENV", "CartPole-v1")
-    debug_mode = get_env("DEBUG_MODE", "false")
+    # Typed settings, parsed once from the environment
+    settings = get_settings()
     
-    print(f"Model: {model_name}")
-    print(f"Embedding Model: {embedding_model}")
-    print(f"Gym Environment: {gym_env}")
-    print(f"Debug Mode: {debug_mode}")
-    
-    # Get API configuration
-    api_timeout = get_env("API_TIMEOUT", "10")
-    api_retries = get_env("API_RETRIES", "1")
+    print(f"Model: {settings.model_name}")
+    print(f"Embedding Model: {settings.embedding_model}")
+    print(f"Gym Environment: {settings.gym_env}")
+    print(f"Debug Mode: {settings.debug_mode}")
     
     print(f"\n=== API Configuration ===")
-    print(f"API Timeout: {api_timeout} seconds")
-    print(f"API Retries: {api_retries}")
-    
-    # Get data and model directories
-    data_dir = get_env("DATA_DIR", "./data")
-    models_dir = get_env("MODELS_DIR", "./models")
+    print(f"API Timeout: {settings.api_timeout} seconds")
+    print(f"API Retries: {settings.api_retries}")
     
-    print(f"\nData Directory: {data_dir}")
-    print(f"Models Directory: {models_dir}")
+    print(f"\nData Directory: {settings.data_dir}")
+    print(f"Models Directory: {settings.models_dir}")
     
     # Create directories if they don't exist
-    os.makedirs(data_dir, exist_ok=True)
-    os.makedirs(models_dir, exist_ok=True)
+    os.makedirs(settings.data_dir, exist_ok=True)
+    os.makedirs(settings.models_dir, exist_ok=True)
     
     print(f"\nCreated directories:")
-    print(f"- {data_dir}")
-    print(f"- {models_dir}")
+    print(f"- {settings.data_dir}")
+    print(f"- {settings.models_dir}")
     
     # Print all custom environment variables
     print("\n=== All Custom Environment Variables ===")
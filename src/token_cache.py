@@ -0,0 +1,165 @@
+"""
+In-memory LRU cache of tokenized texts.
+
+Agent prompts, tool descriptions and observations repeat constantly, and
+re-tokenizing them is a noticeable share of CPU time. `TokenCache` keeps the
+token ids of recently seen texts as int32 arrays, and `encode_batch` returns
+a whole batch as one padded int32 array plus lengths, tokenizing only the
+texts that are not cached.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+import sys
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Add the parent directory to the path to import the env_utils module
+sys.path.append(str(Path(__file__).parent.parent))
+from src.env_utils import get_settings
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of token-id arrays for one tokenizer.
+
+    Entries are keyed by (text, max_length) and hold the ids with special
+    tokens added and truncation applied, exactly as the tokenizer returns them.
+    Batches are returned right-padded, so the tokenizer must pad on the right.
+    """
+
+    def __init__(self, tokenizer, max_entries: int = 10_000):
+        """
+        Initialize the cache.
+
+        Args:
+            tokenizer: Tokenizer returned by `load_hf_model`
+            max_entries (int): Number of texts to keep
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, int], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def encode(self, text: str, max_length: int = 512) -> np.ndarray:
+        """
+        Tokenize one text.
+
+        Args:
+            text (str): Text to tokenize
+            max_length (int): Truncate to this many tokens
+
+        Returns:
+            np.ndarray: int32 token ids
+        """
+        ids, lengths = self.encode_batch([text], max_length=max_length)
+        return ids[0, :lengths[0]]
+
+    def encode_batch(self, texts: Sequence[str], max_length: int = 512) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tokenize a batch of texts into one padded array.
+
+        Args:
+            texts (Sequence[str]): Texts to tokenize
+            max_length (int): Truncate each text to this many tokens
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: int32 ids of shape (len(texts), longest) padded
+                with the pad token, and int32 lengths of shape (len(texts),)
+        """
+        # Checked on every call since the padding side can be changed at any time
+        if self.tokenizer.padding_side != "right":
+            raise ValueError(f"TokenCache needs a tokenizer that pads on the right, "
+                             f"got padding_side={self.tokenizer.padding_side!r}")
+        cached: Dict[int, np.ndarray] = {}
+        missing = []
+        with self._lock:
+            for i, text in enumerate(texts):
+                ids = self._entries.get((text, max_length))
+                if ids is None:
+                    missing.append(i)
+                else:
+                    self._entries.move_to_end((text, max_length))
+                    cached[i] = ids
+            self.hits += len(cached)
+            self.misses += len(missing)
+
+        if missing:
+            # Tokenize unique misses once, straight into NumPy arrays
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = self.tokenizer(unique, padding=True, truncation=True, max_length=max_length,
+                                     return_tensors="np", return_attention_mask=True)
+            new_lengths = encoded["attention_mask"].sum(axis=1)
+            new_ids = encoded["input_ids"].astype(np.int32)
+            fresh = {text: new_ids[j, :new_lengths[j]].copy() for j, text in enumerate(unique)}
+            for i in missing:
+                cached[i] = fresh[texts[i]]
+            with self._lock:
+                for text, ids in fresh.items():
+                    self._entries[(text, max_length)] = ids
+                    self._entries.move_to_end((text, max_length))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        lengths = np.fromiter((len(cached[i]) for i in range(len(texts))), dtype=np.int32, count=len(texts))
+        ids = np.full((len(texts), int(lengths.max()) if len(texts) else 0), self.pad_token_id, dtype=np.int32)
+        for i in range(len(texts)):
+            ids[i, :lengths[i]] = cached[i]
+        return ids, lengths
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache usage.
+
+        Returns:
+            Dict[str, Any]: Entries, capacity, hits, misses and hit rate
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_caches: "weakref.WeakKeyDictionary[Any, TokenCache]" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def get_token_cache(tokenizer) -> Optional[TokenCache]:
+    """
+    Get the shared token cache of a tokenizer, creating it on first use.
+
+    The capacity is read from TOKEN_CACHE_MAX_ENTRIES; 0 disables caching.
+    The cache is dropped together with its tokenizer.
+
+    Args:
+        tokenizer: Tokenizer returned by `load_hf_model`
+
+    Returns:
+        Optional[TokenCache]: The cache, or None if caching is disabled
+    """
+    max_entries = get_settings().token_cache_max_entries
+    if not max_entries:
+        return None
+    with _caches_lock:
+        cache = _caches.get(tokenizer)
+        if cache is None:
+            # A proxy, so the cache does not keep its own key alive
+            cache = TokenCache(weakref.proxy(tokenizer), max_entries=max_entries)
+            _caches[tokenizer] = cache
+    return cache
@@ -0,0 +1,300 @@
+"""
+Streaming trajectory recording in a columnar on-disk format.
+
+`TrajectoryRecorder` copies every step into chunked, preallocated NumPy
+buffers and appends full chunks to one raw file per field, so recording
+costs no Python objects per step and memory stays at one chunk per field.
+`TrajectoryReader` memory-maps those files: columns and episodes are
+zero-copy views, paged in from disk only when they are touched.
+
+A dataset is a directory:
+    meta.json            field dtypes and shapes, number of steps and episodes
+    <field>.bin          raw column data, one row per step
+    episode_ends.bin     int64 end index (exclusive) of every finished episode
+
+Steps are stored in recording order. `obs` is the observation the action was
+taken in; the observation returned by the final step of an episode is not
+stored.
+"""
+
+from array import array
+import json
+import os
+from pathlib import Path
+import shutil
+from typing import Any, Dict, Iterator, Tuple, Union
+
+import numpy as np
+
+FIELDS = ("obs", "action", "reward", "terminated", "truncated")
+META_FILE = "meta.json"
+EPISODE_ENDS_FILE = "episode_ends.bin"
+
+
+class TrajectoryRecorder:
+    """
+    Record single-environment steps to a trajectory dataset.
+
+    Steps are buffered in chunks of `chunk_size` and written when a chunk is
+    full, on `flush()` and on `close()`. Readers opened in the meantime see
+    every step up to the last flush.
+
+    Example:
+        with TrajectoryRecorder.for_env("data/trajectories/cartpole", env) as recorder:
+            observation, info = env.reset(seed=42)
+            while True:
+                action = policy(observation)
+                next_observation, reward, terminated, truncated, info = env.step(action)
+                recorder.record(observation, action, reward, terminated, truncated)
+                ...
+    """
+
+    def __init__(self, path: Union[str, Path], obs_shape: Tuple[int, ...], obs_dtype: Any,
+                 action_shape: Tuple[int, ...] = (), action_dtype: Any = np.int64,
+                 chunk_size: int = 65536, overwrite: bool = False):
+        """
+        Create the dataset and allocate the chunk buffers.
+
+        Args:
+            path (Union[str, Path]): Directory of the dataset
+            obs_shape (Tuple[int, ...]): Shape of one observation
+            obs_dtype (Any): NumPy dtype of observations
+            action_shape (Tuple[int, ...]): Shape of one action; () for discrete actions
+            action_dtype (Any): NumPy dtype of actions
+            chunk_size (int): Number of steps buffered before they are written
+            overwrite (bool): Replace an existing dataset at `path`
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+
+        self.path = Path(path)
+        if (self.path / META_FILE).exists():
+            if not overwrite:
+                raise ValueError(f"Trajectory dataset {self.path} already exists")
+            shutil.rmtree(self.path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.chunk_size = chunk_size
+        self.specs = {
+            "obs": (np.dtype(obs_dtype), tuple(obs_shape)),
+            "action": (np.dtype(action_dtype), tuple(action_shape)),
+            "reward": (np.dtype(np.float32), ()),
+            "terminated": (np.dtype(bool), ()),
+            "truncated": (np.dtype(bool), ()),
+        }
+        self._buffers = {field: np.empty((chunk_size,) + shape, dtype=dtype)
+                         for field, (dtype, shape) in self.specs.items()}
+        self._files = {field: open(self.path / f"{field}.bin", "wb") for field in FIELDS}
+        self._episode_file = open(self.path / EPISODE_ENDS_FILE, "wb")
+        self._episode_ends = array("q")
+        self._fill = 0
+        self.num_steps = 0
+        self.num_episodes = 0
+        self._write_meta()
+
+    @classmethod
+    def for_env(cls, path: Union[str, Path], env, **kwargs) -> "TrajectoryRecorder":
+        """
+        Create a recorder shaped for a Gymnasium environment's spaces.
+
+        Args:
+            path (Union[str, Path]): Directory of the dataset
+            env (gym.Env): Environment whose steps will be recorded
+            **kwargs: Passed on to the constructor
+
+        Returns:
+            TrajectoryRecorder: The recorder
+        """
+        obs_space = env.observation_space
+        action_space = env.action_space
+        return cls(path, obs_space.shape, obs_space.dtype,
+                   action_space.shape, action_space.dtype, **kwargs)
+
+    def record(self, obs, action, reward: float, terminated: bool, truncated: bool) -> None:
+        """
+        Record one step. A terminated or truncated step ends the episode.
+
+        Args:
+            obs: Observation the action was taken in
+            action: The action
+            reward (float): Reward returned by the step
+            terminated (bool): Whether the episode terminated
+            truncated (bool): Whether the episode was truncated
+        """
+        i = self._fill
+        buffers = self._buffers
+        buffers["obs"][i] = obs
+        buffers["action"][i] = action
+        buffers["reward"][i] = reward
+        buffers["terminated"][i] = terminated
+        buffers["truncated"][i] = truncated
+        self._fill = i + 1
+        if terminated or truncated:
+            self._episode_ends.append(self.num_steps + self._fill)
+        if self._fill == self.chunk_size:
+            self._write_chunk()
+
+    def record_batch(self, obs: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+                     terminated: np.ndarray, truncated: np.ndarray) -> None:
+        """
+        Record consecutive steps of one environment given as arrays.
+
+        Args:
+            obs (np.ndarray): Observations, one row per step
+            actions (np.ndarray): Actions, one row per step
+            rewards (np.ndarray): Rewards
+            terminated (np.ndarray): Termination flags
+            truncated (np.ndarray): Truncation flags
+        """
+        columns = {"obs": obs, "action": actions, "reward": rewards,
+                   "terminated": terminated, "truncated": truncated}
+        n = len(rewards)
+        done = np.flatnonzero(np.logical_or(terminated, truncated))
+
+        start = 0
+        while start < n:
+            count = min(n - start, self.chunk_size - self._fill)
+            for field, values in columns.items():
+                self._buffers[field][self._fill:self._fill + count] = values[start:start + count]
+            # Buffer the episode ends of these steps before a full chunk writes them out
+            in_chunk = done[(done >= start) & (done < start + count)]
+            ends = self.num_steps + self._fill + (in_chunk - start) + 1
+            self._episode_ends.frombytes(ends.astype(np.int64).tobytes())
+            self._fill += count
+            start += count
+            if self._fill == self.chunk_size:
+                self._write_chunk()
+
+    def _write_chunk(self) -> None:
+        for field, f in self._files.items():
+            f.write(self._buffers[field][:self._fill].tobytes())
+        self.num_steps += self._fill
+        self._fill = 0
+        # Every buffered episode end now refers to a written step
+        self._episode_file.write(self._episode_ends.tobytes())
+        self.num_episodes += len(self._episode_ends)
+        del self._episode_ends[:]
+
+    def flush(self) -> None:
+        """Write buffered steps and make them visible to readers."""
+        if self._fill or self._episode_ends:
+            self._write_chunk()
+        for f in self._files.values():
+            f.flush()
+        self._episode_file.flush()
+        self._write_meta()
+
+    def close(self) -> None:
+        """Flush and close the dataset files."""
+        if self._episode_file.closed:
+            return
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._episode_file.close()
+
+    def __enter__(self) -> "TrajectoryRecorder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _write_meta(self) -> None:
+        meta = {
+            "num_steps": self.num_steps,
+            "num_episodes": self.num_episodes,
+            "fields": {field: {"dtype": dtype.str, "shape": list(shape)}
+                       for field, (dtype, shape) in self.specs.items()},
+        }
+        # Written last and atomically, so a reader never sees more steps than are on disk
+        tmp_path = self.path / f"{META_FILE}.tmp"
+        tmp_path.write_text(json.dumps(meta, indent=2))
+        os.replace(tmp_path, self.path / META_FILE)
+
+
+class TrajectoryReader:
+    """
+    Zero-copy access to a recorded trajectory dataset.
+
+    `reader["obs"]` is a read-only memory map of the whole column, and
+    `reader.episode(i)` returns views of one episode's rows. Steps after the
+    last finished episode are part of the columns but of no episode.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open a dataset.
+
+        Args:
+            path (Union[str, Path]): Directory of the dataset
+        """
+        self.path = Path(path)
+        meta_path = self.path / META_FILE
+        if not meta_path.exists():
+            raise ValueError(f"No trajectory dataset found at {self.path}")
+        meta = json.loads(meta_path.read_text())
+
+        self.num_steps = meta["num_steps"]
+        self.num_episodes = meta["num_episodes"]
+        self.columns: Dict[str, np.ndarray] = {}
+        for field, spec in meta["fields"].items():
+            self.columns[field] = _map(self.path / f"{field}.bin", np.dtype(spec["dtype"]),
+                                       (self.num_steps,) + tuple(spec["shape"]))
+
+        ends = _map(self.path / EPISODE_ENDS_FILE, np.dtype(np.int64), (self.num_episodes,))
+        self.episode_offsets = np.concatenate(([0], ends)).astype(np.int64)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def __len__(self) -> int:
+        return self.num_steps
+
+    def episode(self, index: int) -> Dict[str, np.ndarray]:
+        """
+        Get the steps of one episode.
+
+        Args:
+            index (int): Episode number, in recording order
+
+        Returns:
+            Dict[str, np.ndarray]: Field name to a view of the episode's rows
+        """
+        if not -self.num_episodes <= index < self.num_episodes:
+            raise IndexError(f"Episode {index} out of range ({self.num_episodes} episodes)")
+        index %= self.num_episodes
+        start, end = self.episode_offsets[index], self.episode_offsets[index + 1]
+        return {field: column[start:end] for field, column in self.columns.items()}
+
+    def episodes(self) -> Iterator[Dict[str, np.ndarray]]:
+        """Iterate over the finished episodes in recording order."""
+        for index in range(self.num_episodes):
+            yield self.episode(index)
+
+    def episode_returns(self) -> np.ndarray:
+        """
+        Compute the undiscounted return of every finished episode.
+
+        Returns:
+            np.ndarray: float64 array of shape (num_episodes,)
+        """
+        if self.num_episodes == 0:
+            return np.empty(0)
+        rewards = self.columns["reward"][:self.episode_offsets[-1]]
+        return np.add.reduceat(rewards, self.episode_offsets[:-1], dtype=np.float64)
+
+    def episode_lengths(self) -> np.ndarray:
+        """
+        Get the number of steps of every finished episode.
+
+        Returns:
+            np.ndarray: int64 array of shape (num_episodes,)
+        """
+        return np.diff(self.episode_offsets)
+
+
+def _map(path: Path, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    # np.memmap cannot map zero bytes
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
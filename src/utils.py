@@ -1,75 +1,460 @@
 """
 Utility functions for the AI Agents course.
+
+Heavy frameworks (torch, transformers, numpy, gymnasium) are imported inside
+the functions that need them, so importing this module stays fast.
 """
 
+import functools
 import os
-import torch
-from transformers import AutoTokenizer, AutoModel
 from pathlib import Path
 import sys
+import threading
+import time
 
 # Add the parent directory to the path to import the env_utils module
 sys.path.append(str(Path(__file__).parent.parent))
-from src.env_utils import get_env
+from src.env_utils import get_env, get_settings
+from src.instrumentation import increment, timer
+from src.model_registry import get_model_registry, estimate_model_bytes
+from src.model_store import get_model_store
+
+# Seconds the framework and accelerator probes of check_environment stay cached
+ENVIRONMENT_PROBE_TTL = 300.0
 
-def check_environment():
+_slow_probe_cache = None
+_slow_probe_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def _fast_environment_info():
+    import platform
+    
+    return {
+        "python_version": sys.version,
+        "platform": platform.platform(),
+    }
+
+def _slow_environment_info(ttl):
+    global _slow_probe_cache
+    cached = _slow_probe_cache
+    if cached is not None and time.monotonic() < cached[0]:
+        return cached[1]
+    
+    with _slow_probe_lock:
+        # Another caller may have refreshed the probes while we waited
+        cached = _slow_probe_cache
+        if cached is not None and time.monotonic() < cached[0]:
+            return cached[1]
+        
+        import torch
+        import transformers
+        
+        info = {
+            "torch_version": torch.__version__,
+            "cuda_available": torch.cuda.is_available(),
+            "transformers_version": transformers.__version__,
+        }
+        if info["cuda_available"]:
+            info["cuda_version"] = torch.version.cuda
+            info["gpu_name"] = torch.cuda.get_device_name(0)
+        
+        _slow_probe_cache = (time.monotonic() + ttl, info)
+        return info
+
+def check_environment(include_slow=True, ttl=ENVIRONMENT_PROBE_TTL):
     """
     Check if the environment is properly set up.
     
+    The fast part (Python, platform, token presence) costs microseconds after
+    the first call. The slow part imports torch and transformers and probes
+    CUDA; it runs once and is then cached for `ttl` seconds.
+    
+    Args:
+        include_slow (bool, optional): Include framework versions and accelerator
+            probes. Defaults to True.
+        ttl (float, optional): Seconds to reuse the slow probes. Defaults to
+            ENVIRONMENT_PROBE_TTL.
+    
     Returns:
         dict: Information about the environment
     """
-    import sys
-    import platform
-    import torch
-    import transformers
+    env_info = dict(_fast_environment_info())
+    if include_slow:
+        env_info.update(_slow_environment_info(ttl))
     
-    env_info = {
-        "python_version": sys.version,
-        "platform": platform.platform(),
-        "torch_version": torch.__version__,
-        "cuda_available": torch.cuda.is_available(),
-        "transformers_version": transformers.__version__,
-    }
+    # Check for API tokens; settings are a cached snapshot, so this stays cheap
+    settings = get_settings()
+    env_info["huggingface_token"] = "Available" if settings.huggingface_token else "Not set"
+    env_info["openai_api_key"] = "Available" if settings.openai_api_key else "Not set"
     
-    if torch.cuda.is_available():
-        env_info["cuda_version"] = torch.version.cuda
-        env_info["gpu_name"] = torch.cuda.get_device_name(0)
+    return env_info
+
+async def check_environment_async(include_slow=True, ttl=ENVIRONMENT_PROBE_TTL):
+    """
+    Check the environment without blocking the event loop.
     
-    # Check for API tokens
-    env_info["huggingface_token"] = "Available" if get_env("HUGGINGFACE_TOKEN") else "Not set"
-    env_info["openai_api_key"] = "Available" if get_env("OPENAI_API_KEY") else "Not set"
+    Returns immediately when the slow probes are cached or not requested, and
+    otherwise runs them in a worker thread.
     
-    return env_info
+    Args:
+        include_slow (bool, optional): See `check_environment`. Defaults to True.
+        ttl (float, optional): See `check_environment`. Defaults to ENVIRONMENT_PROBE_TTL.
+    
+    Returns:
+        dict: Information about the environment
+    """
+    cached = _slow_probe_cache
+    if not include_slow or (cached is not None and time.monotonic() < cached[0]):
+        return check_environment(include_slow, ttl)
+    
+    import asyncio
+    
+    return await asyncio.to_thread(check_environment, include_slow, ttl)
 
-def load_hf_model(model_name, device=None):
+# Supported values for the `precision` argument of load_hf_model
+PRECISIONS = ("fp32", "bf16", "int8-dynamic")
+
+# Fixed probe set used to compare reduced-precision outputs against fp32
+PRECISION_PROBE_TEXTS = (
+    "Hello, I'm learning about AI agents!",
+    "An agent perceives its environment and acts upon it.",
+    "The thermostat turns on the heater when it is too cold.",
+    "Reinforcement learning trains agents from rewards.",
+    "Model-based agents keep an internal state of the world.",
+    "Short text.",
+)
+
+def load_hf_model(model_name, device=None, dtype=None, revision=None, use_registry=True,
+                  precision="fp32", shared_weights=False, accelerate=False):
     """
     Load a model from Hugging Face.
     
+    Loaded models are kept in the process-wide model registry, so repeat calls
+    with the same (model_name, device, dtype, revision) return the very same
+    (tokenizer, model) pair instead of loading the weights again.
+    
+    Reduced precision trades a little accuracy for memory and CPU speed:
+    "bf16" casts the weights to bfloat16 (half the memory of fp32), and
+    "int8-dynamic" quantizes the Linear layers to int8 with dynamic activation
+    quantization (CPU only, roughly a quarter of the Linear weights' memory).
+    Use `compare_precision` to check the accuracy cost for a model.
+    
+    Models snapshotted into the local model store (see `src.model_store`) are
+    loaded from disk with `local_files_only=True`. With MODELS_OFFLINE set,
+    models missing from the store raise instead of being fetched from the Hub.
+    
+    With `shared_weights=True` the parameters are memory-mapped read-only from
+    the model's safetensors files (see `src.shared_weights`), so processes that
+    load the same model share one copy of the weights in the page cache.
+    
+    With `accelerate=True` the model is returned wrapped in an
+    `AcceleratedEncoder` (see `src.accelerated`), which runs frozen TorchScript
+    traces for bucketed input shapes, cached under MODELS_DIR/compiled. Large
+    batches of long texts still run eagerly, where tracing does not pay off.
+    
     Args:
         model_name (str): Name of the model on Hugging Face Hub
         device (str, optional): Device to load the model on. Defaults to None.
+        dtype (torch.dtype, optional): Cast the model weights to this dtype. Defaults to None.
+        revision (str, optional): Branch, tag or commit to load. Defaults to None.
+        use_registry (bool, optional): Reuse and cache models in the registry. Defaults to True.
+        precision (str, optional): "fp32", "bf16" or "int8-dynamic". Defaults to "fp32".
+        shared_weights (bool, optional): Memory-map the weights instead of reading them
+            (CPU and fp32 only). Defaults to False.
+        accelerate (bool, optional): Run the encoder through cached TorchScript traces.
+            Defaults to False.
     
     Returns:
         tuple: (tokenizer, model)
     """
+    import torch
+    
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {', '.join(PRECISIONS)}")
+    if precision != "fp32" and dtype is not None:
+        raise ValueError("Pass either dtype or precision, not both")
+    
     if device is None:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
+        device = "cuda" if torch.cuda.is_available() and not shared_weights else "cpu"
+    if precision == "bf16":
+        dtype = torch.bfloat16
+    if precision == "int8-dynamic" and str(device) != "cpu":
+        raise ValueError(f"int8-dynamic precision is only supported on CPU, got device '{device}'")
+    if shared_weights and (str(device) != "cpu" or dtype is not None or precision != "fp32"):
+        raise ValueError("shared_weights needs device 'cpu' and fp32 precision, since casting or moving "
+                         "the weights would copy them")
     
-    print(f"Loading {model_name} on {device}...")
+    def _load():
+        from transformers import AutoTokenizer, AutoModel
+        
+        print(f"Loading {model_name} on {device} ({precision})...")
+        
+        # Prefer a pinned snapshot from the local model store. This is only a
+        # lookup; a Hub download happens inside the tokenizer and weights stages,
+        # which are labeled with where the files come from
+        with timer("model_load_seconds", stage="store_lookup"):
+            source = get_model_store().resolve(model_name, revision)
+        if source is not None:
+            origin = "store"
+            kwargs = {"local_files_only": True}
+        elif get_settings().models_offline:
+            raise FileNotFoundError(f"{model_name} is not in the local model store and MODELS_OFFLINE is set. "
+                                    f"Run: python src/model_store.py snapshot {model_name}")
+        else:
+            source = model_name
+            origin = "directory" if Path(model_name).is_dir() else "hub"
+            
+            # Get HuggingFace token from environment variables
+            hf_token = get_env("HUGGINGFACE_TOKEN")
+            
+            # Use token if available
+            kwargs = {"revision": revision}
+            if hf_token:
+                kwargs["token"] = hf_token
+        
+        with timer("model_load_seconds", stage="tokenizer", source=origin):
+            tokenizer = AutoTokenizer.from_pretrained(source, use_fast=True, **kwargs)
+        if not tokenizer.is_fast:
+            print(f"Warning: no fast tokenizer available for {model_name}, using the slow Python tokenizer")
+        with timer("model_load_seconds", stage="weights", source=origin):
+            if shared_weights:
+                from src.shared_weights import load_shared_weights
+                
+                if not Path(source).is_dir():
+                    from huggingface_hub import snapshot_download
+                    
+                    source = snapshot_download(source, revision=revision, token=kwargs.get("token"))
+                model = load_shared_weights(source)
+            else:
+                model = AutoModel.from_pretrained(source, **kwargs)
+        with timer("model_load_seconds", stage="device"):
+            model = model.to(device)
+            if dtype is not None:
+                model = model.to(dtype)
+        if precision == "int8-dynamic":
+            with timer("model_load_seconds", stage="quantize"):
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        if accelerate:
+            from src.accelerated import AcceleratedEncoder
+            
+            model = AcceleratedEncoder(model, cache_key=f"{model_name}@{revision}@{precision}@{dtype}")
+        increment("model_loads_total")
+        
+        print(f"Model memory footprint: {estimate_model_bytes(model) / 2**20:.1f} MiB")
+        
+        return tokenizer, model
     
-    # Get HuggingFace token from environment variables
-    hf_token = get_env("HUGGINGFACE_TOKEN")
+    if not use_registry:
+        return _load()
     
-    # Use token if available
-    if hf_token:
-        tokenizer = AutoTokenizer.from_pretrained(model_name, token=hf_token)
-        model = AutoModel.from_pretrained(model_name, token=hf_token).to(device)
+    if precision == "int8-dynamic":
+        dtype_key = precision
     else:
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModel.from_pretrained(model_name).to(device)
+        dtype_key = str(dtype) if dtype is not None else None
+    if shared_weights:
+        dtype_key = "shared"
+    key = (model_name, str(device), dtype_key, revision)
+    if accelerate:
+        key += ("accelerated",)
+    return get_model_registry().get_or_load(
+        key, _load, size_fn=lambda pair: estimate_model_bytes(pair[1])
+    )
+
+def compare_precision(model_name, precision, probe_texts=PRECISION_PROBE_TEXTS, device="cpu",
+                      revision=None):
+    """
+    Compare a reduced-precision model against fp32 on a fixed probe set.
+    
+    Args:
+        model_name (str): Name of the model on Hugging Face Hub
+        precision (str): Precision to check, see `load_hf_model`
+        probe_texts (Sequence[str], optional): Texts to embed. Defaults to PRECISION_PROBE_TEXTS.
+        device (str, optional): Device to run on. Defaults to "cpu".
+        revision (str, optional): Branch, tag or commit to load. Defaults to None.
+    
+    Returns:
+        dict: Minimum and mean cosine similarity to the fp32 embeddings, and the
+            memory footprint in bytes of both models
+    """
+    import numpy as np
+    
+    texts = list(probe_texts)
+    reference = embed_texts(texts, model_name=model_name, device=device, revision=revision)
+    candidate = embed_texts(texts, model_name=model_name, device=device, revision=revision,
+                            precision=precision)
+    
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosine = (reference * candidate).sum(axis=1) / np.maximum(norms, 1e-12)
+    
+    _, reference_model = load_hf_model(model_name, device=device, revision=revision)
+    _, model = load_hf_model(model_name, device=device, revision=revision, precision=precision)
+    reference_bytes = estimate_model_bytes(reference_model)
+    model_bytes = estimate_model_bytes(model)
+    
+    return {
+        "precision": precision,
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "fp32_bytes": reference_bytes,
+        "bytes": model_bytes,
+        "memory_ratio": model_bytes / reference_bytes if reference_bytes else None,
+    }
+
+def embed_batch(tokenizer, model, texts, pooling="mean", max_length=512):
+    """
+    Embed one batch of texts in a single padded forward pass.
+    
+    Args:
+        tokenizer: Tokenizer returned by `load_hf_model`
+        model: Model returned by `load_hf_model`
+        texts (list[str]): Texts to embed together
+        pooling (str, optional): "mean" (attention-masked mean) or "cls". Defaults to "mean".
+        max_length (int, optional): Truncate texts to this many tokens. Defaults to 512.
+    
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), hidden_size)
+    """
+    import torch
+    from src.token_cache import get_token_cache
+    
+    # Repeated texts are tokenized once; the cache pads on the right
+    cache = get_token_cache(tokenizer) if tokenizer.padding_side == "right" else None
+    with torch.inference_mode():
+        if cache is not None:
+            ids, lengths = cache.encode_batch(list(texts), max_length=max_length)
+            input_ids = torch.from_numpy(ids).long()
+            attention_mask = (torch.arange(ids.shape[1]) < torch.from_numpy(lengths)[:, None]).long()
+            inputs = {"input_ids": input_ids.to(model.device), "attention_mask": attention_mask.to(model.device)}
+        else:
+            inputs = tokenizer(
+                list(texts),
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+                return_tensors="pt",
+            ).to(model.device)
+        with timer("forward_seconds"):
+            hidden = model(**inputs).last_hidden_state
+        increment("forward_batches_total")
+        increment("forward_texts_total", len(texts))
+        
+        if pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        
+        return pooled.float().cpu().numpy()
+
+def embed_texts(texts, model_name=None, batch_size=32, pooling="mean", device=None, max_length=512,
+                revision=None, precision="fp32"):
+    """
+    Embed a list of texts with a Hugging Face encoder model.
+    
+    Texts are sorted by length and split into dynamically padded batches, so
+    each batch is only padded to its own longest text. The forward passes run
+    under `torch.inference_mode()` and the result is returned in the original
+    input order.
+    
+    Args:
+        texts (list[str]): Texts to embed
+        model_name (str, optional): Model to use. Defaults to the EMBEDDING_MODEL environment variable.
+        batch_size (int, optional): Number of texts per forward pass. Defaults to 32.
+        pooling (str, optional): "mean" (attention-masked mean) or "cls". Defaults to "mean".
+        device (str, optional): Device to run on. Defaults to None.
+        max_length (int, optional): Truncate texts to this many tokens. Defaults to 512.
+        revision (str, optional): Branch, tag or commit of the model. Defaults to None.
+        precision (str, optional): Model precision, see `load_hf_model`. Defaults to "fp32".
+    
+    Returns:
+        np.ndarray: Contiguous float32 array of shape (len(texts), hidden_size)
+    """
+    import numpy as np
+    
+    if pooling not in ("mean", "cls"):
+        raise ValueError(f"Unknown pooling '{pooling}', expected 'mean' or 'cls'")
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+    
+    if model_name is None:
+        model_name = get_settings().embedding_model
+    tokenizer, model = load_hf_model(model_name, device=device, revision=revision, precision=precision)
+    
+    texts = list(texts)
+    embeddings = np.empty((len(texts), model.config.hidden_size), dtype=np.float32)
+    if not texts:
+        return embeddings
+    
+    # Sorting by length keeps similarly sized texts together, which minimizes padding
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    
+    for start in range(0, len(order), batch_size):
+        batch_indices = order[start:start + batch_size]
+        embeddings[batch_indices] = embed_batch(
+            tokenizer, model, [texts[i] for i in batch_indices], pooling=pooling, max_length=max_length
+        )
+    
+    return embeddings
+
+def warmup(models=None, max_workers=None, device=None, **load_kwargs):
+    """
+    Load several models concurrently and run one forward pass through each.
     
-    return tokenizer, model
+    Loading is mostly file I/O and tensor deserialization, which release the
+    GIL, so loading in a thread pool makes startup take about as long as the
+    slowest model instead of the sum of all of them. The models go through
+    the model registry, so later `load_hf_model` calls with the same arguments
+    return them instantly. The dummy forward pass triggers lazy initialization
+    (kernel selection, memory allocation) before the first real request.
+    
+    Args:
+        models (list[str], optional): Models to load. Defaults to PRELOAD_MODELS, or
+            MODEL_NAME and EMBEDDING_MODEL if that is not set.
+        max_workers (int, optional): Models loaded at once. Defaults to one thread per model.
+        device (str, optional): Device to load on, see `load_hf_model`. Defaults to None.
+        **load_kwargs: Passed on to `load_hf_model`, e.g. precision
+    
+    Returns:
+        dict: Per model, the load and forward-pass time in seconds and the error
+            message if it failed
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    if models is None:
+        settings = get_settings()
+        models = settings.preload_models or (settings.model_name, settings.embedding_model)
+    models = list(dict.fromkeys(models))
+    if not models:
+        return {}
+    
+    def _warm(model_name):
+        report = {"load_seconds": None, "forward_seconds": None, "error": None}
+        try:
+            start = time.perf_counter()
+            tokenizer, model = load_hf_model(model_name, device=device, **load_kwargs)
+            report["load_seconds"] = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            embed_batch(tokenizer, model, ["warmup"])
+            report["forward_seconds"] = time.perf_counter() - start
+        except Exception as e:
+            report["error"] = str(e)
+        return report
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or len(models), thread_name_prefix="warmup") as executor:
+        reports = dict(zip(models, executor.map(_warm, models)))
+    total = time.perf_counter() - start
+    
+    for model_name, report in reports.items():
+        if report["error"] is not None:
+            print(f"Warning: warmup of {model_name} failed: {report['error']}")
+        else:
+            print(f"Warmed up {model_name}: load {report['load_seconds']:.2f}s, "
+                  f"first forward pass {report['forward_seconds'] * 1000:.1f} ms")
+    print(f"Warmup of {len(models)} models took {total:.2f}s")
+    
+    return reports
 
 def create_agent_environment(env_name):
     """
@@ -88,4 +473,46 @@ def create_agent_environment(env_name):
     print(f"Action space: {env.action_space}")
     print(f"Observation space: {env.observation_space}")
     
-    return env 
\ No newline at end of file
+    return env 
+
+def create_vector_environment(env_name, num_envs, mode="sync", copy=True):
+    """
+    Create several copies of a Gymnasium environment that step together.
+    
+    Args:
+        env_name (str): Name of the Gymnasium environment
+        num_envs (int): Number of environment copies
+        mode (str, optional): "sync" steps the copies in this process, "async"
+            runs each copy in its own subprocess. Defaults to "sync".
+        copy (bool, optional): Return a new observation array from every
+            `reset()`/`step()`. With False the same buffer is overwritten on each
+            call, which saves a copy for callers that do not keep observations
+            across steps (e.g. `RolloutRunner`). Defaults to True.
+    
+    Returns:
+        gym.vector.VectorEnv: The created vector environment
+    """
+    import gymnasium as gym
+    
+    if mode not in ("sync", "async"):
+        raise ValueError(f"Unknown vector environment mode '{mode}', expected 'sync' or 'async'")
+    if num_envs < 1:
+        raise ValueError(f"num_envs must be positive, got {num_envs}")
+    
+    env_fns = [lambda: gym.make(env_name) for _ in range(num_envs)]
+    
+    kwargs = {"copy": copy}
+    # Reset finished sub-environments in the same step on Gymnasium >= 1.0
+    if hasattr(gym.vector, "AutoresetMode"):
+        kwargs["autoreset_mode"] = gym.vector.AutoresetMode.SAME_STEP
+    
+    if mode == "async":
+        envs = gym.vector.AsyncVectorEnv(env_fns, **kwargs)
+    else:
+        envs = gym.vector.SyncVectorEnv(env_fns, **kwargs)
+    
+    print(f"Created {num_envs} x {env_name} ({mode})")
+    print(f"Action space: {envs.single_action_space}")
+    print(f"Observation space: {envs.single_observation_space}")
+    
+    return envs
@@ -0,0 +1,468 @@
+"""
+Vector similarity memory for agents.
+
+`VectorMemory` keeps L2-normalized float32 vectors in one contiguous, growable
+array, so cosine similarity is a dot product and exact top-k search is a
+blocked matrix multiply. For large memories an IVF (inverted file) index
+clusters the vectors with spherical k-means and searches only the `nprobe`
+clusters closest to the query. Inserts are assigned to their nearest cluster
+right away and deletes leave tombstones, so the index stays usable without
+rebuilding. Memories are saved as raw arrays and loaded as memory maps.
+
+Example:
+    memory = VectorMemory(dim=128)
+    memory.add_texts(["the door is locked", "the key is under the mat"])
+    memory.search_texts(["where is the key?"], k=1)
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+META_FILE = "meta.json"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _merge_top_k(best_scores: np.ndarray, best_rows: np.ndarray, scores: np.ndarray,
+                 rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Keep the k highest of the running best and a new block, per query
+    scores = np.concatenate([best_scores, scores], axis=1)
+    rows = np.concatenate([best_rows, rows], axis=1)
+    if scores.shape[1] > k:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, top, axis=1)
+        rows = np.take_along_axis(rows, top, axis=1)
+    return scores, rows
+
+
+class VectorMemory:
+    """
+    Growable store of normalized vectors with exact and IVF top-k search.
+
+    Every vector gets an integer id from `add`; ids stay valid until the
+    vector is deleted. `search` returns ids and cosine similarities, best
+    first, padded with id -1 when fewer than k vectors match.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024, block_size: int = 32768):
+        """
+        Initialize an empty memory.
+
+        Args:
+            dim (int): Dimension of the vectors
+            capacity (int): Number of vectors to allocate room for up front
+            block_size (int): Rows per matrix multiply in exact search
+        """
+        if dim < 1:
+            raise ValueError(f"dim must be positive, got {dim}")
+
+        self.dim = dim
+        self.block_size = block_size
+        self._vectors = np.empty((max(capacity, 1), dim), dtype=np.float32)
+        self._ids = np.empty(max(capacity, 1), dtype=np.int64)
+        self._alive = np.zeros(max(capacity, 1), dtype=bool)
+        self._rows = 0
+        self._live = 0
+        self._next_id = 0
+        # Row of every id ever assigned, -1 once deleted
+        self._row_of = np.empty(max(capacity, 1), dtype=np.int64)
+        self.payloads: Dict[int, Any] = {}
+
+        # IVF index: centroids, cluster of every row, and rows grouped by cluster
+        self.centroids: Optional[np.ndarray] = None
+        self._assignments = np.empty(max(capacity, 1), dtype=np.int32)
+        self._list_rows: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+        self._indexed_rows = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The stored vectors, including deleted rows until `compact()`."""
+        return self._vectors[:self._rows]
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Id of every stored row."""
+        return self._ids[:self._rows]
+
+    def _grow(self, name: str, size: int) -> None:
+        array = getattr(self, name)
+        if len(array) >= size:
+            return
+        grown = np.empty((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        setattr(self, name, grown)
+
+    def add(self, vectors: np.ndarray, payloads: Optional[Sequence[Any]] = None) -> np.ndarray:
+        """
+        Add vectors; they are normalized before they are stored.
+
+        Args:
+            vectors (np.ndarray): Array of shape (n, dim), or (dim,) for one vector
+            payloads (Optional[Sequence[Any]]): Object to keep with each vector, e.g. its text
+
+        Returns:
+            np.ndarray: int64 ids of the new vectors
+        """
+        vectors = _normalize(np.atleast_2d(vectors))
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+        if payloads is not None and len(payloads) != len(vectors):
+            raise ValueError(f"Got {len(payloads)} payloads for {len(vectors)} vectors")
+
+        n = len(vectors)
+        start, end = self._rows, self._rows + n
+        for name in ("_vectors", "_ids", "_alive", "_assignments"):
+            self._grow(name, end)
+        ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+        self._grow("_row_of", self._next_id + n)
+
+        self._vectors[start:end] = vectors
+        self._ids[start:end] = ids
+        self._alive[start:end] = True
+        self._row_of[ids] = np.arange(start, end)
+        if self.centroids is not None:
+            self._assignments[start:end] = self._assign(vectors)
+        if payloads is not None:
+            self.payloads.update(zip(ids.tolist(), payloads))
+
+        self._rows = end
+        self._live += n
+        self._next_id += n
+        # Search scans rows added since the lists were built separately; rebuild
+        # here once that tail gets long, so search never modifies the index
+        if self.centroids is not None and end - self._indexed_rows > max(1024, self._indexed_rows // 10):
+            self._rebuild_lists()
+        return ids
+
+    def delete(self, ids: Union[int, Sequence[int], np.ndarray]) -> None:
+        """
+        Delete vectors by id. Their rows are reclaimed by `compact()`.
+
+        Args:
+            ids (Union[int, Sequence[int], np.ndarray]): Ids returned by `add`
+        """
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        if len(ids) and (ids.min() < 0 or ids.max() >= self._next_id):
+            raise KeyError(f"Unknown vector id in {ids.tolist()}")
+        rows = self._row_of[ids]
+        if (rows < 0).any():
+            raise KeyError(f"Vector ids already deleted: {ids[rows < 0].tolist()}")
+
+        self._alive[rows] = False
+        self._row_of[ids] = -1
+        self._live -= len(np.unique(rows))
+        for vector_id in ids.tolist():
+            self.payloads.pop(vector_id, None)
+
+        # Reclaim space once a quarter of the rows are tombstones
+        if self._rows - self._live > max(1024, self._rows // 4):
+            self.compact()
+
+    def get(self, vector_id: int) -> np.ndarray:
+        """
+        Get a stored vector.
+
+        Args:
+            vector_id (int): Id returned by `add`
+
+        Returns:
+            np.ndarray: The normalized vector
+        """
+        row = self._row_of[vector_id] if 0 <= vector_id < self._next_id else -1
+        if row < 0:
+            raise KeyError(f"Unknown vector id {vector_id}")
+        return self._vectors[row]
+
+    def compact(self) -> None:
+        """Drop deleted rows and make the remaining ones contiguous again."""
+        if self._live == self._rows:
+            return
+        keep = np.flatnonzero(self._alive[:self._rows])
+        n = len(keep)
+        self._vectors[:n] = self._vectors[keep]
+        self._ids[:n] = self._ids[keep]
+        self._assignments[:n] = self._assignments[keep]
+        self._alive[:n] = True
+        self._alive[n:self._rows] = False
+        self._row_of[self._ids[:n]] = np.arange(n)
+        self._rows = n
+        if self.centroids is not None:
+            self._rebuild_lists()
+
+    def build_index(self, nlist: Optional[int] = None, iterations: int = 10,
+                    sample_size: int = 100_000, seed: int = 0) -> None:
+        """
+        Cluster the vectors for approximate search with `search(..., nprobe=...)`.
+
+        Args:
+            nlist (Optional[int]): Number of clusters. Defaults to about sqrt(len(self)).
+            iterations (int): k-means iterations
+            sample_size (int): Number of vectors the clusters are trained on
+            seed (int): Seed for sampling and initialization
+        """
+        self.compact()
+        if self._rows == 0:
+            raise ValueError("Cannot build an index over an empty memory")
+        nlist = min(nlist or max(1, int(np.sqrt(self._rows))), self._rows)
+
+        rng = np.random.default_rng(seed)
+        sample_rows = rng.choice(self._rows, size=min(sample_size, self._rows), replace=False)
+        sample = self._vectors[np.sort(sample_rows)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            self.centroids = centroids
+            labels = self._assign(sample)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            # Empty clusters restart at a random sample vector
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        self.centroids = centroids
+        self._assignments[:self._rows] = self._assign(self._vectors[:self._rows])
+        self._rebuild_lists()
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        # Bound the (block, nlist) score matrix to about 16 MiB
+        block_size = max(256, (1 << 22) // len(self.centroids))
+        for start in range(0, len(vectors), block_size):
+            block = vectors[start:start + block_size]
+            labels[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def _rebuild_lists(self) -> None:
+        assignments = self._assignments[:self._rows]
+        self._list_rows = np.argsort(assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self._list_offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._indexed_rows = self._rows
+
+    def search(self, queries: np.ndarray, k: int = 10,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the stored vectors most similar to each query.
+
+        Args:
+            queries (np.ndarray): Array of shape (m, dim), or (dim,) for one query
+            k (int): Number of results per query
+            nprobe (Optional[int]): Clusters to search per query with the IVF index.
+                None searches exhaustively.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: ids and cosine similarities of shape (m, k),
+                or (k,) for a single query, best first
+        """
+        single = np.ndim(queries) == 1
+        queries = _normalize(np.atleast_2d(queries))
+        if nprobe is None:
+            scores, rows = self._search_exact(queries, k)
+        else:
+            if self.centroids is None:
+                raise ValueError("search with nprobe needs an index, call build_index() first")
+            scores, rows = self._search_ivf(queries, k, nprobe)
+
+        order = np.argsort(-scores, axis=1, kind="stable")
+        scores = np.take_along_axis(scores, order, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        ids = np.where(rows >= 0, self._ids[np.maximum(rows, 0)], -1)
+        if single:
+            return ids[0], scores[0]
+        return ids, scores
+
+    def _search_exact(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        m = len(queries)
+        best_scores = np.full((m, 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((m, 0), dtype=np.int64)
+        has_deleted = self._live < self._rows
+        for start in range(0, self._rows, self.block_size):
+            end = min(start + self.block_size, self._rows)
+            scores = queries @ self._vectors[start:end].T
+            if has_deleted:
+                scores[:, ~self._alive[start:end]] = -np.inf
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = top + start
+            best_scores, best_rows = _merge_top_k(best_scores, best_rows, scores, rows, k)
+        return self._pad(best_scores, best_rows, k)
+
+    def _search_ivf(self, queries: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        nprobe = min(nprobe, len(self.centroids))
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+        tail = np.arange(self._indexed_rows, self._rows)
+
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, (query, clusters) in enumerate(zip(queries, probes)):
+            candidates = [self._list_rows[self._list_offsets[c]:self._list_offsets[c + 1]] for c in clusters]
+            if len(tail):
+                # Rows added since the lists were built
+                candidates.append(tail[np.isin(self._assignments[tail], clusters)])
+            rows = np.concatenate(candidates)
+            rows = rows[self._alive[rows]]
+            scores = self._vectors[rows] @ query
+            if len(rows) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                rows, scores = rows[top], scores[top]
+            all_scores[i, :len(rows)] = scores
+            all_rows[i, :len(rows)] = rows
+        return all_scores, all_rows
+
+    @staticmethod
+    def _pad(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.where(np.isfinite(scores), rows, -1)
+        if scores.shape[1] < k:
+            missing = k - scores.shape[1]
+            scores = np.pad(scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+            rows = np.pad(rows, ((0, 0), (0, missing)), constant_values=-1)
+        return scores, rows
+
+    def add_texts(self, texts: Sequence[str], embed_fn: Optional[Callable[..., np.ndarray]] = None,
+                  **embed_kwargs) -> np.ndarray:
+        """
+        Embed texts and remember them, keeping each text as its payload.
+
+        Args:
+            texts (Sequence[str]): Texts to remember
+            embed_fn (Optional[Callable[..., np.ndarray]]): Embedding function. Defaults to `embed_texts`.
+            **embed_kwargs: Passed on to `embed_fn`, e.g. model_name
+
+        Returns:
+            np.ndarray: ids of the new vectors
+        """
+        embed_fn = embed_fn or _default_embed_fn()
+        return self.add(embed_fn(list(texts), **embed_kwargs), payloads=list(texts))
+
+    def search_texts(self, texts: Sequence[str], k: int = 5, nprobe: Optional[int] = None,
+                     embed_fn: Optional[Callable[..., np.ndarray]] = None,
+                     **embed_kwargs) -> List[List[Tuple[Any, float]]]:
+        """
+        Find the remembered payloads most similar to each text.
+
+        Args:
+            texts (Sequence[str]): Query texts
+            k (int): Number of results per query
+            nprobe (Optional[int]): See `search`
+            embed_fn (Optional[Callable[..., np.ndarray]]): Embedding function. Defaults to `embed_texts`.
+            **embed_kwargs: Passed on to `embed_fn`
+
+        Returns:
+            List[List[Tuple[Any, float]]]: (payload, similarity) pairs per query, best first
+        """
+        embed_fn = embed_fn or _default_embed_fn()
+        ids, scores = self.search(embed_fn(list(texts), **embed_kwargs), k=k, nprobe=nprobe)
+        return [[(self.payloads.get(int(i)), float(s)) for i, s in zip(row_ids, row_scores) if i >= 0]
+                for row_ids, row_scores in zip(ids, scores)]
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Save the memory as raw arrays that `load` can memory-map.
+
+        Deleted rows are compacted away first. Payloads must be JSON-serializable.
+
+        Args:
+            path (Union[str, Path]): Directory to save to
+        """
+        self.compact()
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        # Each file is written next to its target and renamed over it, so saving
+        # to the directory this memory was loaded (and is memory-mapped) from
+        # never truncates a file that is still mapped
+        def write(name, array):
+            tmp_path = path / f"{name}.tmp"
+            array.tofile(tmp_path)
+            os.replace(tmp_path, path / name)
+
+        write("vectors.f32", self._vectors[:self._rows])
+        write("ids.i64", self._ids[:self._rows])
+        if self.centroids is not None:
+            write("centroids.f32", self.centroids)
+            write("assignments.i32", self._assignments[:self._rows])
+        tmp_path = path / "payloads.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({str(key): value for key, value in self.payloads.items()}, f)
+        os.replace(tmp_path, path / "payloads.json")
+
+        meta = {
+            "dim": self.dim,
+            "rows": self._rows,
+            "next_id": self._next_id,
+            "nlist": len(self.centroids) if self.centroids is not None else None,
+        }
+        # Replaced last, so a reader never sees a meta.json describing a half-written
+        # file; a crash between the renames can still pair new arrays with the old meta.json
+        tmp_path = path / f"{META_FILE}.tmp"
+        tmp_path.write_text(json.dumps(meta, indent=2))
+        os.replace(tmp_path, path / META_FILE)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "VectorMemory":
+        """
+        Load a saved memory.
+
+        Args:
+            path (Union[str, Path]): Directory written by `save`
+            mmap (bool): Map the vectors copy-on-write instead of reading them into memory.
+                Adding vectors later copies them into memory.
+
+        Returns:
+            VectorMemory: The memory
+        """
+        path = Path(path)
+        meta_path = path / META_FILE
+        if not meta_path.exists():
+            raise ValueError(f"No vector memory found at {path}")
+        meta = json.loads(meta_path.read_text())
+        rows, dim = meta["rows"], meta["dim"]
+
+        def read(name, dtype, shape):
+            if shape[0] == 0:
+                return np.empty(shape, dtype=dtype)
+            if mmap:
+                return np.memmap(path / name, dtype=dtype, mode="c", shape=shape)
+            return np.fromfile(path / name, dtype=dtype).reshape(shape)
+
+        memory = cls(dim, capacity=1)
+        memory._vectors = read("vectors.f32", np.float32, (rows, dim))
+        memory._ids = read("ids.i64", np.int64, (rows,))
+        memory._alive = np.ones(rows, dtype=bool)
+        memory._rows = memory._live = rows
+        memory._next_id = meta["next_id"]
+        memory._row_of = np.full(max(meta["next_id"], 1), -1, dtype=np.int64)
+        memory._row_of[memory._ids] = np.arange(rows)
+        memory._assignments = np.zeros(rows, dtype=np.int32)
+        if meta["nlist"]:
+            memory.centroids = np.fromfile(path / "centroids.f32", dtype=np.float32).reshape(meta["nlist"], dim)
+            memory._assignments = read("assignments.i32", np.int32, (rows,))
+            memory._rebuild_lists()
+
+        payloads_path = path / "payloads.json"
+        if payloads_path.exists():
+            with open(payloads_path) as f:
+                memory.payloads = {int(key): value for key, value in json.load(f).items()}
+        return memory
+
+
+def _default_embed_fn() -> Callable[..., np.ndarray]:
+    from src.utils import embed_texts
+    return embed_texts
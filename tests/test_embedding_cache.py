@@ -0,0 +1,62 @@
+"""
+Tests for the on-disk embedding cache.
+"""
+
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Add the parent directory to the path to import the src package
+sys.path.append(str(Path(__file__).parent.parent))
+from src.embedding_cache import EmbeddingCache, INDEX_FILE, _namespace, text_hash
+
+
+def _vector(seed, dim=8):
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def test_reused_row_after_crash_is_a_miss_not_a_wrong_vector(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=2)
+    cache.put(text_hash("a"), _vector(0))
+    cache.put(text_hash("b"), _vector(1))
+    cache.flush()
+    # Evicts "a" and reuses its row, then the process dies before the next flush
+    cache.put(text_hash("c"), _vector(2))
+    cache._vectors.flush()
+
+    reopened = EmbeddingCache(tmp_path)
+    assert reopened.get(text_hash("a")) is None
+    np.testing.assert_array_equal(reopened.get(text_hash("b")), _vector(1))
+
+
+def test_get_is_not_changed_by_eviction(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=1)
+    cache.put(text_hash("a"), _vector(0))
+    vector = cache.get(text_hash("a"))
+    # Evicts "a" and writes "b" into its row
+    cache.put(text_hash("b"), _vector(1))
+    np.testing.assert_array_equal(vector, _vector(0))
+
+
+def test_flush_skips_unchanged_cache(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=4)
+    cache.put(text_hash("a"), _vector(0))
+    cache.flush()
+    index_path = tmp_path / INDEX_FILE
+    index_path.unlink()
+
+    # Only hits since the last flush: nothing to write
+    cache.get(text_hash("a"))
+    cache.flush()
+    assert not index_path.exists()
+
+    cache.put(text_hash("b"), _vector(1))
+    cache.flush()
+    assert index_path.exists()
+
+
+def test_namespace_separates_precision_and_max_length():
+    names = {_namespace("org/model", None, "mean", precision, max_length)
+             for precision in ("fp32", "bf16") for max_length in (128, 512)}
+    assert len(names) == 4
@@ -0,0 +1,33 @@
+"""
+Tests for parallel policy evaluation.
+"""
+
+from pathlib import Path
+import sys
+
+import numpy as np
+import pytest
+
+# Add the parent directory to the path to import the src package
+sys.path.append(str(Path(__file__).parent.parent))
+from src.evaluation import evaluate_policy, simple_policy
+
+
+def noisy_policy(observation, rng):
+    # Module level, so worker processes can unpickle it
+    if rng.random() < 0.3:
+        return int(rng.integers(2))
+    return simple_policy(observation)
+
+
+@pytest.mark.parametrize("policy, stochastic", [(simple_policy, False), (noisy_policy, True)])
+def test_results_do_not_depend_on_worker_count(policy, stochastic):
+    serial = evaluate_policy(policy, num_episodes=12, max_workers=1, stochastic=stochastic)
+    parallel = evaluate_policy(policy, num_episodes=12, max_workers=2, stochastic=stochastic)
+
+    np.testing.assert_array_equal(serial["returns"], parallel["returns"])
+    np.testing.assert_array_equal(serial["lengths"], parallel["lengths"])
+    if stochastic:
+        # The noise must actually change the episodes, or the comparison proves nothing
+        deterministic = evaluate_policy(simple_policy, num_episodes=12, max_workers=1)
+        assert not np.array_equal(serial["lengths"], deterministic["lengths"])
@@ -0,0 +1,66 @@
+"""
+Tests for the local model store, using a tiny model created on the fly.
+"""
+
+import os
+from pathlib import Path
+import socket
+import sys
+
+# The store must work without the Hub; fail instead of downloading
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import pytest
+
+# Add the parent directory to the path to import the src package
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks._fixtures import build_tiny_model
+import src.model_store as model_store
+from src.model_store import ModelStore
+from src.utils import embed_batch, load_hf_model
+
+MODEL_NAME = "test-org/tiny-bert"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ModelStore(tmp_path / "models")
+    monkeypatch.setattr(model_store, "_store", store)
+
+    def no_network(*args, **kwargs):
+        raise OSError("network access in an offline test")
+
+    monkeypatch.setattr(socket.socket, "connect", no_network)
+    return store
+
+
+def test_add_local_then_load_offline(store, tmp_path):
+    source = build_tiny_model(tmp_path / "source")
+    store.add_local(MODEL_NAME, source, revision="v1")
+    assert store.verify() == {MODEL_NAME: []}
+
+    tokenizer, model = load_hf_model(MODEL_NAME, device="cpu", revision="v1", use_registry=False)
+    vectors = embed_batch(tokenizer, model, ["a b c", "hello"])
+    assert vectors.shape == (2, 64)
+
+
+def test_new_revision_replaces_old_snapshot(store, tmp_path):
+    store.add_local(MODEL_NAME, build_tiny_model(tmp_path / "v1", seed=0), revision="v1")
+    old_dir = store.resolve(MODEL_NAME)
+    store.add_local(MODEL_NAME, build_tiny_model(tmp_path / "v2", seed=1), revision="v2")
+
+    assert not old_dir.exists()
+    assert store.resolve(MODEL_NAME, "v1") is None
+    assert store.resolve(MODEL_NAME, "v2").is_dir()
+    assert store.verify() == {MODEL_NAME: []}
+
+
+def test_damaged_snapshot_fails_verification(store, tmp_path):
+    directory = store.add_local(MODEL_NAME, build_tiny_model(tmp_path / "source"), revision="v1")
+    with open(directory / "config.json", "a") as f:
+        f.write(" ")
+
+    assert store.verify()[MODEL_NAME] == ["size mismatch for config.json"]
+    with pytest.raises(ValueError):
+        store.warm(device="cpu")
@@ -0,0 +1,57 @@
+"""
+Tests for models built on memory-mapped safetensors weights.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+import threading
+
+import torch
+
+# Add the parent directory to the path to import the src package
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks._fixtures import build_tiny_model
+from src.shared_weights import _parameters_on_meta, load_shared_weights
+
+
+def test_meta_parameters_stay_on_their_thread():
+    inside = threading.Event()
+    release = threading.Event()
+
+    def build_on_meta():
+        with _parameters_on_meta():
+            inside.set()
+            release.wait(5)
+            return torch.nn.Linear(2, 2)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(build_on_meta)
+        assert inside.wait(5)
+        # Built on this thread while the other one is inside the context
+        assert not torch.nn.Linear(2, 2).weight.is_meta
+        release.set()
+        assert future.result().weight.is_meta
+
+    assert torch.nn.Module.register_parameter is torch.nn.Module.__dict__["register_parameter"]
+    assert not torch.nn.Linear(2, 2).weight.is_meta
+
+
+def test_shared_load_next_to_normal_load(tmp_path):
+    from transformers import AutoModel
+
+    model_dir = build_tiny_model(tmp_path / "tiny")
+    expected = AutoModel.from_pretrained(model_dir).eval()
+    inputs = torch.tensor([[2, 7, 8, 9, 3]])
+
+    def load(shared):
+        return load_shared_weights(model_dir) if shared else AutoModel.from_pretrained(model_dir).eval()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        models = list(executor.map(load, [True, False] * 8))
+
+    with torch.no_grad():
+        reference = expected(inputs).last_hidden_state
+        for model in models:
+            assert not any(param.is_meta for param in model.parameters())
+            torch.testing.assert_close(model(inputs).last_hidden_state, reference)
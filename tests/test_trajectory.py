@@ -0,0 +1,47 @@
+"""
+Tests for recording and reading trajectory datasets.
+"""
+
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Add the parent directory to the path to import the src package
+sys.path.append(str(Path(__file__).parent.parent))
+from src.trajectory import TrajectoryReader, TrajectoryRecorder
+
+
+def _steps(n, done_at):
+    obs = np.arange(n * 2, dtype=np.float32).reshape(n, 2)
+    actions = np.arange(n) % 2
+    rewards = np.ones(n, dtype=np.float32)
+    terminated = np.zeros(n, dtype=bool)
+    terminated[list(done_at)] = True
+    return obs, actions, rewards, terminated, np.zeros(n, dtype=bool)
+
+
+def test_record_batch_filling_chunk_exactly_keeps_episode_ends(tmp_path):
+    with TrajectoryRecorder(tmp_path, (2,), np.float32, chunk_size=8) as recorder:
+        recorder.record_batch(*_steps(8, done_at=(2, 7)))
+
+    reader = TrajectoryReader(tmp_path)
+    assert reader.num_steps == 8
+    assert reader.num_episodes == 2
+    assert reader.episode_lengths().tolist() == [3, 5]
+
+
+def test_record_batch_across_chunks_matches_record(tmp_path):
+    steps = _steps(23, done_at=(0, 7, 8, 15, 20))
+    with TrajectoryRecorder(tmp_path / "batch", (2,), np.float32, chunk_size=8) as recorder:
+        recorder.record_batch(*[column[:11] for column in steps])
+        recorder.record_batch(*[column[11:] for column in steps])
+    with TrajectoryRecorder(tmp_path / "single", (2,), np.float32, chunk_size=8) as recorder:
+        for row in zip(*steps):
+            recorder.record(*row)
+
+    batch = TrajectoryReader(tmp_path / "batch")
+    single = TrajectoryReader(tmp_path / "single")
+    assert batch.num_episodes == single.num_episodes == 5
+    np.testing.assert_array_equal(batch.episode_lengths(), single.episode_lengths())
+    np.testing.assert_array_equal(batch["obs"], single["obs"])
@@ -0,0 +1,67 @@
+"""
+Tests for saving and loading VectorMemory.
+"""
+
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Add the parent directory to the path to import the src package
+sys.path.append(str(Path(__file__).parent.parent))
+from src.vector_memory import VectorMemory
+
+
+def _memory(rows=500, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    memory = VectorMemory(dim)
+    memory.add(rng.standard_normal((rows, dim), dtype=np.float32), payloads=[{"row": i} for i in range(rows)])
+    return memory
+
+
+def test_save_load_save_same_path(tmp_path):
+    memory = _memory()
+    memory.build_index(nlist=8)
+    memory.save(tmp_path)
+    queries = memory.vectors[:5].copy()
+    expected_ids, expected_scores = memory.search(queries, k=3)
+
+    loaded = VectorMemory.load(tmp_path)
+    loaded.save(tmp_path)  # overwrites the files it is memory-mapped from
+    reloaded = VectorMemory.load(tmp_path)
+
+    ids, scores = reloaded.search(queries, k=3)
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+    assert reloaded.payloads == memory.payloads
+    assert (tmp_path / "vectors.f32").stat().st_size == 500 * 16 * 4
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_save_after_adding_to_loaded_memory(tmp_path):
+    _memory().save(tmp_path)
+    loaded = VectorMemory.load(tmp_path)
+    (new_id,) = loaded.add(np.ones((1, 16), dtype=np.float32), payloads=["new"])
+    loaded.save(tmp_path)
+
+    reloaded = VectorMemory.load(tmp_path, mmap=False)
+    assert len(reloaded) == 501
+    assert reloaded.payloads[int(new_id)] == "new"
+    np.testing.assert_array_equal(reloaded.get(int(new_id)), loaded.get(int(new_id)))
+
+
+def test_search_leaves_the_index_unchanged(tmp_path):
+    memory = _memory(rows=2000)
+    memory.build_index(nlist=8)
+    rng = np.random.default_rng(1)
+    new_ids = memory.add(rng.standard_normal((1000, 16), dtype=np.float32))
+    list_rows = memory._list_rows
+    indexed_rows = memory._indexed_rows
+
+    ids, _ = memory.search(memory.get(int(new_ids[-1])), k=1, nprobe=8)
+    assert ids[0] == new_ids[-1]
+    # Rows added after the index are found without search rebuilding the lists
+    assert memory._list_rows is list_rows and memory._indexed_rows == indexed_rows
+
+    memory.add(rng.standard_normal((100, 16), dtype=np.float32))
+    assert memory._indexed_rows == 3100